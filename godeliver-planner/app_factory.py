@@ -1,19 +1,32 @@
+import os
+from typing import Optional
+
 from flask import Flask
 from flask_cors import CORS
 from flask_restful_swagger_2 import Api
 
-from godeliver_planner.planner.ortools_planner import ORToolsPlanner
-from godeliver_planner.planner.ortools_planner import ORToolsPlanner
-from godeliver_planner.planner.plan_timetable.lp_plan_timetable_computer import LpPlanTimetableComputer
+from godeliver_planner.helper.utils import YamlConfig
+from godeliver_planner.model.warmup_config import WarmupConfig
+from godeliver_planner.planner.insertion_planner import InsertionPlanner
 from godeliver_planner.planner.plan_timetable.plan_timetable_optimizer import PlanTimetableOptimizer
 from godeliver_planner.resource.resource_manager import ResourceManager
+from godeliver_planner.routing.cached_routing import CachedRouting
 from godeliver_planner.routing.osrm_service import OSRMRouting
+from godeliver_planner.service.batch_planning_service import BatchPlanningService
+from godeliver_planner.service.planning_job_service import PlanningJobService
+from godeliver_planner.service.planning_service import PlanningService
+from godeliver_planner.service.planning_session_service import PlanningSessionService
+from godeliver_planner.service.warmup_service import WarmupService
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'config', 'config.yml')
 
 
 class AppFactory:
 
     @staticmethod
-    def create_app():
+    def create_app(warmup_config: Optional[WarmupConfig] = None):
+        """The app is returned after the warmup, the worker takes no request before it. The warmup section of
+        config.yml is used when no warmup_config is passed."""
 
         app = Flask(__name__, template_folder='./static')
         CORS(app)
@@ -27,20 +40,30 @@ class AppFactory:
         # ---INIT OBJECTS---
         # TODO: add dependecy injection!
         #routing = GoogleRouting()
-        routing = OSRMRouting()
-        planner = ORToolsPlanner(routing=routing)
-        continuous_planner = ORToolsPlanner(routing=routing)
-        timetable_computer = LpPlanTimetableComputer()
-        timetable_optimizer = PlanTimetableOptimizer(
-            routing=routing,
-            timetable_computer=timetable_computer
-        )
+        routing = CachedRouting(OSRMRouting())
+        planning_service = PlanningService(routing=routing)
+        timetable_optimizer = PlanTimetableOptimizer(routing=routing)
+        insertion_planner = InsertionPlanner(routing=routing)
+        job_service = PlanningJobService(planning_service=planning_service)
+        batch_service = BatchPlanningService(planning_service=planning_service)
+        session_service = PlanningSessionService(planning_service=planning_service,
+                                                 insertion_planner=insertion_planner)
+        warmup_service = WarmupService(planning_service=planning_service, timetable_optimizer=timetable_optimizer)
 
         # ---REGISTER RESOURCE----
         # TODO: add dependecy injection!
-        ResourceManager.register(api=api, planner=planner,
-                                 continuous_planner=continuous_planner,
+        ResourceManager.register(api=api,
                                  routing=routing,
-                                 timetable_optimizer=timetable_optimizer)
+                                 planning_service=planning_service,
+                                 timetable_optimizer=timetable_optimizer,
+                                 insertion_planner=insertion_planner,
+                                 session_service=session_service,
+                                 job_service=job_service,
+                                 batch_service=batch_service,
+                                 warmup_service=warmup_service)
+
+        if warmup_config is None:
+            warmup_config = YamlConfig(file_path=CONFIG_FILE).load(WarmupConfig, 'warmup') or WarmupConfig()
+        warmup_service.warmup(app=app, warmup_config=warmup_config)
 
         return app
\ No newline at end of file
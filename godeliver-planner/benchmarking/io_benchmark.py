@@ -0,0 +1,112 @@
+"""
+Time of parsing a continuous planning request and of serialising its response, the pydantic path against the
+ModelCodec. Payloads are built from the foodchain instances with one courier per ten deliveries and current plans
+covering all deliveries.
+
+    python -m benchmarking.io_benchmark
+"""
+import json
+import os
+import time
+from typing import List
+
+from godeliver_planner.helper import model_codec
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.model.courier import Courier
+from godeliver_planner.model.delivery import Delivery
+from godeliver_planner.model.delivery_event import DeliveryEvent, DeliveryEventType
+from godeliver_planner.model.location import TimeLocation
+from godeliver_planner.model.mode import Mode
+from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.timeblock import TimeBlock
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'foodchain')
+SIZES = [20, 50, 100, 200, 500]
+REPEATS = 20
+
+
+def create_payload(deliveries: List[Delivery]) -> dict:
+    couriers = [Courier(id=f'c{idx}', start_timelocation=TimeLocation(location=deliveries[idx].origin,
+                                                                      time=deliveries[idx].pickup_time.from_time))
+                for idx in range(max(1, len(deliveries) // 10))]
+
+    plans = []
+    for courier_idx, courier in enumerate(couriers):
+        events = []
+        plan_deliveries = deliveries[courier_idx::len(couriers)]
+        for delivery in plan_deliveries:
+            events.append(DeliveryEvent(type=DeliveryEventType.pickup, location=delivery.origin,
+                                        delivery_order_ids=[delivery.id], event_time=delivery.pickup_time,
+                                        fixed_time=delivery.pickup_time.from_time))
+            events.append(DeliveryEvent(type=DeliveryEventType.drop, location=delivery.destination,
+                                        delivery_order_ids=[delivery.id],
+                                        event_time=TimeBlock(from_time=delivery.delivery_time.from_time,
+                                                             to_time=delivery.delivery_time.from_time + 300),
+                                        fixed_time=delivery.delivery_time.from_time))
+        plans.append(Plan(delivery_events=events, delivery_order_ids=[delivery.id for delivery in plan_deliveries],
+                          duration=3600, distance=10000, mode=Mode.BIKE, assigned_courier_id=courier.id,
+                          delivery_plan_id=None))
+
+    return {
+        'deliveries': [delivery.dict() for delivery in deliveries],
+        'couriers': [courier.dict() for courier in couriers],
+        'min_number_of_plans': len(couriers),
+        'current_plans': [json.loads(plan.json()) for plan in plans]
+    }
+
+
+def pydantic_parse(body: bytes):
+    data = json.loads(body)
+    return ([Delivery.parse_obj(x) for x in data['deliveries']],
+            [Courier.parse_obj(x) for x in data['couriers']],
+            [Plan.parse_obj(x) for x in data['current_plans']])
+
+
+def codec_parse(body: bytes):
+    data = ModelCodec.loads(body)
+    return (ModelCodec.parse_deliveries(data['deliveries']),
+            ModelCodec.parse_couriers(data['couriers']),
+            ModelCodec.parse_plans(data['current_plans']))
+
+
+def pydantic_serialise(plans: List[Plan]) -> bytes:
+    # what flask.jsonify did with the dicts of the plans
+    return json.dumps({'status': 'success', 'plans': [plan.dict() for plan in plans]}).encode('utf-8')
+
+
+def codec_serialise(plans: List[Plan]) -> bytes:
+    return ModelCodec.dumps({'status': 'success', 'plans': ModelCodec.plans_to_dicts(plans)})
+
+
+def measure(function, *args) -> float:
+    """Best of the repeats in milliseconds."""
+    times = []
+    for _ in range(REPEATS):
+        start_t = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start_t)
+    return min(times) * 1000
+
+
+def main():
+    print(f"orjson {'installed' if model_codec.orjson is not None else 'not installed'}")
+    print(f"{'deliveries':>10} {'payload kB':>10} | {'parse ms':>8} {'codec':>8} {'speedup':>7} | "
+          f"{'serialise ms':>12} {'codec':>8} {'speedup':>7}")
+
+    for size in SIZES:
+        with open(os.path.join(DATA_DIR, f'{size}_deliveries_00.json')) as f:
+            deliveries = [Delivery.parse_obj(x) for x in json.load(f)['deliveries']]
+
+        body = json.dumps(create_payload(deliveries)).encode('utf-8')
+        _, _, plans = codec_parse(body)
+
+        parse_ms, codec_parse_ms = measure(pydantic_parse, body), measure(codec_parse, body)
+        serialise_ms, codec_serialise_ms = measure(pydantic_serialise, plans), measure(codec_serialise, plans)
+
+        print(f"{size:>10} {len(body) / 1000:>10.0f} | {parse_ms:>8.2f} {codec_parse_ms:>8.2f} "
+              f"{parse_ms / codec_parse_ms:>6.1f}x | {serialise_ms:>12.2f} {codec_serialise_ms:>8.2f} "
+              f"{serialise_ms / codec_serialise_ms:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Cold start of the planner service - a fresh interpreter imports the app and creates it, as a new App Engine instance
+does, and the import time of every module is reported by `python -X importtime`. The solver dependencies are
+loaded by the warmup or by the first request and shall not be imported before, the warmup is not measured.
+
+    python -m benchmarking.startup_profile
+
+Exits with 1 when the cold start is over COLD_START_TARGET or a solver dependency was imported.
+"""
+import os
+import subprocess
+import sys
+from typing import Dict
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# seconds from the import of the app to the created app without the warmup
+COLD_START_TARGET = 0.5
+TOP_MODULES = 25
+
+# slow to import and needed by no request before the first solve, timetable or routing call - their modules import
+# them in the function that uses them, and only for the type annotations at the top
+LAZY_MODULES = ['ortools', 'scipy', 'aiohttp', 'plotly', 'firebase_admin', 'streamlit']
+
+STARTUP_SCRIPT = f"""
+import sys, time
+start_t = time.perf_counter()
+from app_factory import AppFactory
+from godeliver_planner.model.warmup_config import WarmupConfig
+AppFactory.create_app(warmup_config=WarmupConfig(enabled=False))
+print(time.perf_counter() - start_t)
+print(','.join(module for module in {LAZY_MODULES!r} if module in sys.modules))
+"""
+
+
+def parse_import_times(stderr: str) -> Dict[str, int]:
+    """Cumulative import time of every module in microseconds."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT], cwd=PROJECT_DIR,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    startup_time, loaded_modules = result.stdout.splitlines()[-2:]
+    startup_time = float(startup_time)
+    loaded_modules = [module for module in loaded_modules.split(',') if module]
+
+    import_times = parse_import_times(result.stderr)
+    print(f"{'module':<70} {'cumulative ms':>13}")
+    for module, cumulative in sorted(import_times.items(), key=lambda x: -x[1])[:TOP_MODULES]:
+        print(f"{module:<70} {cumulative / 1000:>13.1f}")
+
+    print()
+    print(f"cold start {startup_time:.3f} s, target {COLD_START_TARGET:.3f} s")
+    if loaded_modules:
+        print(f"imported at startup: {', '.join(loaded_modules)}")
+
+    if startup_time > COLD_START_TARGET or loaded_modules:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,33 @@
 import os
+
+from flask import g, has_app_context
+
 from godeliver_planner.helper.utils import YamlConfig
 from godeliver_planner.model.planner_config import PlannerConfig
 
 
 class ConfigProvider:
+    """
+    The config of the current request. It is resolved once when the request enters the services and then passed
+    explicitly to the instance builder, the planners and the timetable computers, which don't touch the Flask
+    context and so run the same in worker threads and processes.
+    """
 
     _default_config = PlannerConfig()
 
     @staticmethod
     def get_config() -> PlannerConfig:
-        try:
-            from flask import g
-            if 'planner_config' not in g:
-                return ConfigProvider._default_config
-
-            return g.planner_config
-
-        except RuntimeError:
+        if not has_app_context():
             return ConfigProvider._default_config
 
+        return g.get('planner_config', ConfigProvider._default_config)
+
     @staticmethod
     def set_current_config(planner_config: PlannerConfig):
         if not planner_config:
             return
 
         try:
-            from flask import g
-
             g.planner_config = planner_config
 
         except RuntimeError as e:
@@ -26,4 +26,27 @@ class NoSolutionException(Exception):
         return self._message
 
     def __str__(self):
-        return self.__class__.__name__ + ': ' + self.message
\ No newline at end of file
+        return self.__class__.__name__ + ': ' + self.message
+
+class JobQueueFullException(Exception):
+    def __init__(self, message):
+        self._message = message
+
+    @property
+    def message(self):
+        return self._message
+
+    def __str__(self):
+        return self.__class__.__name__ + ': ' + self.message
+
+
+class PlanningOverloadedException(Exception):
+    def __init__(self, message):
+        self._message = message
+
+    @property
+    def message(self):
+        return self._message
+
+    def __str__(self):
+        return self.__class__.__name__ + ': ' + self.message
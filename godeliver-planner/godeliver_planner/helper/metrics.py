@@ -0,0 +1,30 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Process wide counters. Counters named <name>.hits and <name>.misses also report <name>.hit_rate."""
+
+    _counters = defaultdict(int)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def increment(name: str, value: int = 1):
+        with Metrics._lock:
+            Metrics._counters[name] += value
+
+    @staticmethod
+    def get_counters() -> dict:
+        with Metrics._lock:
+            ret = dict(Metrics._counters)
+
+        for name in [name[:-len('.hits')] for name in ret if name.endswith('.hits')]:
+            hits, misses = ret.get(f'{name}.hits', 0), ret.get(f'{name}.misses', 0)
+            ret[f'{name}.hit_rate'] = round(hits / (hits + misses), 4) if hits + misses > 0 else None
+
+        return ret
+
+    @staticmethod
+    def reset():
+        with Metrics._lock:
+            Metrics._counters.clear()
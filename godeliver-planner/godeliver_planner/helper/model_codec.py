@@ -0,0 +1,369 @@
+import gzip
+import json
+import zlib
+from typing import Iterable, List, Optional
+
+from flask import Response, g, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from godeliver_planner.helper.exceptions import APIException
+from godeliver_planner.model.courier import Courier
+from godeliver_planner.model.delivery import Delivery
+from godeliver_planner.model.delivery_event import DeliveryEvent, DeliveryEventType
+from godeliver_planner.model.location import Location, TimeLocation
+from godeliver_planner.model.mode import Mode
+from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.timeblock import TimeBlock
+
+_new = object.__new__
+_set = object.__setattr__
+
+JSON_MIMETYPE = 'application/json'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+MSGPACK_MIMETYPES = ['application/msgpack', 'application/x-msgpack']
+
+MAX_BODY_SIZE = 64 * 1024 * 1024        # bytes of a decompressed request body
+READ_CHUNK_SIZE = 256 * 1024
+MIN_COMPRESSED_SIZE = 1024              # bytes of a response body worth compressing
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+
+class _NotCanonical(Exception):
+    pass
+
+
+def _build(cls, values: dict):
+    """Model from values of the exact types of its fields without any validation, as BaseModel.construct()."""
+    model = _new(cls)
+    _set(model, '__dict__', values)
+    _set(model, '__fields_set__', set(values))
+    return model
+
+
+class _Columns:
+    """Scalar values of a payload gathered by their type, their types are checked at once after the pass."""
+
+    def __init__(self) -> None:
+        self.strs = []
+        self.ints = []
+        self.bools = []
+
+    def check(self):
+        # bool is a subclass of int, pydantic converts it - such payloads take the slow path
+        if not (set(map(type, self.strs)) <= {str} and set(map(type, self.ints)) <= {int}
+                and set(map(type, self.bools)) <= {bool}):
+            raise _NotCanonical()
+
+
+def _location(data: dict) -> Location:
+    # float() converts the same values as the pydantic float validator
+    return _build(Location, {'latitude': float(data['latitude']), 'longitude': float(data['longitude'])})
+
+
+def _time_block(data: dict, columns: _Columns) -> TimeBlock:
+    from_time = data['from_time']
+    to_time = data.get('to_time')
+    anytime = data.get('anytime', False)
+    asap = data.get('asap', False)
+
+    columns.ints.append(from_time)
+    if to_time is not None:
+        columns.ints.append(to_time)
+    columns.bools.append(anytime)
+    columns.bools.append(asap)
+
+    return _build(TimeBlock, {'from_time': from_time, 'to_time': to_time, 'anytime': anytime, 'asap': asap})
+
+
+def _optional(value, column: list):
+    if value is not None:
+        column.append(value)
+    return value
+
+
+def _delivery(data: dict, columns: _Columns) -> Delivery:
+    origin = data.get('origin')
+    pickup_time = data.get('pickup_time')
+
+    columns.strs.append(data['id'])
+
+    return _build(Delivery, {
+        'id': data['id'],
+        'assigned_courier_id': _optional(data.get('assigned_courier_id'), columns.strs),
+        'origin': _location(origin) if origin is not None else None,
+        'destination': _location(data['destination']),
+        'pickup_time': _time_block(pickup_time, columns) if pickup_time is not None else None,
+        'delivery_time': _time_block(data['delivery_time'], columns),
+        'size': _optional(data.get('size'), columns.ints)
+    })
+
+
+def _courier(data: dict, columns: _Columns) -> Courier:
+    start_timelocation = data.get('start_timelocation')
+    if start_timelocation is not None:
+        start_timelocation = _build(TimeLocation, {
+            'location': _location(start_timelocation['location']),
+            'time': _optional(start_timelocation.get('time'), columns.ints)
+        })
+
+    columns.strs.append(data['id'])
+
+    return _build(Courier, {
+        'id': data['id'],
+        'start_timelocation': start_timelocation,
+        'is_finishing': _optional(data.get('is_finishing', False), columns.bools),
+        'capacity': _optional(data.get('capacity'), columns.ints),
+        'start_utilization': _optional(data.get('start_utilization'), columns.ints)
+    })
+
+
+def _ids(data, columns: _Columns) -> List[str]:
+    if type(data) is not list:
+        raise _NotCanonical()
+    columns.strs.extend(data)
+    return list(data)
+
+
+def _delivery_event(data: dict, columns: _Columns) -> DeliveryEvent:
+    return _build(DeliveryEvent, {
+        'type': DeliveryEventType(data['type']),
+        'location': _location(data['location']),
+        'delivery_order_ids': _ids(data['delivery_order_ids'], columns),
+        'event_time': _time_block(data['event_time'], columns),
+        'fixed_time': _optional(data.get('fixed_time'), columns.ints)
+    })
+
+
+def _plan(data: dict, columns: _Columns) -> Plan:
+    events = data['delivery_events']
+    if type(events) is not list:
+        raise _NotCanonical()
+
+    columns.ints.append(data['duration'])
+    columns.ints.append(data['distance'])
+
+    return _build(Plan, {
+        'delivery_events': [_delivery_event(event, columns) for event in events],
+        'delivery_order_ids': _ids(data['delivery_order_ids'], columns),
+        'duration': data['duration'],
+        'distance': data['distance'],
+        'mode': Mode(data['mode']),
+        'assigned_courier_id': _optional(data.get('assigned_courier_id'), columns.strs),
+        'delivery_plan_id': _optional(data.get('delivery_plan_id'), columns.strs)
+    })
+
+
+def _time_block_dict(time_block: TimeBlock) -> dict:
+    return {'from_time': time_block.from_time, 'to_time': time_block.to_time,
+            'anytime': time_block.anytime, 'asap': time_block.asap}
+
+
+def _location_dict(location: Location) -> dict:
+    return {'latitude': location.latitude, 'longitude': location.longitude}
+
+
+def _to_builtin(value):
+    # numpy arrays and scalars, orjson serialises them as well
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Can not serialize {type(value).__name__}")
+
+
+class ModelCodec:
+    """
+    Fast path between the JSON of the API and the models. The request is decoded by orjson when it is installed
+    and its items are built in a single pass without the pydantic validation - the scalar values are only
+    gathered and their types are checked at once afterwards. A payload that is not canonical, e.g. a number
+    passed as a string, is parsed by pydantic as before, so that its coercions and errors stay the same.
+
+    The bodies may be compressed by gzip or zstd (Content-Encoding) and encoded as MessagePack instead of JSON
+    (Content-Type application/msgpack). The response is encoded and compressed by the Accept and
+    Accept-Encoding headers of the request. A compressed request is decompressed while it is read and
+    a MessagePack one is decoded from the decompressed stream. zstd and MessagePack need the optional
+    zstandard and msgpack packages.
+    """
+
+    @staticmethod
+    def loads(data):
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(data) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def packb(data) -> bytes:
+        return msgpack.packb(data, default=_to_builtin, use_bin_type=True)
+
+    @classmethod
+    def request_json(cls) -> dict:
+        """The body of the request, it is decoded once per request."""
+        if 'request_body' not in g:
+            g.request_body = cls._decode_request()
+        return g.request_body
+
+    @classmethod
+    def _decode_request(cls) -> dict:
+        encoding = (request.headers.get('Content-Encoding') or 'identity').strip().lower()
+        is_msgpack = request.mimetype in MSGPACK_MIMETYPES
+        if is_msgpack and msgpack is None:
+            raise APIException(415, "MessagePack bodies are not supported, msgpack is not installed.")
+
+        if encoding == 'identity':
+            data = request.get_data()
+            return msgpack.unpackb(data, raw=False) if is_msgpack else cls.loads(data)
+
+        if encoding == 'gzip':
+            stream = gzip.GzipFile(fileobj=request.stream, mode='rb')
+        elif encoding == 'zstd' and zstandard is not None:
+            stream = zstandard.ZstdDecompressor().stream_reader(request.stream)
+        else:
+            raise APIException(415, f"Content-Encoding {encoding} is not supported.")
+
+        with stream:
+            if is_msgpack:
+                try:
+                    return msgpack.Unpacker(stream, raw=False, max_buffer_size=MAX_BODY_SIZE).unpack()
+                except msgpack.BufferFull:
+                    raise APIException(413, f"The decompressed body is larger than {MAX_BODY_SIZE} bytes.")
+
+            chunks, size = [], 0
+            for chunk in iter(lambda: stream.read(READ_CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > MAX_BODY_SIZE:
+                    raise APIException(413, f"The decompressed body is larger than {MAX_BODY_SIZE} bytes.")
+                chunks.append(chunk)
+            return cls.loads(b''.join(chunks))
+
+    @staticmethod
+    def _compress(body: bytes, encoding: str) -> bytes:
+        if encoding == 'zstd':
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+    @staticmethod
+    def _accepted_mimetype(default_mimetype: str) -> str:
+        mimetypes = [default_mimetype] + (MSGPACK_MIMETYPES if msgpack is not None else [])
+        return request.accept_mimetypes.best_match(mimetypes, default=default_mimetype)
+
+    @staticmethod
+    def _accepted_encoding() -> Optional[str]:
+        encodings = (['zstd'] if zstandard is not None else []) + ['gzip']
+        return request.accept_encodings.best_match(encodings)
+
+    @classmethod
+    def json_response(cls, data: dict, status: int = 200) -> Response:
+        """The response in the encoding and the compression accepted by the request, JSON by default."""
+        mimetype = cls._accepted_mimetype(JSON_MIMETYPE)
+        body = cls.packb(data) if mimetype in MSGPACK_MIMETYPES else cls.dumps(data)
+
+        response = Response(body, status=status, mimetype=mimetype)
+        response.vary.update(('Accept', 'Accept-Encoding'))
+
+        encoding = cls._accepted_encoding() if len(body) >= MIN_COMPRESSED_SIZE else None
+        if encoding is not None:
+            response.set_data(cls._compress(body, encoding))
+            response.content_encoding = encoding
+
+        return response
+
+    @classmethod
+    def stream_response(cls, items: Iterable[dict], status: int = 200) -> Response:
+        """Sends every item as soon as it is produced - a JSON line each, or a MessagePack object each when
+        accepted. A compressed stream is flushed after every item."""
+        mimetype = cls._accepted_mimetype(NDJSON_MIMETYPE)
+        encoding = cls._accepted_encoding()
+
+        if encoding == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        elif encoding == 'gzip':
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            flush_mode = zlib.Z_SYNC_FLUSH
+
+        def generate():
+            try:
+                for item in items:
+                    chunk = cls.packb(item) if mimetype in MSGPACK_MIMETYPES else cls.dumps(item) + b'\n'
+                    yield compressor.compress(chunk) + compressor.flush(flush_mode) if encoding else chunk
+                if encoding:
+                    yield compressor.flush()
+            finally:
+                # also when the client went away before the end, the producer stops
+                if hasattr(items, 'close'):
+                    items.close()
+
+        response = Response(generate(), status=status, mimetype=mimetype)
+        response.vary.update(('Accept', 'Accept-Encoding'))
+        if encoding is not None:
+            response.content_encoding = encoding
+
+        return response
+
+    @staticmethod
+    def _parse(items: list, parse_item, model_class) -> list:
+        try:
+            columns = _Columns()
+            models = [parse_item(item, columns) for item in items]
+            columns.check()
+            return models
+        except (_NotCanonical, KeyError, TypeError, ValueError, AttributeError):
+            return [model_class.parse_obj(item) for item in items]
+
+    @classmethod
+    def parse_deliveries(cls, items: list) -> List[Delivery]:
+        return cls._parse(items, _delivery, Delivery)
+
+    @classmethod
+    def parse_couriers(cls, items: list) -> List[Courier]:
+        return cls._parse(items, _courier, Courier)
+
+    @classmethod
+    def parse_plans(cls, items: Optional[list]) -> List[Plan]:
+        return cls._parse(items or [], _plan, Plan)
+
+    @staticmethod
+    def plan_to_dict(plan: Plan) -> dict:
+        """The same dict as plan.dict()."""
+        return {
+            'delivery_events': [{
+                'type': event.type,
+                'location': _location_dict(event.location),
+                'delivery_order_ids': list(event.delivery_order_ids),
+                'event_time': _time_block_dict(event.event_time),
+                'fixed_time': event.fixed_time
+            } for event in plan.delivery_events],
+            'delivery_order_ids': list(plan.delivery_order_ids),
+            'duration': plan.duration,
+            'distance': plan.distance,
+            'mode': plan.mode,
+            'assigned_courier_id': plan.assigned_courier_id,
+            'delivery_plan_id': plan.delivery_plan_id
+        }
+
+    @classmethod
+    def plans_to_dicts(cls, plans: List[Plan]) -> List[dict]:
+        return [cls.plan_to_dict(plan) for plan in plans]
+
+    @staticmethod
+    def time_block_to_dict(time_block: TimeBlock) -> dict:
+        return _time_block_dict(time_block)
@@ -0,0 +1,41 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# forking the worker is not safe - it runs request threads, the OSRM event loop and the Go runtime
+PROCESS_START_METHOD = 'forkserver'
+
+
+class SharedProcessPool:
+    """
+    A process pool of a fixed size living as long as the process and shared by all its threads. A child forked
+    from the process inherits the pool without the threads managing it, so the pool is started again in every
+    process. A broken pool is discarded and the next use starts a new one.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        super().__init__()
+        self.max_workers = max_workers
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context(PROCESS_START_METHOD))
+                self._pid = os.getpid()
+
+            return self._executor
+
+    def discard(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+
+        executor.shutdown(wait=False)
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, ttl: Optional[float] = None) -> Optional[Any]:
+        ttl = self.ttl if ttl is None else ttl
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            stored_at, value = entry
+            if time.monotonic() - stored_at > ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys: List[Hashable], ttl: Optional[float] = None) -> List[Optional[Any]]:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+
+        ret = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[0] > ttl:
+                    del self._entries[key]
+                    entry = None
+
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                ret.append(entry[1] if entry is not None else None)
+
+        return ret
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put_many(self, items: List[Tuple[Hashable, Any]]):
+        with self._lock:
+            now = time.monotonic()
+            for key, value in items:
+                self._entries[key] = (now, value)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def remove(self, key: Hashable, value: Optional[Any] = None):
+        """Removes the entry of the key, when a value is passed only if the entry still holds it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (value is None or entry[1] is value):
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
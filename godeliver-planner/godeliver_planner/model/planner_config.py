@@ -25,6 +25,17 @@ class PenaltyDirection(str, Enum):
     lateness = "LATENESS"
 
 
+class TimetableComputerType(str, Enum):
+    lp = "LP"
+    chain = "CHAIN"
+
+
+class FeasibilityCheckMode(str, Enum):
+    off = "OFF"
+    fail = "FAIL"           # reject the instance before solving
+    relax = "RELAX"         # make the violated hard windows soft
+
+
 class PenaltySpecification(BaseModel):
     is_hard: bool = False
     weight: int = 1
@@ -62,6 +73,41 @@ class PlannerConfig(BaseModel):
     ]
 
     allow_wait_on_drop: bool = True
+    timetable_computer: TimetableComputerType = TimetableComputerType.lp
+    timetable_workers: Optional[int] = None             # worker processes for the timetables of a solution, None computes them in the process
+
+    feasibility_check: FeasibilityCheckMode = FeasibilityCheckMode.fail  # nodes that can't meet their hard windows
+
+    granular_neighbourhood_size: Optional[int] = None   # k nearest successors kept per node, None disables pruning
+
+    decomposition_cluster_size: Optional[int] = None    # deliveries per cluster, None disables the decomposition
+    decomposition_time_weight: float = 0.5              # travel seconds equivalent to a second of pickup time shift
+    decomposition_workers: Optional[int] = None         # worker processes, None uses all CPUs
+    decomposition_repair_time: int = 10                 # seconds spent moving deliveries between clusters
+
+    merge_colocated_pickups: bool = False               # visit pickups at the same place and time as one node
+    pickup_merge_distance: int = 25                     # meters between pickups that are merged
+    pickup_merge_time_tolerance: int = 300              # seconds the merged pickup windows may differ by
+
+    plan_cache_ttl: int = 60                            # seconds a computed plan can be reused, 0 disables the cache
+    plan_cache_position_tolerance: int = 50             # meters of courier drift ignored when matching a cached plan
+    plan_cache_time_tolerance: int = 60                 # seconds of courier start time drift ignored
+
+    routing_cache_ttl: int = 3600                       # seconds a fetched route leg is reused, 0 disables the cache
+    timetable_cache_ttl: int = 30                       # seconds a computed route timetable is reused, 0 disables the cache
+
+    insertion_exact_candidates: int = 8                 # best estimated insertions whose timetable is computed exactly
+    insertion_results: int = 3                          # insertions returned per new delivery
+
+    session_ttl: int = 3600                             # seconds a fleet's planning session is kept without updates
+    session_time_limit: int = 5                         # seconds for re-optimising the routes affected by an update
+
+    admission_deadline: int = 180                       # seconds a solve may take incl. its queue wait, 0 disables shedding
+    admission_degraded_time_limit: int = 10             # seconds of a solve shortened to meet the deadline
+
+    class Config:
+        # resolved once per request and shared by its threads and worker processes, use copy(update=...) for a variant
+        allow_mutation = False
 
     def get_service_time(self, delivery_type: DeliveryEventType):
         if delivery_type == DeliveryEventType.pickup:
@@ -0,0 +1,59 @@
+from typing import List
+
+from flask_restful_swagger_2 import Schema
+from pydantic import BaseModel
+
+from godeliver_planner.model.courier import Courier, CourierModel
+from godeliver_planner.model.delivery import Delivery, DeliveryModel
+from godeliver_planner.model.delivery_event import DeliveryEventType, DeliveryEventTypeModel
+
+
+class CompletedEventModel(Schema):
+    type = 'object'
+    properties = {
+        'delivery_id': {
+            'type': 'string'
+        },
+        'type': DeliveryEventTypeModel
+    }
+    required = ['delivery_id', 'type']
+
+
+class CompletedEvent(BaseModel):
+    delivery_id: str
+    type: DeliveryEventType                     # pickup - the delivery is in progress, drop - it is delivered
+
+
+class SessionUpdateModel(Schema):
+    type = 'object'
+    properties = {
+        'new_deliveries': {
+            'type': 'array',
+            'items': DeliveryModel
+        },
+        'cancelled_delivery_ids': {
+            'type': 'array',
+            'items': {
+                'type': 'string'
+            }
+        },
+        'courier_updates': {
+            'type': 'array',
+            'items': CourierModel
+        },
+        'completed_events': {
+            'type': 'array',
+            'items': CompletedEventModel
+        }
+    }
+
+
+class SessionUpdate(BaseModel):
+    new_deliveries: List[Delivery] = []
+    cancelled_delivery_ids: List[str] = []
+    courier_updates: List[Courier] = []         # new positions of known couriers and couriers that came online
+    completed_events: List[CompletedEvent] = []
+
+    def is_empty(self) -> bool:
+        return not (self.new_deliveries or self.cancelled_delivery_ids or self.courier_updates
+                    or self.completed_events)
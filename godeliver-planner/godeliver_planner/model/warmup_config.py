@@ -0,0 +1,17 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from godeliver_planner.model.planner_config import PlannerType, TimetableComputerType
+
+
+class WarmupConfig(BaseModel):
+    """The warmup section of config.yml."""
+
+    enabled: bool = True
+    instance_file: str = 'warmup_instance.json'         # in the config directory
+    time_limit: int = 1                                 # seconds of every warmup solve
+
+    planner_types: List[PlannerType] = [PlannerType.or_tools, PlannerType.insertion_heuristic,
+                                        PlannerType.or_tools_insertion]
+    timetable_computers: List[TimetableComputerType] = [TimetableComputerType.lp, TimetableComputerType.chain]
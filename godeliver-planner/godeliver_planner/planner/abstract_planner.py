@@ -1,32 +1,47 @@
 from abc import abstractmethod
-from typing import List
+from collections import defaultdict
+from typing import List, Optional
+
+import numpy as np
 
 from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.exceptions import NoSolutionException
 from godeliver_planner.model.courier import Courier
 from godeliver_planner.model.delivery import Delivery
 from godeliver_planner.model.delivery_event import DeliveryEventType, DeliveryEvent
 from godeliver_planner.model.mode import Mode
 from godeliver_planner.model.plan import Plan
-from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.model.planner_config import PlannerConfig, FeasibilityCheckMode
 from godeliver_planner.model.timeblock import TimeBlock
+from godeliver_planner.planner.exceptions.planner_exceptions import PlanningCancelledException
+from godeliver_planner.planner.feasibility_checker import FeasibilityChecker
+from godeliver_planner.planner.planning_progress import PlanningProgress, PlanningStage, NO_PROGRESS
 from godeliver_planner.planner.plan_timetable.fixed_time_computer import FixedTimeComputer
-from godeliver_planner.planner.plan_timetable.lp_plan_timetable_computer import LpPlanTimetableComputer
+from godeliver_planner.planner.plan_timetable.timetable_computer_provider import TimetableComputerProvider
 from godeliver_planner.planner.vrp_instance_builder import VehicleRoutingProblemInstance, VehicleRoutingProblemMapping, \
     VehicleRoutingProblemSolution, VrpInstanceBuilder
 from godeliver_planner.routing.routing_base import RoutingBase
 
+PICKUP_NODE = 1
+DROP_NODE = 2
+
 
 class AbstractPlanner:
+    # whether solve() handles a pickup node shared by several deliveries
+    SUPPORTS_MERGED_PICKUPS = False
 
     def __init__(self, routing: RoutingBase):
         self.instance_builder = VrpInstanceBuilder(routing)
 
-    @property
-    def config(self) -> PlannerConfig:
-        return ConfigProvider.get_config()
+    def __getstate__(self):
+        # a planner sent to a worker process only solves instances, the routing stays in the request's process
+        state = self.__dict__.copy()
+        state['instance_builder'] = VrpInstanceBuilder(routing=None)
+        return state
 
     @abstractmethod
-    def solve(self, data_model: VehicleRoutingProblemInstance) -> VehicleRoutingProblemSolution:
+    def solve(self, data_model: VehicleRoutingProblemInstance,
+              progress: PlanningProgress = NO_PROGRESS) -> VehicleRoutingProblemSolution:
         raise NotImplementedError()
 
     @abstractmethod
@@ -34,15 +49,35 @@ class AbstractPlanner:
         raise NotImplementedError()
 
     def logistics_planner(self, deliveries: List[Delivery], couriers: List[Courier], min_number_of_plans: int,
-                          previous_plans: List[Plan] = None):
+                          previous_plans: List[Plan] = None, time_limit: Optional[int] = None,
+                          progress: PlanningProgress = NO_PROGRESS, config: Optional[PlannerConfig] = None):
+        """None config uses the config of the request, it is resolved once and travels on the instance."""
+        if config is None:
+            config = ConfigProvider.get_config()
+
         deliveries, couriers = self._sort_input(deliveries, couriers)
 
         number_of_plans = max(len(couriers), min_number_of_plans)
 
+        progress.report_stage(PlanningStage.BUILDING_INSTANCE)
+
+        merge_pickups = self.SUPPORTS_MERGED_PICKUPS and config.merge_colocated_pickups
         vrp_instance, vrp_mapping = self.instance_builder.create_instance(deliveries, couriers,
-                                                                          number_of_plans, previous_plans)
+                                                                          number_of_plans, previous_plans,
+                                                                          config=config,
+                                                                          merge_pickups=merge_pickups)
 
-        solution = self.solve(vrp_instance)
+        if time_limit is not None:
+            vrp_instance.time_limit = time_limit
+
+        self._check_feasibility(vrp_instance, vrp_mapping)
+        self._check_cancelled(progress)
+
+        progress.report_stage(PlanningStage.SOLVING)
+        solution = self.solve(vrp_instance, progress)
+        self._check_cancelled(progress)
+
+        progress.report_stage(PlanningStage.CREATING_PLANS)
 
         plans = self.solution_to_plan(vrp_instance=vrp_instance,
                                       vrp_mapping=vrp_mapping,
@@ -54,6 +89,27 @@ class AbstractPlanner:
 
         return plans
 
+    @staticmethod
+    def _check_cancelled(progress: PlanningProgress):
+        if progress.is_cancelled():
+            raise PlanningCancelledException("The planning was cancelled.")
+
+    def _check_feasibility(self, vrp_instance: VehicleRoutingProblemInstance, vrp_mapping: VehicleRoutingProblemMapping):
+        mode = vrp_instance.config.feasibility_check
+        if mode == FeasibilityCheckMode.off:
+            return
+
+        infeasible_nodes = FeasibilityChecker.find_infeasible_nodes(vrp_instance, vrp_mapping)
+        if not infeasible_nodes:
+            return
+
+        reasons = "\n".join(map(lambda x: x.reason, infeasible_nodes))
+        if mode == FeasibilityCheckMode.fail:
+            raise NoSolutionException(f"Instance is infeasible:\n{reasons}")
+
+        print(f"Relaxing hard time windows:\n{reasons}")
+        FeasibilityChecker.relax(infeasible_nodes)
+
     @staticmethod
     def _sort_input(deliveries: List[Delivery], couriers: List[Courier]):
         def get_id(d):
@@ -66,141 +122,124 @@ class AbstractPlanner:
         return deliveries, couriers
 
     @staticmethod
-    def deffer_pickups_in_plan(delivery_events: List[DeliveryEvent]):
-        pickup_location_per_order = {}
+    def deffer_pickups_in_plan(delivery_events: List[DeliveryEvent], event_clusters: List[int]):
+        # orders still in the trunk, per location cluster of the event they were picked up at
+        trunk = defaultdict(dict)
+        order_clusters = {}
 
-        orders_in_trunk = set()
-        for delivery_event in delivery_events:
+        for delivery_event, cluster in zip(delivery_events, event_clusters):
             if delivery_event.type == DeliveryEventType.pickup:
-                if len(orders_in_trunk) > 0:
-                    for order in orders_in_trunk:
-                        original_order_event = pickup_location_per_order[order]
-                        if original_order_event.location.distance_from(delivery_event.location) < 25:
-                            original_order_event.delivery_order_ids.remove(order)
-                            delivery_event.delivery_order_ids.append(order)
+                # an order picked up at the same place earlier is picked up at the latest visit instead
+                for order, original_order_event in trunk[cluster].items():
+                    original_order_event.delivery_order_ids.remove(order)
+                    delivery_event.delivery_order_ids.append(order)
 
                 for delivery_order_id in delivery_event.delivery_order_ids:
-                    orders_in_trunk.add(delivery_order_id)
-                    pickup_location_per_order[delivery_order_id] = delivery_event
+                    trunk[cluster][delivery_order_id] = delivery_event
+                    order_clusters[delivery_order_id] = cluster
             elif delivery_event.type == DeliveryEventType.drop:
                 for delivery_order_id in delivery_event.delivery_order_ids:
-                    try:
-                        orders_in_trunk.remove(delivery_order_id)
-                    except KeyError:
-                        continue
-
-        ret = []
-        for delivery_event in delivery_events:
-            if len(delivery_event.delivery_order_ids) != 0:
-                ret.append(delivery_event)
+                    if delivery_order_id in order_clusters:
+                        del trunk[order_clusters.pop(delivery_order_id)][delivery_order_id]
 
-        return ret
+        return [delivery_event for delivery_event in delivery_events if len(delivery_event.delivery_order_ids) != 0]
 
     @staticmethod
     def solution_to_plan(vrp_solution: VehicleRoutingProblemSolution, vrp_mapping: VehicleRoutingProblemMapping,
                          vrp_instance: VehicleRoutingProblemInstance):
+        num_of_nodes = len(vrp_instance.car_duration_matrix)
+
+        # type, location cluster, location and deliveries of every node
+        node_types = np.zeros(num_of_nodes, dtype=np.int8)
+        node_types[np.fromiter(vrp_mapping.node_to_pickups.keys(), dtype=int)] = PICKUP_NODE
+        node_types[np.fromiter(vrp_mapping.node_to_drop.keys(), dtype=int)] = DROP_NODE
+        node_clusters = np.asarray(vrp_mapping.node_clusters)
+
+        node_locations, node_delivery_ids = {}, {}
+        for node, deliveries in vrp_mapping.node_to_pickups.items():
+            node_locations[node] = deliveries[0].origin
+            node_delivery_ids[node] = [delivery.id for delivery in deliveries]
+        for node, delivery in vrp_mapping.node_to_drop.items():
+            node_locations[node] = delivery.destination
+            node_delivery_ids[node] = [delivery.id]
+
         total_distance = 0
         total_duration = 0
         plans = []
+        plan_event_clusters = []
         for vehicle_idx, (route, etas, etds) in enumerate(
                 zip(vrp_solution.plans, vrp_solution.etas, vrp_solution.etds)):
-            plan_output = 'Route for vehicle {}:\n'.format(vehicle_idx)
-            route_distance = 0
 
             plan = Plan(delivery_events=[], delivery_order_ids=[], duration=0, distance=0, mode=Mode.CAR)
 
             if vehicle_idx in vrp_mapping.plan_idx_to_courier_id:
                 plan.assigned_courier_id = vrp_mapping.plan_idx_to_courier_id[vehicle_idx]
 
-            delivery_events = []
-            last_event = None
-            previous_node = None
-
-            start_time = None
-            for node, eta, etd in zip(route, etas, etds):
-
-                if start_time is None:
-                    start_time = eta
-
-                if node in vrp_mapping.node_to_pickup:
-                    delivery = vrp_mapping.node_to_pickup[node]
-                    location = delivery.origin
-                    delivery_type = DeliveryEventType.pickup
-                elif node in vrp_mapping.node_to_drop:
-                    delivery = vrp_mapping.node_to_drop[node]
-                    location = delivery.destination
-                    delivery_type = DeliveryEventType.drop
-                else:
-                    continue
-
-                arrival_time = eta
-                departure_time = etd
-
-                if last_event is None \
-                        or last_event.location.distance_from(location) > 25 \
-                        or last_event.type != delivery_type \
-                        or delivery_type == DeliveryEventType.drop:
-
-                    if last_event is not None and previous_node is not None:
-                        travel_duration = vrp_instance.car_duration_matrix[previous_node][node]
-
-                        # is this really necessary??
-                        last_event.event_time.to_time = max(last_event.event_time.to_time,
-                                                            arrival_time - travel_duration)
-
-                    delivery_event = DeliveryEvent(
-                        type=delivery_type,
-                        location=location,
-                        delivery_order_ids=[delivery.id],
-                        event_time=TimeBlock(
-                            from_time=arrival_time,
-                            to_time=departure_time
-                        )
-                    )
-                    delivery_events.append(delivery_event)
-                    last_event = delivery_event
-                else:
-                    last_event.delivery_order_ids.append(delivery.id)
-                    last_event.event_time.from_time = min(last_event.event_time.from_time, arrival_time)
-                    last_event.event_time.to_time = max(last_event.event_time.to_time, departure_time)
+            route_nodes = np.asarray(route, dtype=int)
+            is_task = node_types[route_nodes] != 0
+            nodes = route_nodes[is_task]
+            types = node_types[nodes]
+            clusters = node_clusters[nodes]
 
-                plan.delivery_order_ids.append(delivery.id)
+            # consecutive pickups at the same place form one event, every drop is an event of its own
+            event_starts = np.ones(len(nodes), dtype=bool)
+            event_starts[1:] = (clusters[1:] != clusters[:-1]) | (types[1:] != types[:-1]) | (types[1:] == DROP_NODE)
+            event_starts = np.flatnonzero(event_starts)
 
-                if previous_node:
-                    route_distance += vrp_instance.car_distance_matrix[previous_node][node]
+            nodes = nodes.tolist()
+            arrivals = np.asarray(etas)[is_task]
+            departures = np.asarray(etds)[is_task]
 
-                previous_node = node
+            legs = list(zip(nodes[:-1], nodes[1:]))
+            route_distance = round(sum(vrp_instance.car_distance_matrix[a][b] for a, b in legs), 3)
+
+            delivery_events = []
+            if nodes:
+                from_times = np.minimum.reduceat(arrivals, event_starts).tolist()
+                to_times = np.maximum.reduceat(departures, event_starts).tolist()
+
+                # an event lasts at least until the courier has to leave for the next one
+                for event_idx, node_idx in enumerate(event_starts[1:].tolist()):
+                    travel_duration = vrp_instance.car_duration_matrix[nodes[node_idx - 1]][nodes[node_idx]]
+                    to_times[event_idx] = max(to_times[event_idx], int(arrivals[node_idx]) - travel_duration)
+
+                event_ends = event_starts[1:].tolist() + [len(nodes)]
+                for from_node, to_node, from_time, to_time in zip(event_starts.tolist(), event_ends,
+                                                                  from_times, to_times):
+                    delivery_events.append(DeliveryEvent(
+                        type=DeliveryEventType.pickup if types[from_node] == PICKUP_NODE else DeliveryEventType.drop,
+                        location=node_locations[nodes[from_node]],
+                        delivery_order_ids=[delivery_id for node in nodes[from_node:to_node]
+                                            for delivery_id in node_delivery_ids[node]],
+                        event_time=TimeBlock(
+                            from_time=from_time,
+                            to_time=to_time
+                        )
+                    ))
 
             route_duration = round(etas[-1] - etds[0], 3)
-            route_distance = round(route_distance, 3)
             plan.delivery_events = delivery_events
+            plan.delivery_order_ids = list(set(delivery_id for node in nodes for delivery_id in node_delivery_ids[node]))
             plan.distance = route_distance
             plan.duration = route_duration
 
-            plan.delivery_order_ids = list(set(plan.delivery_order_ids))
-
-            print(plan_output)
             total_distance += route_distance
             total_duration += route_duration
-            print(plan)
             plans.append(plan)
-
-            print(f"route duration: {route_duration} sec")
-            print(f"route distance: {route_distance} m")
+            plan_event_clusters.append(clusters[event_starts].tolist())
 
         print('Total Duration of all routes: {} sec'.format(total_duration))
-        print('\nTotal Distance of all routes: {} m'.format(total_distance))
+        print('Total Distance of all routes: {} m'.format(total_distance))
 
-        for plan in plans:
-            plan.delivery_events = AbstractPlanner.deffer_pickups_in_plan(plan.delivery_events)
+        for plan, event_clusters in zip(plans, plan_event_clusters):
+            plan.delivery_events = AbstractPlanner.deffer_pickups_in_plan(plan.delivery_events, event_clusters)
 
-        for idx, plan in enumerate(plans):
-            fixed_times = FixedTimeComputer.compute_fixed_times(plan=plan,
-                                                                start_node=vrp_instance.starts[idx],
-                                                                vrp_instance=vrp_instance,
-                                                                vrp_mapping=vrp_mapping)
-
-            for event, fixed_time in zip(plan.delivery_events, fixed_times):
+        fixed_times = FixedTimeComputer.compute_fixed_times_for_plans(plans=plans,
+                                                                      start_nodes=vrp_instance.starts[:len(plans)],
+                                                                      vrp_instance=vrp_instance,
+                                                                      vrp_mapping=vrp_mapping)
+        for plan, plan_fixed_times in zip(plans, fixed_times):
+            for event, fixed_time in zip(plan.delivery_events, plan_fixed_times):
                 event.fixed_time = fixed_time
 
         return plans
@@ -214,15 +253,24 @@ class AbstractPlanner:
             etds=[]
         )
 
-        for i in range(len(solution.plans)):
-            etas, etds, _ = LpPlanTimetableComputer().compute_optimal_timetable(
-                drop_nodes=vrp_instance.drop_nodes,
-                pickup_nodes=vrp_instance.pickup_nodes,
-                car_duration_matrix=vrp_instance.car_duration_matrix,
-                route=solution.plans[i],
-                time_windows=vrp_instance.time_windows_dict
-            )
-            ret.etas.append(etas)
-            ret.etds.append(etds)
-
-        return ret
\ No newline at end of file
+        computer = TimetableComputerProvider.get_timetable_computer(vrp_instance.config)
+        timetables = computer.compute_optimal_timetables(
+            drop_nodes=vrp_instance.drop_nodes,
+            pickup_nodes=vrp_instance.pickup_nodes,
+            car_duration_matrix=vrp_instance.car_duration_matrix,
+            routes=solution.plans,
+            time_windows=vrp_instance.time_windows_dict,
+            config=vrp_instance.config
+        )
+
+        for i, timetable in enumerate(timetables):
+            if timetable.success:
+                ret.etas.append(timetable.etas)
+                ret.etds.append(timetable.etds)
+            else:
+                # keep the times of the solver for the route
+                print(f"Unable to optimize the timetable of route {solution.plans[i]} - {timetable.error}")
+                ret.etas.append(solution.etas[i])
+                ret.etds.append(solution.etds[i])
+
+        return ret
@@ -1,6 +1,7 @@
 import ctypes
 import json
 import os
+import threading
 import time
 
 from godeliver_planner.planner.exceptions.planner_exceptions import PlanUnfeasibleException
@@ -13,16 +14,36 @@ def get_go_lib_path():
     return f
 
 
+GO_FUNCTIONS = ['HALNS', 'JackpotHeuristics', 'GOInsertionHeuristics']
+
+_go_library = None
+_go_library_lock = threading.Lock()
+
+
+def get_go_library() -> ctypes.CDLL:
+    """The library is loaded and its functions are typed once per process."""
+    global _go_library
+
+    with _go_library_lock:
+        if _go_library is None:
+            so = ctypes.cdll.LoadLibrary(get_go_lib_path())
+            for function in GO_FUNCTIONS:
+                solver = getattr(so, function)
+                solver.argtypes = [ctypes.c_char_p]
+                solver.restype = ctypes.c_void_p
+            so.free.argtypes = [ctypes.c_void_p]
+            _go_library = so
+
+    return _go_library
+
+
 class GoLangAdapter:
     def _call_go_library(self, vrp_instance: VehicleRoutingProblemInstance, function: str,
                          name: str) -> VehicleRoutingProblemSolution:
         encoded_instance = vrp_instance.to_json().encode('utf-8')
-        so = ctypes.cdll.LoadLibrary(get_go_lib_path())
+        so = get_go_library()
         solver = getattr(so, function)
-        solver.argtypes = [ctypes.c_char_p]
-        solver.restype = ctypes.c_void_p
         free = so.free
-        free.argtypes = [ctypes.c_void_p]
         print(f"{name} Started")
         start_t = time.time()
         res = solver(encoded_instance)
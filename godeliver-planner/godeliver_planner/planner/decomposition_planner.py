@@ -0,0 +1,354 @@
+import math
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+
+import numpy as np
+
+from godeliver_planner.helper.process_pool import SharedProcessPool
+from godeliver_planner.planner.abstract_planner import AbstractPlanner
+from godeliver_planner.planner.exceptions.planner_exceptions import PlanUnfeasibleException
+from godeliver_planner.planner.planning_progress import PlanningProgress, NO_PROGRESS
+from godeliver_planner.planner.plan_timetable.timetable_computer_provider import TimetableComputerProvider
+from godeliver_planner.planner.vrp_instance_builder import VehicleRoutingProblemInstance, \
+    VehicleRoutingProblemSolution, VrpInstanceBuilder
+from godeliver_planner.routing.routing_base import RoutingBase
+
+BOUNDARY_RATIO = 0.75           # requests closer than this to another cluster's seed are repair candidates
+REPAIR_POSITIONS = 3            # insertion positions evaluated with the timetable per target plan
+CLUSTER_CAPACITY_SLACK = 1.2
+MEDOID_ITERATIONS = 3
+DECOMPOSITION_POOL_WORKERS = os.cpu_count() or 1
+
+# the pool outlives the solve and is shared by all decomposed solves of the process
+_sub_solve_pool = SharedProcessPool(max_workers=DECOMPOSITION_POOL_WORKERS)
+
+
+def _solve_sub_instances(planner: AbstractPlanner,
+                         vrp_instances: List[VehicleRoutingProblemInstance]) -> List[VehicleRoutingProblemSolution]:
+    # the config of the request travels to the worker process on the instance
+    return [planner.solve(vrp_instance) for vrp_instance in vrp_instances]
+
+
+class DecompositionPlanner(AbstractPlanner):
+    """
+    Cluster-first planner for very large instances. Requests are clustered by travel time between their first
+    stops and by the start of their time windows, each cluster gets a share of the plans and is solved by the
+    wrapped planner in a worker process. Requests on the cluster boundaries are then moved between plans of
+    adjacent clusters whenever it lowers the cost.
+    """
+
+    def __init__(self, routing: RoutingBase, planner: AbstractPlanner):
+        super().__init__(routing)
+        self.planner = planner
+
+    def get_name(self) -> str:
+        return f"{self.planner.get_name()}_DECOMPOSITION"
+
+    def solve(self, vrp_instance: VehicleRoutingProblemInstance,
+              progress: PlanningProgress = NO_PROGRESS) -> VehicleRoutingProblemSolution:
+        config = vrp_instance.config
+
+        num_requests = len(vrp_instance.deliveries_not_started) + len(vrp_instance.deliveries_in_progress)
+        num_clusters = min(math.ceil(num_requests / config.decomposition_cluster_size),
+                           vrp_instance.num_plans_to_create)
+
+        if num_clusters <= 1:
+            return self.planner.solve(vrp_instance, progress)
+
+        start_t = time.time()
+        durations = vrp_instance.car_duration_array
+
+        requests = [(pickup, drop, None) for pickup, drop in vrp_instance.deliveries_not_started] + \
+                   [(None, drop, vehicle) for vehicle, drop in vrp_instance.deliveries_in_progress]
+
+        request_clusters, seed_distances = self._cluster_requests(vrp_instance, durations, requests, num_clusters)
+        vehicle_clusters = self._assign_vehicles(vrp_instance, durations, requests, request_clusters,
+                                                 seed_distances, num_clusters)
+
+        request_clusters, seed_distances, vehicle_clusters = \
+            self._balance_clusters(requests, request_clusters, seed_distances, vehicle_clusters)
+
+        sub_instances = []
+        for cluster in range(seed_distances.shape[1]):
+            vehicles = [v for v, c in enumerate(vehicle_clusters) if c == cluster]
+            members = [requests[idx] for idx in np.flatnonzero(request_clusters == cluster)]
+            sub_instance, nodes = VrpInstanceBuilder.create_sub_instance(
+                vrp_instance=vrp_instance,
+                vehicles=vehicles,
+                deliveries_not_started=[(pickup, drop) for pickup, drop, vehicle in members if vehicle is None],
+                deliveries_in_progress=[(vehicle, drop) for pickup, drop, vehicle in members if vehicle is not None]
+            )
+            sub_instances.append((vehicles, sub_instance, nodes))
+
+        workers = min(config.decomposition_workers or DECOMPOSITION_POOL_WORKERS, DECOMPOSITION_POOL_WORKERS,
+                      len(sub_instances))
+        rounds = math.ceil(len(sub_instances) / workers)
+        sub_time_limit = max(1, (vrp_instance.time_limit - config.decomposition_repair_time) // rounds)
+        for _, sub_instance, _ in sub_instances:
+            sub_instance.time_limit = sub_time_limit
+
+        print(f"Decomposition into {len(sub_instances)} clusters of sizes "
+              f"{[len(sub.drop_nodes) for _, sub, _ in sub_instances]} solved by {workers} workers")
+
+        # a worker solves its clusters one after another
+        chunks = [list(range(worker, len(sub_instances), workers)) for worker in range(workers)]
+        executor = _sub_solve_pool.get_executor()
+        try:
+            futures = [executor.submit(_solve_sub_instances, self.planner,
+                                       [sub_instances[idx][1] for idx in chunk]) for chunk in chunks]
+            sub_solutions = [None] * len(sub_instances)
+            for chunk, future in zip(chunks, futures):
+                for idx, sub_solution in zip(chunk, future.result()):
+                    sub_solutions[idx] = sub_solution
+        except BrokenProcessPool:
+            _sub_solve_pool.discard(executor)
+            raise
+
+        routes = [None] * vrp_instance.num_plans_to_create
+        etas = [None] * vrp_instance.num_plans_to_create
+        etds = [None] * vrp_instance.num_plans_to_create
+        for (vehicles, _, nodes), sub_solution in zip(sub_instances, sub_solutions):
+            for sub_vehicle, vehicle in enumerate(vehicles):
+                routes[vehicle] = [nodes[node] for node in sub_solution.plans[sub_vehicle]]
+                etas[vehicle] = sub_solution.etas[sub_vehicle]
+                etds[vehicle] = sub_solution.etds[sub_vehicle]
+
+        solution = VehicleRoutingProblemSolution(plans=routes, etas=etas, etds=etds)
+
+        repair_deadline = start_t + vrp_instance.time_limit
+        solution = self._repair_boundaries(vrp_instance, solution, requests, request_clusters,
+                                           seed_distances, vehicle_clusters, repair_deadline)
+
+        print(f"Decomposition finished in time {time.time() - start_t}")
+        return solution
+
+    def _cluster_requests(self, vrp_instance: VehicleRoutingProblemInstance, durations: np.ndarray,
+                          requests: List[Tuple], num_clusters: int) -> (np.ndarray, np.ndarray):
+        anchors = np.array([pickup if pickup is not None else drop for pickup, drop, _ in requests])
+
+        default_time = min(tw.from_time for tw in vrp_instance.start_time_windows)
+        anchor_times = np.array([max([tw.from_time for tw in vrp_instance.time_windows_dict.get(node, [])
+                                      if tw.has_lower_bound()], default=default_time) for node in anchors])
+
+        travel = durations[np.ix_(anchors, anchors)]
+        metric = (travel + travel.T) / 2 + \
+            vrp_instance.config.decomposition_time_weight * np.abs(anchor_times[:, None] - anchor_times[None, :])
+
+        # farthest point seeding followed by a few capacitated k-medoids iterations
+        seeds = [int(np.argmin(metric.sum(axis=1)))]
+        while len(seeds) < num_clusters:
+            seeds.append(int(np.argmax(metric[:, seeds].min(axis=1))))
+
+        capacity = math.ceil(CLUSTER_CAPACITY_SLACK * len(requests) / num_clusters)
+        assignment = None
+        for _ in range(MEDOID_ITERATIONS):
+            assignment = self._capacitated_assignment(metric[:, seeds], capacity)
+            seeds = [int(members[np.argmin(metric[np.ix_(members, members)].sum(axis=1))])
+                     for members in (np.flatnonzero(assignment == c) for c in range(num_clusters))]
+
+        return assignment, metric[:, seeds]
+
+    @staticmethod
+    def _capacitated_assignment(distances: np.ndarray, capacity: int) -> np.ndarray:
+        assignment = np.full(len(distances), -1)
+        loads = np.zeros(distances.shape[1], dtype=int)
+
+        for flat_idx in np.argsort(distances, axis=None):
+            request, cluster = divmod(int(flat_idx), distances.shape[1])
+            if assignment[request] < 0 and loads[cluster] < capacity:
+                assignment[request] = cluster
+                loads[cluster] += 1
+
+        return assignment
+
+    @staticmethod
+    def _assign_vehicles(vrp_instance: VehicleRoutingProblemInstance, durations: np.ndarray, requests: List[Tuple],
+                         request_clusters: np.ndarray, seed_distances: np.ndarray, num_clusters: int) -> List[int]:
+        num_plans = vrp_instance.num_plans_to_create
+        sizes = np.bincount(request_clusters, minlength=num_clusters)
+
+        quotas = np.maximum(1, np.round(num_plans * sizes / sizes.sum())).astype(int)
+        while quotas.sum() > num_plans:
+            quotas[np.argmax(np.where(quotas > 1, quotas, 0))] -= 1
+        while quotas.sum() < num_plans:
+            quotas[np.argmax(sizes / quotas)] += 1
+
+        vehicle_clusters = [-1] * num_plans
+
+        # vehicles with deliveries in progress follow the majority of their deliveries
+        pinned = {}
+        for idx, (_, _, vehicle) in enumerate(requests):
+            if vehicle is not None:
+                pinned.setdefault(vehicle, []).append(request_clusters[idx])
+        for vehicle, clusters in pinned.items():
+            cluster = int(np.bincount(clusters).argmax())
+            vehicle_clusters[vehicle] = cluster
+            quotas[cluster] -= 1
+
+        seed_nodes = [requests[int(np.argmin(seed_distances[:, c]))] for c in range(num_clusters)]
+        seed_nodes = [pickup if pickup is not None else drop for pickup, drop, _ in seed_nodes]
+
+        free_vehicles = [v for v in range(num_plans) if vehicle_clusters[v] < 0]
+        if not free_vehicles:
+            return vehicle_clusters
+
+        start_to_seed = durations[np.ix_([vrp_instance.starts[v] for v in free_vehicles], seed_nodes)]
+        for flat_idx in np.argsort(start_to_seed, axis=None):
+            vehicle_idx, cluster = divmod(int(flat_idx), num_clusters)
+            vehicle = free_vehicles[vehicle_idx]
+            if vehicle_clusters[vehicle] < 0 and quotas[cluster] > 0:
+                vehicle_clusters[vehicle] = cluster
+                quotas[cluster] -= 1
+
+        # quotas overdrawn by pinned vehicles leave some vehicles unassigned - they go to the busiest cluster
+        for vehicle in free_vehicles:
+            if vehicle_clusters[vehicle] < 0:
+                counts = np.bincount([c for c in vehicle_clusters if c >= 0], minlength=num_clusters)
+                cluster = int(np.argmax(sizes / np.maximum(counts, 1)))
+                vehicle_clusters[vehicle] = cluster
+
+        return vehicle_clusters
+
+    @staticmethod
+    def _balance_clusters(requests: List[Tuple], request_clusters: np.ndarray, seed_distances: np.ndarray,
+                          vehicle_clusters: List[int]) -> (np.ndarray, np.ndarray, List[int]):
+        # clusters which ended up without a plan hand their requests over to the closest cluster with one
+        clusters_with_plans = sorted(set(vehicle_clusters))
+        cluster_to_idx = {cluster: idx for idx, cluster in enumerate(clusters_with_plans)}
+        seed_distances = seed_distances[:, clusters_with_plans]
+        vehicle_clusters = [cluster_to_idx[cluster] for cluster in vehicle_clusters]
+
+        request_clusters = np.array([cluster_to_idx.get(cluster, -1) for cluster in request_clusters])
+        orphans = request_clusters < 0
+        request_clusters[orphans] = np.argmin(seed_distances[orphans], axis=1)
+        for idx, (_, _, vehicle) in enumerate(requests):
+            if vehicle is not None:
+                request_clusters[idx] = vehicle_clusters[vehicle]
+
+        # and clusters left without requests hand their plans over to the busiest cluster
+        sizes = np.bincount(request_clusters, minlength=len(clusters_with_plans))
+        if np.all(sizes > 0):
+            return request_clusters, seed_distances, vehicle_clusters
+
+        for vehicle, cluster in enumerate(vehicle_clusters):
+            if sizes[cluster] == 0:
+                counts = np.bincount(vehicle_clusters, minlength=len(sizes))
+                vehicle_clusters[vehicle] = int(np.argmax(sizes / np.maximum(counts, 1)))
+
+        return DecompositionPlanner._balance_clusters(requests, request_clusters, seed_distances, vehicle_clusters)
+
+    def _route_cost(self, vrp_instance: VehicleRoutingProblemInstance, distances: np.ndarray, route: List[int]):
+        try:
+            computer = TimetableComputerProvider.get_timetable_computer(vrp_instance.config)
+            etas, etds, penalty = computer.compute_optimal_timetable(
+                drop_nodes=vrp_instance.drop_nodes,
+                pickup_nodes=vrp_instance.pickup_nodes,
+                car_duration_matrix=vrp_instance.car_duration_matrix,
+                route=route,
+                time_windows=vrp_instance.time_windows_dict,
+                config=vrp_instance.config
+            )
+        except (PlanUnfeasibleException, ValueError):
+            return math.inf, None, None
+
+        return penalty + distances[route[:-1], route[1:]].sum(), etas, etds
+
+    def _repair_boundaries(self, vrp_instance: VehicleRoutingProblemInstance,
+                           solution: VehicleRoutingProblemSolution, requests: List[Tuple],
+                           request_clusters: np.ndarray, seed_distances: np.ndarray, vehicle_clusters: List[int],
+                           deadline: float) -> VehicleRoutingProblemSolution:
+        if seed_distances.shape[1] < 2:
+            return solution
+
+        distances = np.asarray(vrp_instance.car_distance_matrix, dtype=np.int64)
+        routes = [list(route) for route in solution.plans]
+        costs = [None] * len(routes)
+
+        ordered = np.sort(seed_distances, axis=1)
+        ratios = ordered[:, 0] / np.maximum(ordered[:, 1], 1)
+        candidates = [idx for idx in np.argsort(-ratios)
+                      if ratios[idx] > BOUNDARY_RATIO and requests[idx][2] is None]
+
+        moves = 0
+        for idx in candidates:
+            if time.time() > deadline:
+                break
+
+            pickup, drop, _ = requests[idx]
+            source = next((v for v, route in enumerate(routes) if drop in route), None)
+            if source is None:
+                # the sub-solve left the delivery unassigned
+                continue
+            neighbour_cluster = next(int(c) for c in np.argsort(seed_distances[idx]) if c != request_clusters[idx])
+
+            if costs[source] is None:
+                costs[source] = self._route_cost(vrp_instance, distances, routes[source])
+            reduced = [node for node in routes[source] if node not in (pickup, drop)]
+            reduced_cost = self._route_cost(vrp_instance, distances, reduced)
+            gain = costs[source][0] - reduced_cost[0]
+
+            best = None
+            for target in (v for v, c in enumerate(vehicle_clusters) if c == neighbour_cluster):
+                if costs[target] is None:
+                    costs[target] = self._route_cost(vrp_instance, distances, routes[target])
+                for candidate in self._cheapest_insertions(distances, routes[target], pickup, drop,
+                                                           end=vrp_instance.ends[target]):
+                    if not self._fits_capacity(vrp_instance, target, candidate):
+                        continue
+                    candidate_cost = self._route_cost(vrp_instance, distances, candidate)
+                    delta = candidate_cost[0] - costs[target][0]
+                    if delta < gain and (best is None or delta < best[0]):
+                        best = delta, target, candidate, candidate_cost
+
+            if best is not None:
+                _, target, candidate, candidate_cost = best
+                routes[source], costs[source] = reduced, reduced_cost
+                routes[target], costs[target] = candidate, candidate_cost
+                request_clusters[idx] = neighbour_cluster
+                moves += 1
+
+        print(f"Boundary repair moved {moves} of {len(candidates)} candidate deliveries")
+
+        for vehicle, cost in enumerate(costs):
+            solution.plans[vehicle] = routes[vehicle]
+            if cost is not None and cost[1] is not None:
+                solution.etas[vehicle], solution.etds[vehicle] = cost[1], cost[2]
+
+        return solution
+
+    @staticmethod
+    def _fits_capacity(vrp_instance: VehicleRoutingProblemInstance, vehicle: int, route: List[int]) -> bool:
+        if vrp_instance.courier_capacities is None:
+            return True
+
+        loads = vrp_instance.start_utilizations[vehicle] + \
+            np.cumsum([vrp_instance.node_demands[node] or 0 for node in route])
+        return bool(np.all(loads <= vrp_instance.courier_capacities[vehicle]))
+
+    @staticmethod
+    def _cheapest_insertions(distances: np.ndarray, route: List[int], pickup: int, drop: int,
+                             end: int) -> List[List[int]]:
+        # routes from some planners do not contain the end node, the gap before it is a valid position anyway
+        has_end = route[-1] == end
+        padded = route if has_end else route + [end]
+
+        before, after = np.array(padded[:-1]), np.array(padded[1:])
+        pickup_detour = distances[before, pickup] + distances[pickup, after] - distances[before, after]
+        drop_detour = distances[before, drop] + distances[drop, after] - distances[before, after]
+
+        # detour[i, j] - pickup inserted into gap i and drop into gap j >= i
+        detour = pickup_detour[:, None] + drop_detour[None, :]
+        np.fill_diagonal(detour, distances[before, pickup] + distances[pickup, drop] +
+                         distances[drop, after] - distances[before, after])
+        detour[np.tril_indices(len(before), k=-1)] = np.iinfo(np.int64).max
+
+        ret = []
+        for flat_idx in np.argsort(detour, axis=None)[:REPAIR_POSITIONS]:
+            i, j = divmod(int(flat_idx), len(before))
+            if detour[i, j] == np.iinfo(np.int64).max:
+                break
+            candidate = padded[:i + 1] + [pickup] + padded[i + 1:j + 1] + [drop] + padded[j + 1:]
+            ret.append(candidate if has_end else candidate[:-1])
+        return ret
@@ -1,2 +1,6 @@
 class PlanUnfeasibleException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class PlanningCancelledException(Exception):
+    pass
@@ -0,0 +1,107 @@
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from godeliver_planner.planner.vrp_instance_builder import VehicleRoutingProblemInstance, \
+    VehicleRoutingProblemMapping, TimeWindowConstraint, MAX_TIMESTAMP_VALUE
+
+
+class InfeasibleNode:
+
+    def __init__(self, node: int, reason: str, time_windows: List[TimeWindowConstraint]) -> None:
+        super().__init__()
+        self.node = node
+        self.reason = reason
+        self.time_windows = time_windows    # hard windows that can not be met
+
+    def __str__(self) -> str:
+        return f"Node {self.node}: {self.reason}"
+
+
+class FeasibilityChecker:
+    """
+    Finds nodes whose hard time windows can not be met by any route. The earliest time a node can be served is
+    bounded by the courier start times, the travel times from the courier starts and, for drops, by the earliest
+    pickup of the same delivery. Durations are shortest path travel times, so a direct trip is never slower
+    than a detour over other nodes.
+    """
+
+    @staticmethod
+    def _format_time(timestamp: int) -> str:
+        return datetime.fromtimestamp(timestamp).strftime('%H:%M')
+
+    @staticmethod
+    def find_infeasible_nodes(vrp_instance: VehicleRoutingProblemInstance,
+                              vrp_mapping: Optional[VehicleRoutingProblemMapping] = None) -> List[InfeasibleNode]:
+        durations = vrp_instance.car_duration_array
+        num_of_nodes = len(durations)
+
+        start_times = np.zeros(vrp_instance.num_plans_to_create, dtype=np.int64)
+        for tw in vrp_instance.start_time_windows:
+            start_times[tw.node] = tw.from_time
+
+        hard_from = np.zeros(num_of_nodes, dtype=np.int64)
+        hard_to = np.full(num_of_nodes, MAX_TIMESTAMP_VALUE, dtype=np.int64)
+        hard_time_windows = [[] for _ in range(num_of_nodes)]
+        for tw in filter(lambda x: x.is_hard, vrp_instance.node_time_windows):
+            hard_time_windows[tw.node].append(tw)
+            if tw.has_lower_bound():
+                hard_from[tw.node] = max(hard_from[tw.node], tw.from_time)
+            if tw.has_upper_bound():
+                hard_to[tw.node] = min(hard_to[tw.node], tw.to_time)
+
+        # arrival at every node when driving there directly from each courier start
+        arrivals_from_starts = start_times[:, None] + durations[vrp_instance.starts, :]
+
+        earliest = np.maximum(arrivals_from_starts.min(axis=0), hard_from)
+
+        if vrp_instance.deliveries_in_progress:
+            couriers, drops = map(np.array, zip(*vrp_instance.deliveries_in_progress))
+            earliest[drops] = np.maximum(arrivals_from_starts[couriers, drops], hard_from[drops])
+
+        if vrp_instance.deliveries_not_started:
+            pickups, drops = map(np.array, zip(*vrp_instance.deliveries_not_started))
+            after_pickup = earliest[pickups] + vrp_instance.pickup_service_time + durations[pickups, drops]
+            earliest[drops] = np.maximum(earliest[drops], after_pickup)
+
+        def describe(node: int) -> str:
+            if vrp_mapping is None:
+                return f"node {node}"
+            if node in vrp_mapping.node_to_pickups:
+                return f"pickup of {', '.join(d.id for d in vrp_mapping.node_to_pickups[node])}"
+            if node in vrp_mapping.node_to_drop:
+                return f"drop of {vrp_mapping.node_to_drop[node].id}"
+            return f"node {node}"
+
+        ret = []
+
+        task_nodes = np.arange(2 * vrp_instance.num_plans_to_create, num_of_nodes)
+        conflicting = task_nodes[hard_from[task_nodes] > hard_to[task_nodes]]
+        for node in conflicting:
+            ret.append(InfeasibleNode(
+                node=int(node),
+                reason=f"hard windows of the {describe(node)} do not overlap "
+                       f"({FeasibilityChecker._format_time(hard_from[node])} > "
+                       f"{FeasibilityChecker._format_time(hard_to[node])})",
+                time_windows=hard_time_windows[node]
+            ))
+
+        late = task_nodes[(earliest[task_nodes] > hard_to[task_nodes]) & (hard_from[task_nodes] <= hard_to[task_nodes])]
+        for node in late:
+            ret.append(InfeasibleNode(
+                node=int(node),
+                reason=f"the {describe(node)} can not be reached before "
+                       f"{FeasibilityChecker._format_time(earliest[node])}, "
+                       f"its hard window closes at {FeasibilityChecker._format_time(hard_to[node])}",
+                time_windows=[tw for tw in hard_time_windows[node] if tw.has_upper_bound()]
+            ))
+
+        return ret
+
+    @staticmethod
+    def relax(infeasible_nodes: List[InfeasibleNode]):
+        # the constraints are shared with time_windows_dict of the instance, so one change is enough
+        for infeasible_node in infeasible_nodes:
+            for tw in infeasible_node.time_windows:
+                tw.is_hard = False
@@ -1,9 +1,12 @@
 import copy
 from datetime import datetime
+from typing import Optional
+
 from godeliver_planner.model.planner_config import PlannerType
 from godeliver_planner.planner.abstract_planner import AbstractPlanner
 from godeliver_planner.planner.insertion_heuristics_planner import InsertionHeuristicsPlanner
 from godeliver_planner.planner.ortools_planner import ORToolsPlanner
+from godeliver_planner.planner.planning_progress import PlanningProgress, NO_PROGRESS
 from godeliver_planner.planner.vrp_instance_builder import VehicleRoutingProblemInstance, VehicleRoutingProblemSolution
 from godeliver_planner.routing.routing_base import RoutingBase
 
@@ -13,12 +16,14 @@ class InsertionHeuristicORToolsPlanner(AbstractPlanner):
     def get_name(self) -> str:
         return PlannerType.go_or_tools_insertion.value
 
-    def __init__(self, routing: RoutingBase):
+    def __init__(self, routing: RoutingBase, ortools_planner: Optional[ORToolsPlanner] = None,
+                 insertion_planner: Optional[InsertionHeuristicsPlanner] = None):
         super().__init__(routing)
-        self.ortools_planner = ORToolsPlanner(routing=routing)
-        self.insertion_planner = InsertionHeuristicsPlanner(routing=routing)
+        self.ortools_planner = ortools_planner or ORToolsPlanner(routing=routing)
+        self.insertion_planner = insertion_planner or InsertionHeuristicsPlanner(routing=routing)
 
-    def solve(self, vrp_instance: VehicleRoutingProblemInstance) -> VehicleRoutingProblemSolution:
+    def solve(self, vrp_instance: VehicleRoutingProblemInstance,
+              progress: PlanningProgress = NO_PROGRESS) -> VehicleRoutingProblemSolution:
         start_time = datetime.now()
         original_vrp_instance = copy.deepcopy(vrp_instance)
         solution = self.insertion_planner.solve(vrp_instance)
@@ -31,4 +36,4 @@ class InsertionHeuristicORToolsPlanner(AbstractPlanner):
             r.append(plan[1:-1])
         original_vrp_instance.previous_plans = r
 
-        return self.ortools_planner.solve(original_vrp_instance)
+        return self.ortools_planner.solve(original_vrp_instance, progress)
@@ -0,0 +1,437 @@
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.model.courier import Courier
+from godeliver_planner.model.delivery import Delivery
+from godeliver_planner.model.delivery_event import DeliveryEvent, DeliveryEventType
+from godeliver_planner.model.location import Location
+from godeliver_planner.model.mode import Mode
+from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.model.timeblock import TimeBlock
+from godeliver_planner.planner.exceptions.planner_exceptions import PlanUnfeasibleException
+from godeliver_planner.planner.plan_timetable.chain_plan_timetable_computer import ChainPlanTimetableComputer, \
+    HARD_WEIGHT
+from godeliver_planner.planner.plan_timetable.plan_timetable_optimizer import PlanTimetableOptimizer
+from godeliver_planner.planner.vrp_instance_builder import VrpInstanceBuilder, TimeWindowConstraint
+from godeliver_planner.routing.routing_base import RoutingBase
+
+
+class InsertionOption:
+
+    def __init__(self, delivery_id: str, courier_id: str, plan: Plan, pickup_event_idx: int, drop_event_idx: int,
+                 cost: float, distance_delta: float, penalty_delta: float) -> None:
+        super().__init__()
+        self.delivery_id = delivery_id
+        self.courier_id = courier_id
+        self.plan = plan                            # plan of the courier with the delivery inserted
+        self.pickup_event_idx = pickup_event_idx
+        self.drop_event_idx = drop_event_idx
+        self.cost = cost                            # distance_delta + penalty_delta, the objective of the planners
+        self.distance_delta = distance_delta
+        self.penalty_delta = penalty_delta
+
+    @property
+    def pickup_time(self) -> TimeBlock:
+        return self.plan.delivery_events[self.pickup_event_idx].event_time
+
+    @property
+    def drop_time(self) -> TimeBlock:
+        return self.plan.delivery_events[self.drop_event_idx].event_time
+
+    def to_dict(self) -> dict:
+        return {
+            'delivery_id': self.delivery_id,
+            'courier_id': self.courier_id,
+            'pickup_time': ModelCodec.time_block_to_dict(self.pickup_time),
+            'drop_time': ModelCodec.time_block_to_dict(self.drop_time),
+            'cost': self.cost,
+            'distance_delta': self.distance_delta,
+            'penalty_delta': self.penalty_delta,
+            'plan': ModelCodec.plan_to_dict(self.plan)
+        }
+
+
+class _Route:
+    """Stops of the route of a courier - its start and the events of its plan - with their current times, loads and
+    lateness windows."""
+
+    def __init__(self, courier: Courier, plan: Plan, deliveries: Dict[str, Delivery], config: PlannerConfig) -> None:
+        super().__init__()
+        self.courier = courier
+        self.plan = plan
+        self.deliveries = [deliveries[delivery_id] for delivery_id in plan.delivery_order_ids
+                           if delivery_id in deliveries]
+
+        events = plan.delivery_events
+        start_time = courier.start_timelocation.time
+        self.locations = [courier.start_timelocation.location] + [event.location for event in events]
+        self.etas = np.array([start_time] + [event.event_time.from_time for event in events], dtype=np.int64)
+        self.etds = np.array([start_time] + [event.event_time.to_time if event.event_time.to_time is not None
+                                             else event.event_time.from_time for event in events], dtype=np.int64)
+
+        # load after every stop
+        sizes = {delivery.id: delivery.size or 0 for delivery in self.deliveries}
+        changes = [courier.start_utilization or 0] + \
+                  [sum(sizes.get(delivery_id, 0) for delivery_id in event.delivery_order_ids)
+                   * (1 if event.type == DeliveryEventType.pickup else -1) for event in events]
+        self.loads = np.cumsum(changes)
+        self.services = np.array([0] + [config.get_service_time(event.type) for event in events], dtype=np.int64)
+
+        pickup_to_stop, drop_to_stop = {}, {}
+        for stop, event in enumerate(events, start=1):
+            for delivery_id in event.delivery_order_ids:
+                if event.type == DeliveryEventType.pickup:
+                    pickup_to_stop[delivery_id] = stop
+                else:
+                    drop_to_stop[delivery_id] = stop
+
+        node_time_windows, _, _ = VrpInstanceBuilder._create_time_windows(self.deliveries, [courier], 1,
+                                                                           pickup_to_stop, drop_to_stop, config)
+        late = [tw for tw in node_time_windows if tw.has_upper_bound()]
+        self.window_stops = np.array([tw.node for tw in late], dtype=np.int64)
+        self.window_to_times = np.array([tw.to_time for tw in late], dtype=np.int64)
+        self.window_weights = np.array([HARD_WEIGHT if tw.is_hard else tw.weight for tw in late], dtype=np.int64)
+
+    @property
+    def num_of_stops(self) -> int:
+        return len(self.locations)
+
+
+class InsertionPlanner:
+    """
+    Finds the best places for new deliveries in the current plans, without replanning. Every pair of pickup and
+    drop positions in every route is screened at once - the distance delta is exact, the delays are propagated
+    through the waiting slack of the route and priced by the lateness windows. The best candidates get an exact
+    timetable. The cost is the objective of the planners, the added distance plus the added time window penalty.
+    Removal of deliveries and couriers re-times only the touched routes and re-inserts the orphaned deliveries.
+    """
+
+    def __init__(self, routing: RoutingBase) -> None:
+        super().__init__()
+        self.routing = routing
+        self.timetable_optimizer = PlanTimetableOptimizer(routing=routing, timetable_computer=ChainPlanTimetableComputer())
+
+        # the returned plans are timed by the computer of the request config
+        self.plan_timetable_optimizer = PlanTimetableOptimizer(routing=routing)
+
+    @staticmethod
+    def remove_from_plan(plan: Plan, delivery_id: str, event_type: Optional[DeliveryEventType] = None):
+        """Removes the events of the delivery from the plan, only the ones of event_type when given."""
+        for event in plan.delivery_events:
+            if delivery_id in event.delivery_order_ids and (event_type is None or event.type == event_type):
+                event.delivery_order_ids.remove(delivery_id)
+        plan.delivery_events = [event for event in plan.delivery_events if event.delivery_order_ids]
+
+        if event_type is None and delivery_id in plan.delivery_order_ids:
+            plan.delivery_order_ids.remove(delivery_id)
+
+    def retime_plan(self, plan: Plan, deliveries: Dict[str, Delivery], courier: Courier,
+                    config: Optional[PlannerConfig] = None):
+        """Computes the timetable, duration and distance of a changed plan."""
+        if not plan.delivery_events:
+            plan.duration, plan.distance = 0, 0
+            return
+
+        _, fixed_times = self.plan_timetable_optimizer.update_etas_in_plan(
+            plan=plan,
+            deliveries=[deliveries[delivery_id] for delivery_id in plan.delivery_order_ids if delivery_id in deliveries],
+            courier=courier,
+            config=config
+        )
+        for event, fixed_time in zip(plan.delivery_events, fixed_times):
+            event.fixed_time = fixed_time
+
+        locations = [event.location for event in plan.delivery_events]
+        _, distances = self.routing.get_legs(list(zip(locations[:-1], locations[1:])))
+
+        plan.duration = plan.delivery_events[-1].event_time.to_time - courier.start_timelocation.time
+        plan.distance = int(round(sum(distances)))
+
+    def remove_deliveries(self, deliveries: List[Delivery], couriers: List[Courier], current_plans: List[Plan],
+                          delivery_ids: List[str], courier_ids: List[str], reinsert: bool = True,
+                          config: Optional[PlannerConfig] = None) -> (List[Plan], List[str]):
+        """
+        Removes the deliveries and the plans of the couriers from the current plans and re-times the touched
+        routes. The deliveries of the removed plans that were not picked up yet are inserted one by one at their
+        cheapest place when reinsert is set. Returns the plans and the deliveries that were left without a plan.
+        """
+        if config is None:
+            config = ConfigProvider.get_config()
+
+        removed_deliveries, removed_couriers = set(delivery_ids), set(courier_ids)
+
+        deliveries = [delivery for delivery in deliveries if delivery.id not in removed_deliveries]
+        couriers = [courier for courier in couriers if courier.id not in removed_couriers]
+        id_to_delivery = {delivery.id: delivery for delivery in deliveries}
+        id_to_courier = {courier.id: courier for courier in couriers}
+
+        plans = [plan.copy(deep=True) for plan in current_plans]
+        orphans = [id_to_delivery[delivery_id] for plan in plans if plan.assigned_courier_id in removed_couriers
+                   for delivery_id in plan.delivery_order_ids if delivery_id in id_to_delivery]
+        plans = [plan for plan in plans if plan.assigned_courier_id not in removed_couriers]
+
+        touched = set()
+        for plan in plans:
+            if removed_deliveries.intersection(plan.delivery_order_ids):
+                for delivery_id in removed_deliveries.intersection(plan.delivery_order_ids):
+                    self.remove_from_plan(plan, delivery_id)
+                touched.add(plan.assigned_courier_id)
+
+        # the routes are kept between the insertions, only the changed one is created again
+        movable = [delivery for delivery in orphans if reinsert and delivery.origin is not None]
+        routes = self._create_routes(couriers, plans, id_to_delivery, config) if movable else []
+        legs = self._fetch_legs(routes, movable) if routes else {}
+        old_penalties = {}
+
+        unassigned = []
+        for delivery in orphans:
+            # a delivery in the trunk of the removed courier can not be moved
+            options = self._find_best_insertions(routes, delivery, legs, old_penalties, config) \
+                if routes and delivery.id in {movable_delivery.id for movable_delivery in movable} else []
+            if not options:
+                unassigned.append(delivery.id)
+                continue
+
+            option = options[0]
+            plans = [plan for plan in plans if plan.assigned_courier_id != option.courier_id] + [option.plan]
+            touched.add(option.courier_id)
+
+            route_idx = next(idx for idx, route in enumerate(routes) if route.courier.id == option.courier_id)
+            routes[route_idx] = _Route(routes[route_idx].courier, option.plan, id_to_delivery, config)
+            old_penalties.pop(option.courier_id, None)
+
+            movable = [movable_delivery for movable_delivery in movable if movable_delivery.id != delivery.id]
+            legs.update(self._fetch_legs([routes[route_idx]], movable))
+
+        # plans without a courier have no start to be timed from
+        for plan in plans:
+            if plan.assigned_courier_id in touched and plan.assigned_courier_id in id_to_courier:
+                try:
+                    self.retime_plan(plan, id_to_delivery, id_to_courier[plan.assigned_courier_id], config)
+                except PlanUnfeasibleException as e:
+                    print(f"Keeping the times of the plan of {plan.assigned_courier_id} - {e}")
+
+        return plans, unassigned
+
+    def find_insertions(self, deliveries: List[Delivery], couriers: List[Courier], current_plans: List[Plan],
+                        new_deliveries: List[Delivery], config: Optional[PlannerConfig] = None) \
+            -> Dict[str, List[InsertionOption]]:
+        """The best insertions of every new delivery, each evaluated against the current plans on its own."""
+        if config is None:
+            config = ConfigProvider.get_config()
+
+        id_to_delivery = {delivery.id: delivery for delivery in deliveries + new_deliveries}
+        routes = self._create_routes(couriers, current_plans, id_to_delivery, config)
+        if not routes:
+            return {delivery.id: [] for delivery in new_deliveries}
+
+        legs = self._fetch_legs(routes, new_deliveries)
+        old_penalties = {}
+
+        return {delivery.id: self._find_best_insertions(routes, delivery, legs, old_penalties, config)
+                for delivery in new_deliveries}
+
+    @staticmethod
+    def _create_routes(couriers: List[Courier], plans: List[Plan], id_to_delivery: Dict[str, Delivery],
+                       config: PlannerConfig) -> List['_Route']:
+        courier_plans = {plan.assigned_courier_id: plan for plan in plans if plan.assigned_courier_id}
+
+        routes = []
+        for courier in couriers:
+            if courier.is_finishing or courier.start_timelocation is None:
+                continue
+
+            plan = courier_plans.get(courier.id) or Plan(delivery_events=[], delivery_order_ids=[], duration=0,
+                                                         distance=0, mode=Mode.CAR, assigned_courier_id=courier.id)
+            routes.append(_Route(courier, plan, id_to_delivery, config))
+
+        return routes
+
+    def _find_best_insertions(self, routes: List['_Route'], delivery: Delivery, legs: dict,
+                              old_penalties: Dict[str, float], config: PlannerConfig) -> List[InsertionOption]:
+        candidates = []
+        for route_idx, route in enumerate(routes):
+            costs, distance_deltas = self._screen(route, delivery, legs, config)
+            for i, j in zip(*np.nonzero(np.isfinite(costs))):
+                candidates.append((costs[i, j], distance_deltas[i, j], route_idx, int(i), int(j)))
+
+        candidates.sort(key=lambda x: x[0])
+
+        options = []
+        for _, distance_delta, route_idx, i, j in candidates[:config.insertion_exact_candidates]:
+            route = routes[route_idx]
+            if route.courier.id not in old_penalties:
+                _, _, old_penalties[route.courier.id] = self.timetable_optimizer.optimize_plan(
+                    plan=route.plan.copy(update={'delivery_events': self._copy_events(route.plan.delivery_events)}),
+                    deliveries=route.deliveries, courier=route.courier, config=config)
+
+            option = self._evaluate(route, delivery, i, j, distance_delta, old_penalties[route.courier.id], config)
+            if option is not None:
+                options.append(option)
+
+        return sorted(options, key=lambda x: x.cost)[:config.insertion_results]
+
+    @staticmethod
+    def _copy_events(events: List[DeliveryEvent]) -> List[DeliveryEvent]:
+        # the timetable optimizer changes the times of the events in place, the rest is never changed
+        return [event.copy(update={'event_time': event.event_time.copy(),
+                                   'delivery_order_ids': list(event.delivery_order_ids)}) for event in events]
+
+    def _fetch_legs(self, routes: List['_Route'], new_deliveries: List[Delivery]) -> dict:
+        # legs between the stops and the new locations and along the routes, never the whole matrix
+        stops = list(dict.fromkeys(location for route in routes for location in route.locations))
+        new_locations = list(dict.fromkeys(location for delivery in new_deliveries
+                                           for location in (delivery.origin, delivery.destination)))
+
+        leg_lists = [[(stop, location) for stop in stops for location in new_locations] +
+                     [(delivery.origin, delivery.destination) for delivery in new_deliveries],
+                     [(location, stop) for location in new_locations for stop in stops]]
+        leg_lists += [list(zip(route.locations[:-1], route.locations[1:])) for route in routes
+                      if route.num_of_stops > 1]
+
+        ret = {}
+        for leg_list in filter(None, leg_lists):
+            durations, distances = self.routing.get_legs(leg_list)
+            ret.update(zip(leg_list, zip(durations, distances)))
+
+        return ret
+
+    @staticmethod
+    def _window_penalty(times: np.ndarray, time_windows: List[TimeWindowConstraint]) -> np.ndarray:
+        ret = np.zeros(times.shape)
+        for tw in time_windows:
+            weight = HARD_WEIGHT if tw.is_hard else tw.weight
+            if tw.has_lower_bound():
+                ret += weight * np.maximum(0, tw.from_time - times)
+            if tw.has_upper_bound():
+                ret += weight * np.maximum(0, times - tw.to_time)
+        return ret
+
+    def _screen(self, route: '_Route', delivery: Delivery, legs: dict, config: PlannerConfig) \
+            -> (np.ndarray, np.ndarray):
+        """Estimated costs and exact distance deltas of inserting the pickup after stop i and the drop after stop
+        j, infinite where the insertion is not possible."""
+        pickup, drop = delivery.origin, delivery.destination
+        n = route.num_of_stops
+        last = n - 1
+
+        def leg_array(pairs, idx):
+            return np.array([legs[pair][idx] for pair in pairs], dtype=float)
+
+        stops = route.locations
+        tt_sp, dd_sp = leg_array([(s, pickup) for s in stops], 0), leg_array([(s, pickup) for s in stops], 1)
+        tt_ps, dd_ps = leg_array([(pickup, s) for s in stops], 0), leg_array([(pickup, s) for s in stops], 1)
+        tt_sd, dd_sd = leg_array([(s, drop) for s in stops], 0), leg_array([(s, drop) for s in stops], 1)
+        tt_ds, dd_ds = leg_array([(drop, s) for s in stops], 0), leg_array([(drop, s) for s in stops], 1)
+        tt_pd, dd_pd = legs[(pickup, drop)]
+
+        # legs to the next stop, nothing follows the last one
+        route_legs = list(zip(stops[:-1], stops[1:]))
+        t_next = np.append(leg_array(route_legs, 0), 0)
+        d_next = np.append(leg_array(route_legs, 1), 0)
+        tp_next, dp_next = np.append(tt_ps[1:], 0), np.append(dd_ps[1:], 0)
+        td_next, dd_next = np.append(tt_ds[1:], 0), np.append(dd_ds[1:], 0)
+        has_next = np.arange(n) < last
+
+        pickup_service = config.get_service_time(DeliveryEventType.pickup)
+        drop_service = config.get_service_time(DeliveryEventType.drop)
+
+        new_windows, _, _ = VrpInstanceBuilder._create_time_windows([delivery], [route.courier], 1,
+                                                                    {delivery.id: 1}, {delivery.id: 2}, config)
+        pickup_windows = [tw for tw in new_windows if tw.node == 1]
+        drop_windows = [tw for tw in new_windows if tw.node == 2]
+        pickup_earliest = max([tw.from_time for tw in pickup_windows if tw.has_lower_bound()], default=0)
+
+        # the waiting of the route absorbs the delays, before the planned arrival at a stop and before leaving it
+        arrivals = np.append(route.etds[0], route.etds[:-1] + t_next[:-1])
+        wait_before = np.maximum(0, route.etas - arrivals)
+        cum_waiting = np.cumsum(np.append(0, np.maximum(0, route.etds - arrivals - route.services)[1:]))
+
+        # pickup after stop i, the courier waits for its earliest time, delay of the arrival to the stop after it
+        pickup_start = np.maximum(route.etds + tt_sp, pickup_earliest)
+        pickup_departure = pickup_start + pickup_service
+        pickup_delay = np.where(has_next, np.maximum(0, pickup_departure + tp_next - route.etds - t_next), 0)
+
+        # drop after stop j, on the diagonal right after the pickup
+        departure_delay = np.maximum(0, pickup_delay[:, None] - (cum_waiting[None, :] - cum_waiting[:, None]))
+        drop_arrival = route.etds[None, :] + departure_delay + tt_sd[None, :]
+        after_delay = departure_delay + np.where(has_next, drop_service + tt_sd + td_next - t_next, 0)[None, :]
+        diagonal = np.arange(n)
+        drop_arrival[diagonal, diagonal] = pickup_departure + tt_pd
+        after_delay[diagonal, diagonal] = np.where(has_next, pickup_departure + tt_pd + drop_service + td_next
+                                                   - route.etds - t_next, 0)
+        after_delay = np.maximum(0, after_delay)
+
+        distance_deltas = (dd_sp + dp_next * has_next - d_next)[:, None] + (dd_sd + dd_next * has_next - d_next)[None, :]
+        distance_deltas[diagonal, diagonal] = dd_sp + dd_pd + dd_next * has_next - d_next
+
+        costs = distance_deltas + self._window_penalty(pickup_start, pickup_windows)[:, None] \
+            + self._window_penalty(drop_arrival, drop_windows)
+
+        # lateness added to the stops of the route, pushed by the pickup between i and j and by both after j
+        if len(route.window_stops):
+            stop = route.window_stops[None, None, :]
+            after_pickup = stop > diagonal[:, None, None]
+            after_drop = stop > diagonal[None, :, None]
+            delays = np.where(after_drop, after_delay[:, :, None], pickup_delay[:, None, None])
+            absorbed = cum_waiting[route.window_stops - 1] - np.where(after_drop, cum_waiting[None, :, None],
+                                                                      cum_waiting[:, None, None])
+            delays = np.where(after_pickup, np.maximum(0, delays - absorbed - wait_before[route.window_stops]), 0)
+
+            etas = route.etas[route.window_stops]
+            base = np.maximum(0, etas - route.window_to_times)
+            costs = costs + (route.window_weights * (np.maximum(0, etas + delays - route.window_to_times)
+                                                     - base)).sum(axis=2)
+
+        possible = np.triu(np.ones((n, n), dtype=bool))
+        if config.use_courier_capacity and route.courier.capacity is not None:
+            max_loads = np.array([np.maximum.accumulate(np.append(np.full(i, -np.inf), route.loads[i:]))
+                                  for i in range(n)])
+            possible &= max_loads + (delivery.size or 0) <= route.courier.capacity
+
+        costs = np.where(possible, costs, np.inf)
+
+        return costs, distance_deltas
+
+    def _evaluate(self, route: '_Route', delivery: Delivery, i: int, j: int, distance_delta: float,
+                  old_penalty: float, config: PlannerConfig) -> Optional[InsertionOption]:
+        events = self._copy_events(route.plan.delivery_events)
+
+        def new_event(event_type: DeliveryEventType, location: Location) -> DeliveryEvent:
+            return DeliveryEvent(type=event_type, location=location, delivery_order_ids=[delivery.id],
+                                 event_time=TimeBlock(from_time=0, to_time=0))
+
+        # stop k is the event k - 1, the drop follows the events up to stop j and the inserted pickup
+        events = events[:i] + [new_event(DeliveryEventType.pickup, delivery.origin)] + events[i:j] + \
+            [new_event(DeliveryEventType.drop, delivery.destination)] + events[j:]
+
+        plan = route.plan.copy(update={'delivery_events': events,
+                                       'delivery_order_ids': route.plan.delivery_order_ids + [delivery.id]})
+
+        try:
+            _, fixed_times, penalty = self.timetable_optimizer.optimize_plan(plan=plan,
+                                                                             deliveries=route.deliveries + [delivery],
+                                                                             courier=route.courier,
+                                                                             config=config)
+        except PlanUnfeasibleException:
+            return None
+
+        for event, fixed_time in zip(plan.delivery_events, fixed_times):
+            event.fixed_time = fixed_time
+
+        plan.distance = int(round(plan.distance + distance_delta))
+        plan.duration = plan.delivery_events[-1].event_time.to_time - route.courier.start_timelocation.time
+
+        penalty_delta = round(float(penalty - old_penalty), 2)
+        return InsertionOption(delivery_id=delivery.id,
+                               courier_id=route.courier.id,
+                               plan=plan,
+                               pickup_event_idx=i,
+                               drop_event_idx=j + 1,
+                               cost=round(float(distance_delta + penalty_delta), 2),
+                               distance_delta=round(float(distance_delta), 2),
+                               penalty_delta=penalty_delta)
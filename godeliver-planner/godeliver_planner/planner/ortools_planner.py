@@ -1,19 +1,22 @@
+from __future__ import annotations
+
 from collections import defaultdict
-from typing import List
-from ortools.constraint_solver import pywrapcp
-from ortools.constraint_solver import routing_enums_pb2
-from ortools.constraint_solver.pywrapcp import RoutingModel, RoutingIndexManager, Assignment, Solver, RoutingDimension
-from ortools.constraint_solver.routing_parameters_pb2 import RoutingSearchParameters
-from godeliver_planner.helper.config_provider import ConfigProvider
+from typing import List, TYPE_CHECKING
 from godeliver_planner.helper.exceptions import NoSolutionException
 from godeliver_planner.model.delivery import Delivery
 from godeliver_planner.model.planner_config import PlannerType
 from godeliver_planner.planner.abstract_planner import AbstractPlanner
+from godeliver_planner.planner.planning_progress import PlanningProgress, NO_PROGRESS
 from godeliver_planner.planner.vrp_instance_builder import VehicleRoutingProblemInstance, VehicleRoutingProblemSolution, \
     TimeWindowConstraint, MAX_TIMESTAMP_VALUE
 from godeliver_planner.planner.plan_timetable.lp_plan_timetable_computer import LpPlanTimetableComputer
 from godeliver_planner.routing.routing_base import RoutingBase
 
+if TYPE_CHECKING:
+    from ortools.constraint_solver.pywrapcp import RoutingModel, RoutingIndexManager, Assignment, Solver, \
+        RoutingDimension
+    from ortools.constraint_solver.routing_parameters_pb2 import RoutingSearchParameters
+
 
 class ORToolsPlanner(AbstractPlanner):
     DURATION_DIMENSION_NAME = 'Duration'
@@ -21,6 +24,8 @@ class ORToolsPlanner(AbstractPlanner):
     COUNT_DIMENSION_NAME = 'Count'
     CAPACITY_DIMENSION_NAME = 'CAPACITY'
 
+    SUPPORTS_MERGED_PICKUPS = True
+
     def __init__(self, routing: RoutingBase):
         super().__init__(routing)
         self.timetable_computer = LpPlanTimetableComputer()
@@ -28,13 +33,20 @@ class ORToolsPlanner(AbstractPlanner):
     def get_name(self) -> str:
         return PlannerType.or_tools.value
 
-    def solve(self, vrp_instance):
+    def solve(self, vrp_instance: VehicleRoutingProblemInstance,
+              progress: PlanningProgress = NO_PROGRESS) -> VehicleRoutingProblemSolution:
         manager, routing, search_parameters = self._init_pywrapcp(vrp_instance, len(vrp_instance.drop_nodes))
 
         self._set_optimization_criteria(routing, manager, vrp_instance)
 
         initial_routes = self._parse_initial_routes(vrp_instance, manager)
 
+        routing.AddAtSolutionCallback(lambda: progress.report_solution(routing.CostVar().Value()))
+
+        # ends the search once the progress is cancelled, the best solution found so far is kept
+        cancellation_limit = routing.solver().CustomLimit(progress.is_cancelled)
+        routing.AddSearchMonitor(cancellation_limit)
+
         assignment = self._solve(routing, search_parameters, initial_routes)
 
         # Print assignment on console.
@@ -123,12 +135,20 @@ class ORToolsPlanner(AbstractPlanner):
         else:
             routing.CloseModelWithParameters(search_parameters)
             initial_solution = routing.ReadAssignmentFromRoutes(initial_routes, True)
-            solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
+
+            # previous routes may no longer be consistent, e.g. when pickups of two routes were merged
+            if initial_solution is None:
+                solution = routing.SolveWithParameters(search_parameters)
+            else:
+                solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
 
         return solution
 
     @staticmethod
     def _init_pywrapcp(data_model: VehicleRoutingProblemInstance, no_deliveries: int):
+        from ortools.constraint_solver import pywrapcp
+        from ortools.constraint_solver import routing_enums_pb2
+
         # Create the routing index manager.
         manager = pywrapcp.RoutingIndexManager(
             len(data_model.car_distance_matrix),  # number of points 2*len(deliveries)+1
@@ -143,6 +163,12 @@ class ORToolsPlanner(AbstractPlanner):
         search_parameters = pywrapcp.DefaultRoutingSearchParameters()
         search_parameters.first_solution_strategy = (
             routing_enums_pb2.FirstSolutionStrategy.AUTOMATIC)
+
+        # insertion heuristics insert whole pickup and delivery pairs and fail on pickups shared by several pairs
+        pickup_nodes = [pickup for pickup, _ in data_model.deliveries_not_started]
+        if len(set(pickup_nodes)) < len(pickup_nodes):
+            search_parameters.first_solution_strategy = (
+                routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
         search_parameters.local_search_metaheuristic = (
             routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
         )
@@ -176,6 +202,7 @@ class ORToolsPlanner(AbstractPlanner):
 
         self._set_balance_constraints_on_number_of_packages(data, routing)
         self._set_pickup_delivery_constraints(data, routing, manager)
+        self._set_allowed_successors(data, routing, manager)
         # self._set_omit_node_penalty(data.pickup_nodes, routing, manager)
         # self._set_omit_node_penalty(data.drop_nodes, routing, manager)
 
@@ -208,6 +235,10 @@ class ORToolsPlanner(AbstractPlanner):
                            dimension_name: str):
         # ========= DURATION CONSTRAIN =========
         cost_callback_indices = []
+        # the callbacks run for every arc the solver evaluates, everything they need is looked up beforehand
+        pickup_nodes, drop_nodes = set(data.pickup_nodes), set(data.drop_nodes)
+        pickup_service_time, drop_service_time = data.pickup_service_time, data.drop_service_time
+
         # model "cost between nodes per vehicle"
         for vehicle_idx in range(data.num_plans_to_create):
             def vehicle_cost_callback(from_index, to_index):
@@ -215,14 +246,14 @@ class ORToolsPlanner(AbstractPlanner):
                 to_node = manager.IndexToNode(to_index)
                 time = data.car_duration_matrix[from_node][to_node]  # in seconds
 
-                is_pickup = from_node in data.pickup_nodes
-                is_drop = from_node in data.drop_nodes
+                is_pickup = from_node in pickup_nodes
+                is_drop = from_node in drop_nodes
 
                 waiting_time = 0
                 if is_pickup:
-                    waiting_time = ConfigProvider.get_config().pickup_waiting_time
+                    waiting_time = pickup_service_time
                 elif is_drop:
-                    waiting_time = ConfigProvider.get_config().drop_waiting_time
+                    waiting_time = drop_service_time
 
                 return time + waiting_time
 
@@ -379,6 +410,24 @@ class ORToolsPlanner(AbstractPlanner):
             index = manager.NodeToIndex(node)
             routing.SetAllowedVehiclesForIndex([courier_idx], index)
 
+    @staticmethod
+    def _set_allowed_successors(data: VehicleRoutingProblemInstance,
+                                routing: RoutingModel, manager: RoutingIndexManager):
+        # ========= GRANULAR NEIGHBOURHOOD =========
+        if data.allowed_successors is None:
+            return
+
+        end_node_to_index = {node: routing.End(vehicle) for vehicle, node in enumerate(data.ends)}
+
+        def node_to_index(node):
+            return end_node_to_index[node] if node in end_node_to_index else manager.NodeToIndex(node)
+
+        for node, successors in enumerate(data.allowed_successors):
+            if node in end_node_to_index:
+                continue
+
+            routing.NextVar(manager.NodeToIndex(node)).SetValues([node_to_index(n) for n in successors])
+
     @staticmethod
     def _set_omit_node_penalty(nodes: List[int],
                                routing: RoutingModel, manager: RoutingIndexManager):
@@ -0,0 +1,109 @@
+import typing
+from typing import List, Optional
+
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.helper.ttl_cache import TTLCache
+from godeliver_planner.model.delivery_event import DeliveryEventType
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.planner.plan_timetable.plan_timetable_computer import AbstractPlanTimetableComputer, \
+    PlanTimetable
+from godeliver_planner.planner.vrp_instance_builder import TimeWindowConstraint
+
+TIMETABLE_CACHE_SIZE = 4096
+
+
+class CachedPlanTimetableComputer(AbstractPlanTimetableComputer):
+    """
+    Remembers the timetables computed by another computer. The timetable depends only on the types, windows and
+    legs of the stops of the route and on the service times, so the key is built from them and not from node ids.
+    Routes whose timetable can not be computed are not remembered.
+    """
+
+    def __init__(self, computer: AbstractPlanTimetableComputer) -> None:
+        super().__init__()
+        self.computer = computer
+
+        # the ttl is checked against the config of each call
+        self.cache = TTLCache(max_size=TIMETABLE_CACHE_SIZE, ttl=0)
+
+    def _route_key(self, drop_nodes: frozenset, pickup_nodes: frozenset, car_duration_matrix,
+                   time_windows: typing.Dict[int, List[TimeWindowConstraint]], route: List[int],
+                   config: PlannerConfig) -> Optional[tuple]:
+        try:
+            stops = tuple((
+                DeliveryEventType.drop if p in drop_nodes else DeliveryEventType.pickup if p in pickup_nodes else None,
+                tuple((tw.is_hard, tw.from_time, tw.to_time, tw.weight) for tw in time_windows.get(p, ()))
+            ) for p in route)
+            legs = tuple(car_duration_matrix[a][b] for a, b in zip(route[:-1], route[1:]))
+        except (IndexError, KeyError):
+            # a broken route is left for the computer to report
+            return None
+
+        return type(self.computer).__name__, config.get_service_time(DeliveryEventType.pickup), \
+            config.get_service_time(DeliveryEventType.drop), config.allow_wait_on_drop, stops, legs
+
+    def _get(self, key: Optional[tuple], config: PlannerConfig) -> Optional[PlanTimetable]:
+        ttl = config.timetable_cache_ttl
+        value = self.cache.get(key, ttl=ttl) if key is not None and ttl > 0 else None
+
+        Metrics.increment('timetable_cache.hits' if value is not None else 'timetable_cache.misses')
+        if value is None:
+            return None
+
+        etas, etds, penalty = value
+        return PlanTimetable(etas=list(etas), etds=list(etds), penalty=penalty)
+
+    def _put(self, key: Optional[tuple], timetable: PlanTimetable, config: PlannerConfig):
+        if key is not None and timetable.success and config.timetable_cache_ttl > 0:
+            self.cache.put(key, (tuple(timetable.etas), tuple(timetable.etds), timetable.penalty))
+
+    def compute_optimal_timetable(self,
+                                  drop_nodes: List[int],
+                                  pickup_nodes: List[int],
+                                  car_duration_matrix,
+                                  time_windows: dict,
+                                  route: List[int],
+                                  config: PlannerConfig) -> (List[int], List[int], float):
+        drop_nodes, pickup_nodes = self._node_set(drop_nodes), self._node_set(pickup_nodes)
+
+        key = self._route_key(drop_nodes, pickup_nodes, car_duration_matrix, time_windows, route, config)
+        timetable = self._get(key, config)
+        if timetable is None:
+            etas, etds, penalty = self.computer.compute_optimal_timetable(drop_nodes=drop_nodes,
+                                                                          pickup_nodes=pickup_nodes,
+                                                                          car_duration_matrix=car_duration_matrix,
+                                                                          time_windows=time_windows,
+                                                                          route=route,
+                                                                          config=config)
+            timetable = PlanTimetable(etas=etas, etds=etds, penalty=penalty)
+            self._put(key, timetable, config)
+
+        return timetable.etas, timetable.etds, timetable.penalty
+
+    def compute_optimal_timetables(self,
+                                   drop_nodes: List[int],
+                                   pickup_nodes: List[int],
+                                   car_duration_matrix,
+                                   time_windows: dict,
+                                   routes: List[List[int]],
+                                   config: PlannerConfig) -> List[PlanTimetable]:
+        drop_nodes, pickup_nodes = self._node_set(drop_nodes), self._node_set(pickup_nodes)
+
+        keys = [self._route_key(drop_nodes, pickup_nodes, car_duration_matrix, time_windows, route, config)
+                for route in routes]
+        ret = [self._get(key, config) for key in keys]
+
+        # the routes that were not remembered are computed together, possibly in parallel
+        missing = [idx for idx, timetable in enumerate(ret) if timetable is None]
+        if missing:
+            timetables = self.computer.compute_optimal_timetables(drop_nodes=drop_nodes,
+                                                                  pickup_nodes=pickup_nodes,
+                                                                  car_duration_matrix=car_duration_matrix,
+                                                                  time_windows=time_windows,
+                                                                  routes=[routes[idx] for idx in missing],
+                                                                  config=config)
+            for idx, timetable in zip(missing, timetables):
+                self._put(keys[idx], timetable, config)
+                ret[idx] = timetable
+
+        return ret
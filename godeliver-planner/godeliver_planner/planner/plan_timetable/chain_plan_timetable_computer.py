@@ -0,0 +1,202 @@
+import heapq
+import math
+import typing
+from typing import List
+
+from godeliver_planner.model.delivery_event import DeliveryEventType
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.planner.exceptions.planner_exceptions import PlanUnfeasibleException
+from godeliver_planner.planner.plan_timetable.lp_plan_timetable_computer import LpPlanTimetableComputer
+from godeliver_planner.planner.plan_timetable.plan_timetable_computer import AbstractPlanTimetableComputer
+from godeliver_planner.planner.vrp_instance_builder import TimeWindowConstraint, MAX_TIMESTAMP_VALUE
+
+WAIT = 'wait'           # departure >= arrival + service
+NO_WAIT = 'no_wait'     # departure == arrival + service
+DETACHED = 'detached'   # departure is not bound to the arrival (route start and end)
+
+# slope of hard bounds, times and weights are integers so violating a bound by a second costs at least this much
+HARD_WEIGHT = 10 ** 15
+
+
+class _ConvexPiecewiseLinear:
+    """
+    Convex piecewise linear function kept in the slope trick form - the minimal value and the breakpoints left
+    and right of the minimum, each with the slope change it causes. Hard bounds are breakpoints of HARD_WEIGHT.
+    Shifts of the argument are applied lazily.
+    """
+
+    def __init__(self) -> None:
+        self.min_value = 0
+        self._left = []         # max heap of (-point, weight)
+        self._right = []        # min heap of (point, weight)
+        self._left_shift = 0
+        self._right_shift = 0
+
+    def _push_left(self, point, weight):
+        heapq.heappush(self._left, (-(point - self._left_shift), weight))
+
+    def _push_right(self, point, weight):
+        heapq.heappush(self._right, (point - self._right_shift, weight))
+
+    def _pop_left(self):
+        point, weight = heapq.heappop(self._left)
+        return -point + self._left_shift, weight
+
+    def _pop_right(self):
+        point, weight = heapq.heappop(self._right)
+        return point + self._right_shift, weight
+
+    def add_increasing(self, point, weight):
+        """Adds weight * max(0, x - point)."""
+        self._push_left(point, weight)
+        remaining = weight
+        while remaining > 0:
+            top, top_weight = self._pop_left()
+            moved = min(top_weight, remaining)
+            if top > point:
+                self.min_value += moved * (top - point)
+            self._push_right(top, moved)
+            if top_weight > moved:
+                self._push_left(top, top_weight - moved)
+            remaining -= moved
+
+    def add_decreasing(self, point, weight):
+        """Adds weight * max(0, point - x)."""
+        self._push_right(point, weight)
+        remaining = weight
+        while remaining > 0:
+            bottom, bottom_weight = self._pop_right()
+            moved = min(bottom_weight, remaining)
+            if bottom < point:
+                self.min_value += moved * (point - bottom)
+            self._push_left(bottom, moved)
+            if bottom_weight > moved:
+                self._push_right(bottom, bottom_weight - moved)
+            remaining -= moved
+
+    def shift(self, by):
+        """f(x) := f(x - by)"""
+        self._left_shift += by
+        self._right_shift += by
+
+    def prefix_min(self):
+        """f(x) := min(f(y) for y <= x)"""
+        self._right = []
+
+    def flatten(self):
+        """f(x) := min(f)"""
+        self._left = []
+        self._right = []
+
+    def leftmost_argmin(self):
+        if not self._left:
+            return -math.inf
+        return -self._left[0][0] + self._left_shift
+
+
+class ChainPlanTimetableComputer(AbstractPlanTimetableComputer):
+    """
+    Solves the timetable of a route by dynamic programming over the chain of its stops instead of a general LP.
+    The cost of the route up to a stop, as a function of the departure from it, is convex piecewise linear and
+    every step (travel, waiting, window penalties) is an O(log n) operation on it. Returns the earliest of
+    the optimal schedules, as LpPlanTimetableComputer does, with the same penalty.
+    """
+    # a route takes less time than sending it to another process
+    PARALLEL_BATCHES = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.lp_computer = LpPlanTimetableComputer()
+
+    @staticmethod
+    def _is_separable(time_windows: List[TimeWindowConstraint], relation: str, service_time: int) -> bool:
+        # the LP charges max(earliness, lateness) of a window, which equals their sum unless both can be positive
+        for tw in time_windows:
+            if tw.is_hard or tw.from_time <= 0 or tw.to_time >= MAX_TIMESTAMP_VALUE:
+                continue
+            if relation == DETACHED or tw.from_time > tw.to_time + service_time:
+                return False
+        return True
+
+    def compute_optimal_timetable(self,
+                                  drop_nodes: List[int],
+                                  pickup_nodes: List[int],
+                                  car_duration_matrix,
+                                  time_windows: typing.Dict[int, List[TimeWindowConstraint]],
+                                  route: List[int],
+                                  config: PlannerConfig) -> (List[int], List[int], float):
+        drop_nodes, pickup_nodes = self._node_set(drop_nodes), self._node_set(pickup_nodes)
+
+        route_time_windows = [time_windows.get(p, []) for p in route]
+        timestamp_shift = min(tw.from_time for tws in route_time_windows for tw in tws if tw.from_time > 0)
+
+        relations, service_times = [], []
+        for p, tws in zip(route, route_time_windows):
+            if p in drop_nodes:
+                relation = WAIT if config.allow_wait_on_drop else NO_WAIT
+                service_time = config.get_service_time(DeliveryEventType.drop)
+            elif p in pickup_nodes:
+                relation = WAIT
+                service_time = config.get_service_time(DeliveryEventType.pickup)
+            else:
+                relation = DETACHED
+                service_time = 0
+
+            if not self._is_separable(tws, relation, service_time):
+                return self.lp_computer.compute_optimal_timetable(drop_nodes=drop_nodes,
+                                                                  pickup_nodes=pickup_nodes,
+                                                                  car_duration_matrix=car_duration_matrix,
+                                                                  time_windows=time_windows,
+                                                                  route=route,
+                                                                  config=config)
+            relations.append(relation)
+            service_times.append(service_time)
+
+        travel_times = [0] + [car_duration_matrix[a][b] for a, b in zip(route[:-1], route[1:])]
+
+        # function of the departure from the previous stop, shifted to the arrival at the current one
+        f = _ConvexPiecewiseLinear()
+        arrival_argmins = []
+        for idx, tws in enumerate(route_time_windows):
+            f.shift(travel_times[idx])
+
+            # arrival costs - all times are at least the timestamp shift, like the LP variables
+            f.add_decreasing(timestamp_shift, HARD_WEIGHT)
+            for tw in filter(lambda x: x.to_time < MAX_TIMESTAMP_VALUE, tws):
+                f.add_increasing(tw.to_time, HARD_WEIGHT if tw.is_hard else tw.weight)
+
+            arrival_argmins.append(f.leftmost_argmin())
+
+            if relations[idx] == WAIT:
+                f.prefix_min()
+                f.shift(service_times[idx])
+            elif relations[idx] == NO_WAIT:
+                f.shift(service_times[idx])
+            else:
+                f.flatten()
+
+            # departure costs
+            f.add_decreasing(timestamp_shift, HARD_WEIGHT)
+            for tw in filter(lambda x: x.from_time > 0, tws):
+                f.add_decreasing(tw.from_time, HARD_WEIGHT if tw.is_hard else tw.weight)
+
+        if f.min_value >= HARD_WEIGHT:
+            raise PlanUnfeasibleException("Hard time windows of the route can not be met")
+
+        # backtrack the earliest optimal schedule
+        etas, etds = [0] * len(route), [0] * len(route)
+        etd = f.leftmost_argmin()
+        for idx in reversed(range(len(route))):
+            etds[idx] = etd
+
+            if relations[idx] == WAIT:
+                eta = min(arrival_argmins[idx], etd - service_times[idx])
+            elif relations[idx] == NO_WAIT:
+                eta = etd - service_times[idx]
+            else:
+                eta = arrival_argmins[idx]
+
+            etas[idx] = eta
+            etd = eta - travel_times[idx]
+
+        return etas, etds, round(f.min_value, ndigits=2)
@@ -1,6 +1,7 @@
 from typing import List, Optional
 
-from godeliver_planner.helper.config_provider import ConfigProvider
+import numpy as np
+
 from godeliver_planner.model.delivery_event import DeliveryEventType
 from godeliver_planner.model.plan import Plan
 from godeliver_planner.planner.vrp_instance_builder import VehicleRoutingProblemInstance, VehicleRoutingProblemMapping
@@ -13,25 +14,40 @@ class FixedTimeComputer:
                             start_node: int,
                             vrp_instance: VehicleRoutingProblemInstance,
                             vrp_mapping: VehicleRoutingProblemMapping) -> List[Optional[int]]:
-        config = ConfigProvider.get_config()
-
-        nodes = [start_node] + \
-                [vrp_mapping.pickup_to_node[event.delivery_order_ids[0]] if event.type == DeliveryEventType.pickup
-                 else vrp_mapping.drop_to_node[event.delivery_order_ids[0]] for event in plan.delivery_events]
-
-        if plan.assigned_courier_id is None:
-            return [None] * (len(nodes) - 1)
-
-        fixed_times = []
-        for from_node, to_node, event in zip(nodes[:-1], nodes[1:], plan.delivery_events):
-
-            travel_time = vrp_instance.car_duration_matrix[from_node][to_node]
-            buffer_time = config.fixed_time_buffer
-            service_time = vrp_instance.pickup_service_time if event.type == DeliveryEventType.pickup else vrp_instance.drop_service_time
-            event_time = event.event_time.to_time if event.type == DeliveryEventType.pickup else event.event_time.from_time
-
-            fixed_time = int(event_time - service_time - travel_time - buffer_time)
-            fixed_times.append(fixed_time)
-
-        return fixed_times
+        return FixedTimeComputer.compute_fixed_times_for_plans(plans=[plan],
+                                                               start_nodes=[start_node],
+                                                               vrp_instance=vrp_instance,
+                                                               vrp_mapping=vrp_mapping)[0]
 
+    @staticmethod
+    def compute_fixed_times_for_plans(plans: List[Plan],
+                                      start_nodes: List[int],
+                                      vrp_instance: VehicleRoutingProblemInstance,
+                                      vrp_mapping: VehicleRoutingProblemMapping) -> List[List[Optional[int]]]:
+        # node sequences of the plans padded to the longest one, the padding is cut off at the end
+        width = max((len(plan.delivery_events) for plan in plans), default=0)
+        nodes = np.zeros((len(plans), width + 1), dtype=np.int64)
+        event_times = np.zeros((len(plans), width), dtype=np.int64)
+        is_pickup = np.zeros((len(plans), width), dtype=bool)
+
+        for plan_idx, (plan, start_node) in enumerate(zip(plans, start_nodes)):
+            if plan.assigned_courier_id is None:
+                continue
+
+            nodes[plan_idx, 0] = start_node
+            for event_idx, event in enumerate(plan.delivery_events):
+                if event.type == DeliveryEventType.pickup:
+                    nodes[plan_idx, event_idx + 1] = vrp_mapping.pickup_to_node[event.delivery_order_ids[0]]
+                    event_times[plan_idx, event_idx] = event.event_time.to_time
+                    is_pickup[plan_idx, event_idx] = True
+                else:
+                    nodes[plan_idx, event_idx + 1] = vrp_mapping.drop_to_node[event.delivery_order_ids[0]]
+                    event_times[plan_idx, event_idx] = event.event_time.from_time
+
+        travel_times = vrp_instance.car_duration_array[nodes[:, :-1], nodes[:, 1:]]
+        service_times = np.where(is_pickup, vrp_instance.pickup_service_time, vrp_instance.drop_service_time)
+
+        fixed_times = event_times - service_times - travel_times - vrp_instance.config.fixed_time_buffer
+
+        return [fixed_times[plan_idx, :len(plan.delivery_events)].tolist() if plan.assigned_courier_id is not None
+                else [None] * len(plan.delivery_events) for plan_idx, plan in enumerate(plans)]
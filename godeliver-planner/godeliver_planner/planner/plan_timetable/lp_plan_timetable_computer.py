@@ -1,10 +1,9 @@
 from typing import List
 
 import typing
-from scipy.optimize import linprog
 
-from godeliver_planner.helper.config_provider import ConfigProvider
 from godeliver_planner.model.delivery_event import DeliveryEventType
+from godeliver_planner.model.planner_config import PlannerConfig
 from godeliver_planner.planner.vrp_instance_builder import TimeWindowConstraint, MAX_TIMESTAMP_VALUE
 import numpy as np
 
@@ -19,24 +18,30 @@ class LpPlanTimetableComputer(AbstractPlanTimetableComputer):
                                   pickup_nodes: List[int],
                                   car_duration_matrix,
                                   time_windows: typing.Dict[int, List[TimeWindowConstraint]],
-                                  route: List[int]) -> (List[int], List[int], float):
-        config = ConfigProvider.get_config()
+                                  route: List[int],
+                                  config: PlannerConfig) -> (List[int], List[int], float):
+        from scipy.optimize import linprog
+        from scipy.sparse import coo_matrix
 
         plan_len = len(route)
-        A, b = [], []
-
-        timestamps = []
-        time_windows_len = 0
-        for p in route:
-            tws = time_windows.get(p)
-            if tws:
-                time_windows_len = time_windows_len + len(tws)
-                for tw in filter(lambda x: x.from_time > 0, tws):
-                    timestamps.append(tw.from_time)
-        timestamp_shift = min(timestamps)
+        drop_nodes, pickup_nodes = self._node_set(drop_nodes), self._node_set(pickup_nodes)
+
+        route_time_windows = [time_windows.get(p, []) for p in route]
+        time_windows_len = sum(map(len, route_time_windows))
+        timestamp_shift = min(tw.from_time for tws in route_time_windows for tw in tws if tw.from_time > 0)
 
         row_length = 2 * plan_len + time_windows_len
-        penalty_index = 0
+
+        # every row has at most two non-zeros, the matrices are assembled from (row, column, value) triplets
+        ub_rows, ub_columns, ub_values, b_ub = [], [], [], []
+
+        def add_ub_row(columns, values, bound):
+            row = len(b_ub)
+            ub_rows.extend([row] * len(columns))
+            ub_columns.extend(columns)
+            ub_values.extend(values)
+            b_ub.append(bound)
+
         for idx, p in enumerate(route):
             eta_column = idx
             etd_column = plan_len + idx
@@ -44,38 +49,21 @@ class LpPlanTimetableComputer(AbstractPlanTimetableComputer):
             if p in drop_nodes:
                 # departure time is grater than arrival time plus waiting time
                 #  eta - etd <= -waiting
-                row = np.zeros(row_length)
-                row[eta_column], row[etd_column] = 1, -1
-                A.append(row)
-                b.append(- config.get_service_time(DeliveryEventType.drop))
+                add_ub_row((eta_column, etd_column), (1, -1), - config.get_service_time(DeliveryEventType.drop))
 
                 if not config.allow_wait_on_drop:
-                    row = np.zeros(row_length)
-                    row[eta_column], row[etd_column] = -1, 1
-                    A.append(row)
-                    b.append(config.get_service_time(DeliveryEventType.drop))
+                    add_ub_row((eta_column, etd_column), (-1, 1), config.get_service_time(DeliveryEventType.drop))
 
             if p in pickup_nodes:
                 # departure time is grater than arrival time plus waiting time
                 #  eta - etd <= -waiting
-                row = np.zeros(row_length)
-                row[eta_column], row[etd_column] = 1, -1
-                A.append(row)
-                b.append(- config.get_service_time(DeliveryEventType.pickup))
-
-            if idx > 0:
-                # Arrival time on current node is equal to departure time from previous plus travel time
-                row = np.zeros(row_length)
-                row[eta_column], row[etd_column - 1] = 1, -1
-                A.append(row)
-                tt = car_duration_matrix[route[idx - 1]][p]
-                b.append(tt)
-                row = np.zeros(row_length)
-                row[eta_column], row[etd_column - 1] = -1, +1
-                A.append(row)
-                b.append(- tt)
-
-            tws = time_windows.get(p, [])
+                add_ub_row((eta_column, etd_column), (1, -1), - config.get_service_time(DeliveryEventType.pickup))
+
+        penalty_index = 0
+        for idx, tws in enumerate(route_time_windows):
+            eta_column = idx
+            etd_column = plan_len + idx
+
             for tw in tws:
                 tw_start = tw.from_time - timestamp_shift
                 tw_end = tw.to_time - timestamp_shift
@@ -84,42 +72,42 @@ class LpPlanTimetableComputer(AbstractPlanTimetableComputer):
 
                 if tw.is_hard:
                     if tw.from_time > 0:
-                        row = np.zeros(row_length)
-                        row[etd_column] = -1
-                        A.append(row)
-                        b.append(- tw_start)
+                        add_ub_row((etd_column,), (-1,), - tw_start)
 
                     if tw.to_time < MAX_TIMESTAMP_VALUE:
-                        row = np.zeros(row_length)
-                        row[eta_column] = 1
-                        A.append(row)
-                        b.append(tw_end)
+                        add_ub_row((eta_column,), (1,), tw_end)
                 else:
                     if tw.from_time > 0:
-                        row = np.zeros(row_length)
-                        row[etd_column], row[penalty_column] = - tw.weight, -1
-                        A.append(row)
-                        b.append(- tw.weight * tw_start)
+                        add_ub_row((etd_column, penalty_column), (- tw.weight, -1), - tw.weight * tw_start)
 
                     if tw.to_time < MAX_TIMESTAMP_VALUE:
-                        row = np.zeros(row_length)
-                        row[eta_column], row[penalty_column] = tw.weight, -1
-                        A.append(row)
-                        b.append(tw.weight * tw_end)
+                        add_ub_row((eta_column, penalty_column), (tw.weight, -1), tw.weight * tw_end)
 
                 penalty_index = penalty_index + 1
 
-        A = np.vstack(tuple(A))
-        b = np.array(b, dtype=int)
-        c = np.array([0 if i < 2 * plan_len else 1 for i in range(row_length)], dtype=int)
-        all_positive = [(0, None) for x in range(2 * plan_len)] + \
-                       [(0, None) for x in range(time_windows_len)]
-        # noinspection PyTypeChecker
-        res = linprog(c, A_ub=A, b_ub=b, bounds=all_positive, method='revised simplex',
-                      options={'presolve': True, 'tol': 0.00001})
+        A_ub = coo_matrix((ub_values, (ub_rows, ub_columns)), shape=(len(b_ub), row_length)).tocsr()
+        b_ub = np.array(b_ub, dtype=np.int64)
+
+        # Arrival time on current node is equal to departure time from previous plus travel time
+        A_eq, b_eq = None, None
+        if plan_len > 1:
+            eq_rows = np.repeat(np.arange(plan_len - 1), 2)
+            eq_columns = np.column_stack((np.arange(1, plan_len), plan_len + np.arange(plan_len - 1))).ravel()
+            eq_values = np.tile([1, -1], plan_len - 1)
+            A_eq = coo_matrix((eq_values, (eq_rows, eq_columns)), shape=(plan_len - 1, row_length)).tocsr()
+            b_eq = np.array([car_duration_matrix[a][b] for a, b in zip(route[:-1], route[1:])], dtype=np.int64)
+
+        # the times get a tiny weight so that the earliest of the optimal schedules is picked, as by the chain
+        # computer - the weights are integers, so shifting any times changes the penalty by at least 1 a second
+        # or not at all, while all the times together weigh 1/2
+        c = np.zeros(row_length)
+        c[:2 * plan_len] = 1 / (4 * plan_len)
+        c[2 * plan_len:] = 1
+
+        res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=(0, None), method='highs')
 
         if res.success:
-            penalty = round(res.fun, ndigits=2)
+            penalty = round(res.x[2 * plan_len:].sum(), ndigits=2)
             etas = list(map(lambda e: e + timestamp_shift, res.x[0:plan_len]))
             etds = list(map(lambda e: e + timestamp_shift, res.x[plan_len:2 * plan_len]))
 
@@ -1,9 +1,48 @@
 import abc
+import os
 from abc import ABC
-from typing import List
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.helper.process_pool import SharedProcessPool
+from godeliver_planner.model.planner_config import PlannerConfig
+
+TIMETABLE_POOL_WORKERS = os.cpu_count() or 1
+
+
+class PlanTimetable:
+
+    def __init__(self, etas: List[int] = None, etds: List[int] = None, penalty: float = None,
+                 error: Optional[Exception] = None) -> None:
+        super().__init__()
+        self.etas = etas
+        self.etds = etds
+        self.penalty = penalty
+        self.error = error          # why the timetable of the route could not be computed
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def _compute_timetables_in_worker(computer_class, config: PlannerConfig, route_inputs: List[tuple]) \
+        -> List[PlanTimetable]:
+    computer = computer_class()
+
+    return [computer.compute_timetable_safe(*route_input, config=config) for route_input in route_inputs]
 
 
 class AbstractPlanTimetableComputer(ABC):
+    # whether a batch is worth shipping to worker processes
+    PARALLEL_BATCHES = True
+
+    # the pool outlives the batch, starting the processes costs more than the timetables
+    _pool = SharedProcessPool(max_workers=TIMETABLE_POOL_WORKERS)
+
+    @staticmethod
+    def _node_set(nodes) -> frozenset:
+        return nodes if isinstance(nodes, frozenset) else frozenset(nodes)
 
     @abc.abstractmethod
     def compute_optimal_timetable(self,
@@ -11,5 +50,83 @@ class AbstractPlanTimetableComputer(ABC):
                                   pickup_nodes: List[int],
                                   car_duration_matrix,
                                   time_windows: dict,
-                                  route: List[int]) -> (List[int], List[int], float):
+                                  route: List[int],
+                                  config: PlannerConfig) -> (List[int], List[int], float):
         pass
+
+    def compute_timetable_safe(self, drop_nodes, pickup_nodes, car_duration_matrix, time_windows,
+                               route: List[int], config: PlannerConfig) -> PlanTimetable:
+        try:
+            etas, etds, penalty = self.compute_optimal_timetable(drop_nodes=drop_nodes,
+                                                                 pickup_nodes=pickup_nodes,
+                                                                 car_duration_matrix=car_duration_matrix,
+                                                                 time_windows=time_windows,
+                                                                 route=route,
+                                                                 config=config)
+            return PlanTimetable(etas=etas, etds=etds, penalty=penalty)
+        except Exception as e:
+            return PlanTimetable(error=e)
+
+    def compute_optimal_timetables(self,
+                                   drop_nodes: List[int],
+                                   pickup_nodes: List[int],
+                                   car_duration_matrix,
+                                   time_windows: dict,
+                                   routes: List[List[int]],
+                                   config: PlannerConfig) -> List[PlanTimetable]:
+        """Timetables of all routes of a solution. A failing route is reported in its result and does not affect
+        the others. The routes are split among config.timetable_workers processes of the shared pool, None
+        computes them in this process."""
+        # the node lookups are built once for all routes instead of once per route
+        drop_nodes, pickup_nodes = self._node_set(drop_nodes), self._node_set(pickup_nodes)
+
+        workers = min(config.timetable_workers or 1, TIMETABLE_POOL_WORKERS, len(routes))
+        if not self.PARALLEL_BATCHES or workers <= 1:
+            return [self.compute_timetable_safe(drop_nodes, pickup_nodes, car_duration_matrix, time_windows, route,
+                                                config) for route in routes]
+
+        ret = [None] * len(routes)
+
+        # a worker gets only what its routes need - the legs, the windows and the types of their nodes
+        route_inputs = {}
+        for idx, route in enumerate(routes):
+            try:
+                legs = {}
+                for from_node, to_node in zip(route[:-1], route[1:]):
+                    legs.setdefault(from_node, {})[to_node] = car_duration_matrix[from_node][to_node]
+            except Exception as e:
+                ret[idx] = PlanTimetable(error=e)
+                continue
+
+            route_inputs[idx] = (drop_nodes.intersection(route), pickup_nodes.intersection(route), legs,
+                                 {node: time_windows[node] for node in route if node in time_windows}, route)
+
+        indices = list(route_inputs.keys())
+        chunks = [chunk for chunk in (indices[worker::workers] for worker in range(workers)) if chunk]
+
+        executor = self._pool.get_executor()
+        futures = []
+        for chunk in chunks:
+            try:
+                futures.append(executor.submit(_compute_timetables_in_worker, type(self), config,
+                                               [route_inputs[idx] for idx in chunk]))
+            except Exception as e:
+                futures.append(e)
+
+        for chunk, future in zip(chunks, futures):
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                timetables = future.result()
+            except Exception as e:
+                # a broken pool doesn't fail the routes, they are computed here
+                print(f"Timetables of {len(chunk)} routes computed in the process - {e!r}")
+                Metrics.increment('timetables.pool_failures')
+                if isinstance(e, (BrokenProcessPool, RuntimeError)):
+                    self._pool.discard(executor)
+                timetables = [self.compute_timetable_safe(*route_inputs[idx], config=config) for idx in chunk]
+
+            for idx, timetable in zip(chunk, timetables):
+                ret[idx] = timetable
+
+        return ret
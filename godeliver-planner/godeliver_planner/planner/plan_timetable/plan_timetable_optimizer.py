@@ -1,58 +1,65 @@
-from typing import List
+from typing import List, Optional
 
+from godeliver_planner.helper.config_provider import ConfigProvider
 from godeliver_planner.model.courier import Courier
 from godeliver_planner.model.delivery import Delivery
 from godeliver_planner.model.delivery_event import DeliveryEventType
 from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.planner_config import PlannerConfig
 from godeliver_planner.planner.plan_timetable.fixed_time_computer import FixedTimeComputer
 from godeliver_planner.planner.plan_timetable.plan_timetable_computer import AbstractPlanTimetableComputer
+from godeliver_planner.planner.plan_timetable.timetable_computer_provider import TimetableComputerProvider
 from godeliver_planner.planner.vrp_instance_builder import VrpInstanceBuilder
 from godeliver_planner.routing.routing_base import RoutingBase
 
 
 class PlanTimetableOptimizer:
-    def __init__(self, timetable_computer: AbstractPlanTimetableComputer, routing: RoutingBase) -> None:
+    def __init__(self, routing: RoutingBase, timetable_computer: Optional[AbstractPlanTimetableComputer] = None) -> None:
         super().__init__()
-        self.timetable_computer: AbstractPlanTimetableComputer = timetable_computer
+        # None selects the computer by the config of each request
+        self.timetable_computer: Optional[AbstractPlanTimetableComputer] = timetable_computer
         self.instance_builder = VrpInstanceBuilder(routing)
 
-    def update_etas_in_plan(self, plan: Plan, deliveries: List[Delivery], courier: Courier):
+    def update_etas_in_plan(self, plan: Plan, deliveries: List[Delivery], courier: Courier,
+                            config: Optional[PlannerConfig] = None):
+        time_blocks, fixed_times, _ = self.optimize_plan(plan=plan, deliveries=deliveries, courier=courier,
+                                                         config=config)
 
-        vrp_instance, vrp_mapping = self.instance_builder.create_instance(
+        return time_blocks, fixed_times
+
+    def optimize_plan(self, plan: Plan, deliveries: List[Delivery], courier: Courier,
+                      config: Optional[PlannerConfig] = None):
+        """Sets the optimal times to the events of the plan, returns their time blocks, fixed times and the penalty
+        of the timetable. None config uses the config of the request."""
+        if config is None:
+            config = ConfigProvider.get_config()
+
+        # only the legs along the plan are needed, nodes of the instance are their positions in the route
+        vrp_instance, vrp_mapping, route = self.instance_builder.create_route_instance(
+            plan=plan,
             deliveries=deliveries,
-            num_plans_to_create=1,
-            previous_plans=[plan],
-            couriers=[courier]
+            courier=courier,
+            config=config
         )
 
-        route =[vrp_instance.starts[0]] + vrp_instance.previous_plans[0]
-        node_id_to_road_idx = {node: next(filter(lambda n: n[1] == node, enumerate(route)))[0]
-                               for node in vrp_instance.pickup_nodes + vrp_instance.drop_nodes}
-        etas, etds, _ = self.timetable_computer.compute_optimal_timetable(
+        timetable_computer = self.timetable_computer or TimetableComputerProvider.get_timetable_computer(config)
+        etas, etds, penalty = timetable_computer.compute_optimal_timetable(
             pickup_nodes=vrp_instance.pickup_nodes,
             drop_nodes=vrp_instance.drop_nodes,
             car_duration_matrix=vrp_instance.car_duration_matrix,
             time_windows=vrp_instance.time_windows_dict,
-            route=route
+            route=route,
+            config=config
         )
 
         for event in plan.delivery_events:
             if event.type == DeliveryEventType.pickup:
-                event_deliveries_etas = [etas[node_id_to_road_idx[vrp_mapping.pickup_to_node[delivery_id]]]
-                                         for delivery_id in event.delivery_order_ids]
-                event_deliveries_etds = [etds[node_id_to_road_idx[vrp_mapping.pickup_to_node[delivery_id]]]
-                                         for delivery_id in event.delivery_order_ids]
+                event_nodes = [vrp_mapping.pickup_to_node[delivery_id] for delivery_id in event.delivery_order_ids]
             else:
-                event_deliveries_etas = [etas[node_id_to_road_idx[vrp_mapping.drop_to_node[delivery_id]]]
-                                         for delivery_id in event.delivery_order_ids]
-                event_deliveries_etds = [etds[node_id_to_road_idx[vrp_mapping.drop_to_node[delivery_id]]]
-                                         for delivery_id in event.delivery_order_ids]
+                event_nodes = [vrp_mapping.drop_to_node[delivery_id] for delivery_id in event.delivery_order_ids]
 
-            min_eta = min(event_deliveries_etas)
-            max_etd = max(event_deliveries_etds)
-
-            event.event_time.from_time = min_eta
-            event.event_time.to_time = max_etd
+            event.event_time.from_time = min(etas[node] for node in event_nodes)
+            event.event_time.to_time = max(etds[node] for node in event_nodes)
 
         fixed_times = FixedTimeComputer.compute_fixed_times(plan=plan,
                                                             start_node=vrp_instance.starts[0],
@@ -60,7 +67,7 @@ class PlanTimetableOptimizer:
                                                             vrp_mapping=vrp_mapping)
         time_blocks = [event.event_time for event in plan.delivery_events]
 
-        return time_blocks, fixed_times
+        return time_blocks, fixed_times, penalty
 
 
 
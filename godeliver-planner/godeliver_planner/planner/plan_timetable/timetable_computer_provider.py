@@ -0,0 +1,23 @@
+from godeliver_planner.model.planner_config import PlannerConfig, TimetableComputerType
+from godeliver_planner.planner.plan_timetable.cached_plan_timetable_computer import CachedPlanTimetableComputer
+from godeliver_planner.planner.plan_timetable.chain_plan_timetable_computer import ChainPlanTimetableComputer
+from godeliver_planner.planner.plan_timetable.lp_plan_timetable_computer import LpPlanTimetableComputer
+from godeliver_planner.planner.plan_timetable.plan_timetable_computer import AbstractPlanTimetableComputer
+
+
+class TimetableComputerProvider:
+
+    # the computers are stateless and can be shared
+    _computers = {
+        TimetableComputerType.lp: LpPlanTimetableComputer(),
+        TimetableComputerType.chain: ChainPlanTimetableComputer()
+    }
+
+    _cached_computers = {computer_type: CachedPlanTimetableComputer(computer)
+                         for computer_type, computer in _computers.items()}
+
+    @staticmethod
+    def get_timetable_computer(config: PlannerConfig) -> AbstractPlanTimetableComputer:
+        if config.timetable_cache_ttl > 0:
+            return TimetableComputerProvider._cached_computers[config.timetable_computer]
+        return TimetableComputerProvider._computers[config.timetable_computer]
@@ -0,0 +1,55 @@
+from typing import Dict, Optional
+
+from godeliver_planner.helper.process_pool import SharedProcessPool
+from godeliver_planner.model.planner_config import PlannerType
+from godeliver_planner.planner.abstract_planner import AbstractPlanner
+from godeliver_planner.planner.decomposition_planner import DecompositionPlanner
+from godeliver_planner.planner.insertion_heuristics_planner import InsertionHeuristicsPlanner
+from godeliver_planner.planner.insertion_ortools_planner import InsertionHeuristicORToolsPlanner
+from godeliver_planner.planner.ortools_planner import ORToolsPlanner
+from godeliver_planner.planner.process_pool_planner import ProcessPoolPlanner
+from godeliver_planner.routing.routing_base import RoutingBase
+
+
+class PlannerRegistry:
+    """
+    One planner of every type, built at startup and shared by all requests. The planners keep nothing of a
+    request - the config and the progress are passed to every call. With solve_workers the planners solve in a
+    pool of that many worker processes, None solves in the process of the request.
+    """
+
+    def __init__(self, routing: RoutingBase, solve_workers: Optional[int] = None) -> None:
+        super().__init__()
+        self.routing = routing
+
+        ortools_planner = ORToolsPlanner(routing=routing)
+        insertion_planner = InsertionHeuristicsPlanner(routing=routing)
+        insertion_ortools_planner = InsertionHeuristicORToolsPlanner(routing=routing,
+                                                                     ortools_planner=ortools_planner,
+                                                                     insertion_planner=insertion_planner)
+
+        self.planners: Dict[PlannerType, AbstractPlanner] = {
+            PlannerType.or_tools: ortools_planner,
+            PlannerType.insertion_heuristic: insertion_planner,
+            PlannerType.or_tools_insertion: insertion_ortools_planner,
+            PlannerType.go_or_tools_insertion: insertion_ortools_planner
+        }
+
+        self.decomposition_planners: Dict[PlannerType, AbstractPlanner] = {
+            planner_type: DecompositionPlanner(routing=routing, planner=planner)
+            for planner_type, planner in self.planners.items()
+        }
+
+        # the decomposed solves ship their clusters to worker processes themselves
+        if solve_workers:
+            solve_pool = SharedProcessPool(max_workers=solve_workers)
+            self.planners = {
+                planner_type: ProcessPoolPlanner(routing=routing, planner=planner, pool=solve_pool)
+                for planner_type, planner in self.planners.items()
+            }
+
+    def get_planner(self, planner_type: PlannerType, decomposed: bool = False) -> AbstractPlanner:
+        planners = self.decomposition_planners if decomposed else self.planners
+
+        # the other types are not served by this service
+        return planners.get(planner_type, planners[PlannerType.or_tools])
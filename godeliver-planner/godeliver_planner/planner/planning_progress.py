@@ -0,0 +1,23 @@
+from typing import Optional
+
+
+class PlanningStage:
+    BUILDING_INSTANCE = 'BUILDING_INSTANCE'
+    SOLVING = 'SOLVING'
+    CREATING_PLANS = 'CREATING_PLANS'
+
+
+class PlanningProgress:
+    """Receives the progress of a solve and tells the planner whether to go on. The default one ignores it."""
+
+    def report_stage(self, stage: str):
+        pass
+
+    def report_solution(self, cost: Optional[int]):
+        pass
+
+    def is_cancelled(self) -> bool:
+        return False
+
+
+NO_PROGRESS = PlanningProgress()
@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection
+from typing import List, Optional
+
+from godeliver_planner.helper.process_pool import SharedProcessPool
+from godeliver_planner.planner.abstract_planner import AbstractPlanner
+from godeliver_planner.planner.planning_progress import PlanningProgress, NO_PROGRESS
+from godeliver_planner.planner.vrp_instance_builder import VehicleRoutingProblemInstance, \
+    VehicleRoutingProblemSolution
+from godeliver_planner.routing.routing_base import RoutingBase
+
+PROGRESS_INTERVAL = 0.5         # seconds between the exchanges of the progress with the worker process
+
+
+class _WorkerProgress(PlanningProgress):
+    """The progress of a solve in a worker process. The costs of the solutions and the cancellation are exchanged
+    with the process of the request at most every PROGRESS_INTERVAL, the solver reports and asks far more often."""
+
+    def __init__(self, connection: Connection) -> None:
+        super().__init__()
+        self.connection = connection
+        self.cancelled = False
+
+        self._costs: List[Optional[int]] = []
+        self._exchanged_at = 0.
+
+    def report_solution(self, cost: Optional[int]):
+        self._costs.append(cost)
+        self._exchange()
+
+    def is_cancelled(self) -> bool:
+        self._exchange()
+        return self.cancelled
+
+    def flush(self):
+        self._exchange(force=True)
+
+    def _exchange(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._exchanged_at < PROGRESS_INTERVAL:
+            return
+        self._exchanged_at = now
+
+        if self._costs:
+            self.connection.send(self._costs)
+            self._costs = []
+
+        # the request's process sends a message only to cancel the solve
+        self.cancelled = self.cancelled or self.connection.poll()
+
+
+def _solve_in_worker(planner: AbstractPlanner, vrp_instance: VehicleRoutingProblemInstance,
+                     connection: Connection) -> VehicleRoutingProblemSolution:
+    progress = _WorkerProgress(connection)
+    solution = planner.solve(vrp_instance, progress)
+    progress.flush()
+    return solution
+
+
+class ProcessPoolPlanner(AbstractPlanner):
+    """
+    Solves the instances by the wrapped planner in a worker process of the pool. The solvers call back into
+    Python for every arc they evaluate, solves running in threads of one process would share a single core by
+    the GIL. The instance is built in the process of the request, which keeps the routing.
+    """
+
+    def __init__(self, routing: RoutingBase, planner: AbstractPlanner, pool: SharedProcessPool):
+        super().__init__(routing)
+        self.planner = planner
+        self.pool = pool
+        self.SUPPORTS_MERGED_PICKUPS = planner.SUPPORTS_MERGED_PICKUPS
+
+    def get_name(self) -> str:
+        return self.planner.get_name()
+
+    def solve(self, vrp_instance: VehicleRoutingProblemInstance,
+              progress: PlanningProgress = NO_PROGRESS) -> VehicleRoutingProblemSolution:
+        connection, worker_connection = Pipe()
+        cancel_sent = False
+
+        executor = self.pool.get_executor()
+        try:
+            future = executor.submit(_solve_in_worker, self.planner, vrp_instance, worker_connection)
+
+            while True:
+                done = wait([future], timeout=PROGRESS_INTERVAL).done
+
+                while connection.poll():
+                    for cost in connection.recv():
+                        progress.report_solution(cost)
+
+                if done:
+                    return future.result()
+
+                if not cancel_sent and progress.is_cancelled():
+                    connection.send(None)
+                    cancel_sent = True
+        except BrokenProcessPool:
+            self.pool.discard(executor)
+            raise
+        finally:
+            connection.close()
+            worker_connection.close()
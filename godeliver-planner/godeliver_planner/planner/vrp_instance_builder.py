@@ -5,18 +5,22 @@ from typing import List, Tuple, Optional, Dict
 
 import numpy as np
 
-from godeliver_planner.helper.config_provider import ConfigProvider
 from godeliver_planner.helper.timestamp_helper import TimestampHelper
 from godeliver_planner.model.courier import Courier
 from godeliver_planner.model.delivery import Delivery
 from godeliver_planner.model.delivery_event import DeliveryEventType
+from godeliver_planner.model.location import Location
 from godeliver_planner.model.plan import Plan
-from godeliver_planner.model.planner_config import PenaltySpecification, PenaltyDirection
+from godeliver_planner.model.planner_config import PenaltySpecification, PenaltyDirection, PlannerConfig
 from godeliver_planner.routing.osrm_service import OSRMProfile
 from godeliver_planner.routing.routing_base import RoutingBase
 
 MAX_TIMESTAMP_VALUE = 2147483647
 
+EARTH_RADIUS = 6371000
+LOCATION_CLUSTER_DISTANCE = 25     # meters, stops closer than this are served as one place
+DEFAULT_TIME_LIMIT = 120           # seconds of a solve when the request sets none
+
 
 class TimeWindowConstraint:
 
@@ -61,10 +65,11 @@ class VehicleRoutingProblemInstance:
                  start_time_windows: List[TimeWindowConstraint],
                  time_windows: List[TimeWindowConstraint],
                  time_windows_dict: Dict[int, List[TimeWindowConstraint]],
-                 pickup_service_time: ConfigProvider.get_config().get_service_time(DeliveryEventType.pickup),
-                 drop_service_time: ConfigProvider.get_config().get_service_time(DeliveryEventType.drop),
                  previous_plans: List[List[int]],
-                 time_limit: int = 120,
+                 config: PlannerConfig,
+                 time_limit: int = DEFAULT_TIME_LIMIT,
+                 allowed_successors: Optional[List[List[int]]] = None,
+                 car_duration_array: Optional[np.ndarray] = None,
                  ) -> None:
         super().__init__()
 
@@ -88,20 +93,38 @@ class VehicleRoutingProblemInstance:
         self.start_time_windows = start_time_windows
         self.time_windows = time_windows
         self.time_windows_dict = time_windows_dict
-        self.pickup_service_time = pickup_service_time
-        self.drop_service_time = drop_service_time
+
+        # the config of the request the instance was built for, the planners and timetable computers take it from here
+        self.config = config
+        self.pickup_service_time = config.get_service_time(DeliveryEventType.pickup)
+        self.drop_service_time = config.get_service_time(DeliveryEventType.drop)
 
         self.previous_plans = previous_plans
         self.time_limit = time_limit
 
+        # sparse successor lists per node, None when every arc may be used
+        self.allowed_successors = allowed_successors
+
+        self._car_duration_array = car_duration_array
+
+    @property
+    def car_duration_array(self) -> np.ndarray:
+        """The duration matrix as an array, converted on first use."""
+        if self._car_duration_array is None:
+            self._car_duration_array = np.asarray(self.car_duration_matrix, dtype=np.int64)
+        return self._car_duration_array
+
     def to_json(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True)
+        # the config stays on the Python side, the service times are sent on their own
+        return json.dumps(self, default=lambda o: {k: v for k, v in o.__dict__.items()
+                                                   if not k.startswith('_') and k != 'config'},
+                          sort_keys=True)
 
 
 class VehicleRoutingProblemMapping:
 
     def __init__(self, plan_idx_to_courier_id, drop_to_node, pickup_to_node, node_to_drop, node_to_pickup,
-                 delivery_plan_ids) -> None:
+                 delivery_plan_ids, node_to_pickups=None, node_clusters=None) -> None:
         self.plan_idx_to_courier_id = plan_idx_to_courier_id
         self.drop_to_node = drop_to_node
         self.pickup_to_node = pickup_to_node
@@ -110,6 +133,13 @@ class VehicleRoutingProblemMapping:
         self.node_to_pickup = node_to_pickup
         self.node_to_drop = node_to_drop
 
+        # all deliveries picked up at a node, more than one when co-located pickups were merged
+        self.node_to_pickups = node_to_pickups if node_to_pickups is not None \
+            else {node: [delivery] for node, delivery in node_to_pickup.items()}
+
+        # location cluster of every node, stops of one cluster are at the same place
+        self.node_clusters = node_clusters
+
 
 class VehicleRoutingProblemSolution:
     def __init__(self, plans: List[List[int]], etas: List[List[int]], etds: List[List[int]]) -> None:
@@ -134,17 +164,26 @@ class VrpInstanceBuilder:
         self.routing = routing
 
     def create_instance(self, deliveries: List[Delivery], couriers: List[Courier], num_plans_to_create: int,
-                        previous_plans: List[Plan]) \
+                        previous_plans: List[Plan], config: PlannerConfig, merge_pickups: bool = False) \
             -> (VehicleRoutingProblemInstance, VehicleRoutingProblemMapping):
 
+        pickup_groups = self._group_pickups(deliveries, merge=merge_pickups, config=config)
+
         duration_matrix, distance_matrix, start_locations, end_locations\
-            = self._create_duration_and_distance_matrix(deliveries, couriers, num_plans_to_create)
+            = self._create_duration_and_distance_matrix(pickup_groups, deliveries, couriers, num_plans_to_create,
+                                                        config)
 
-        node_to_pickup, node_to_drop, pickup_to_node, drop_to_node = \
-            self._create_node_delivery_mappings(deliveries, num_plans_to_create)
+        node_to_pickups, node_to_drop, pickup_to_node, drop_to_node = \
+            self._create_node_delivery_mappings(pickup_groups, deliveries, num_plans_to_create)
+        node_to_pickup = {node: group[0] for node, group in node_to_pickups.items()}
+
+        node_clusters = self._create_location_clusters(
+            locations=[group[0].origin for group in pickup_groups] + [delivery.destination for delivery in deliveries],
+            num_plans=num_plans_to_create
+        )
 
         node_time_windows, start_time_windows, time_windows = \
-            self._create_time_windows(deliveries, couriers, num_plans_to_create, pickup_to_node, drop_to_node)
+            self._create_time_windows(deliveries, couriers, num_plans_to_create, pickup_to_node, drop_to_node, config)
 
         deliveries_not_started, deliveries_in_progress = \
             self._create_info_deliveries(deliveries=deliveries,
@@ -162,7 +201,8 @@ class VrpInstanceBuilder:
         veh_id_to_courier_id = {idx: courier.id for idx, courier in enumerate(couriers)}
 
         courier_capacities, start_utilizations = self._create_courier_capacities(couriers=couriers,
-                                                                                 num_vehicles=num_plans_to_create)
+                                                                                 num_vehicles=num_plans_to_create,
+                                                                                 config=config)
 
         num_of_nodes = len(duration_matrix)
 
@@ -171,43 +211,248 @@ class VrpInstanceBuilder:
                                                  drop_to_node,
                                                  num_of_nodes)
 
+        pickup_nodes = list(node_to_pickups.keys())
+        drop_nodes = [drop_to_node[key] for key in drop_to_node.keys()]
+
+        allowed_successors = self._create_allowed_successors(
+            duration_matrix=duration_matrix,
+            num_plans=num_plans_to_create,
+            pickup_nodes=pickup_nodes,
+            drop_nodes=drop_nodes,
+            start_time_windows=start_time_windows,
+            time_windows=time_windows,
+            deliveries_not_started=deliveries_not_started,
+            previous_routes=previous_routes,
+            config=config
+        )
+
         return VehicleRoutingProblemInstance(
             car_distance_matrix=distance_matrix,
-            car_duration_matrix=duration_matrix,
+            car_duration_matrix=duration_matrix.tolist(),
+            car_duration_array=duration_matrix,
             num_plans_to_create=num_plans_to_create,
             starts=start_locations,
             ends=end_locations,
-            courier_capacities=courier_capacities if ConfigProvider.get_config().use_courier_capacity else None,
-            start_utilizations=start_utilizations if ConfigProvider.get_config().use_courier_capacity else None,
-            node_demands=node_demands if ConfigProvider.get_config().use_courier_capacity else None,
+            courier_capacities=courier_capacities if config.use_courier_capacity else None,
+            start_utilizations=start_utilizations if config.use_courier_capacity else None,
+            node_demands=node_demands if config.use_courier_capacity else None,
             deliveries_not_started=deliveries_not_started,
             deliveries_in_progress=deliveries_in_progress,
             node_time_windows=node_time_windows,
             start_time_windows=start_time_windows,
-            pickup_nodes=[pickup_to_node[key] for key in pickup_to_node.keys()],
-            drop_nodes=[drop_to_node[key] for key in drop_to_node.keys()],
-            time_windows_dict=time_windows,
+            pickup_nodes=pickup_nodes,
+            drop_nodes=drop_nodes,
+            time_windows_dict=dict(time_windows),
             time_windows=node_time_windows + start_time_windows,
-            pickup_service_time=ConfigProvider.get_config().get_service_time(DeliveryEventType.pickup),
-            drop_service_time=ConfigProvider.get_config().get_service_time(DeliveryEventType.drop),
-            previous_plans=previous_routes if ConfigProvider.get_config().use_previous_solution else None,
+            previous_plans=previous_routes if config.use_previous_solution else None,
+            allowed_successors=allowed_successors,
+            config=config,
         ), VehicleRoutingProblemMapping(
             plan_idx_to_courier_id=veh_id_to_courier_id,
             pickup_to_node=pickup_to_node,
             drop_to_node=drop_to_node,
             node_to_pickup=node_to_pickup,
             node_to_drop=node_to_drop,
-            delivery_plan_ids=delivery_plan_ids
+            delivery_plan_ids=delivery_plan_ids,
+            node_to_pickups=node_to_pickups,
+            node_clusters=node_clusters
         )
 
-    def _create_duration_and_distance_matrix(self, deliveries: List[Delivery], couriers: List[Courier], num_plans: int):
-        pickup_locations = list(map(lambda x: x.origin, filter(lambda x: x.origin is not None, deliveries)))
+    def create_route_instance(self, plan: Plan, deliveries: List[Delivery], courier: Courier, config: PlannerConfig) \
+            -> (VehicleRoutingProblemInstance, VehicleRoutingProblemMapping, List[int]):
+        """
+        Instance of a single fixed route, for computing its timetable. Node 0 is the courier start and the other
+        nodes are numbered by their position in the route. Only the legs along the route and between the first
+        nodes of consecutive events are fetched, the other entries of the matrices are EDGE_FORBIDDEN.
+        """
+        id_to_delivery = {delivery.id: delivery for delivery in deliveries}
+
+        locations = [courier.start_timelocation.location]
+        pickup_to_node, drop_to_node = {}, {}
+        for delivery_event in plan.delivery_events:
+            for delivery_order_id in delivery_event.delivery_order_ids:
+                delivery = id_to_delivery.get(delivery_order_id)
+                if delivery is None:
+                    continue
+
+                if delivery_event.type == DeliveryEventType.pickup:
+                    if delivery_order_id not in pickup_to_node:
+                        pickup_to_node[delivery_order_id] = len(locations)
+                        locations.append(delivery.origin)
+                elif delivery_order_id not in drop_to_node:
+                    drop_to_node[delivery_order_id] = len(locations)
+                    locations.append(delivery.destination)
+
+        route = list(range(len(locations)))
+
+        event_nodes = [0] + [pickup_to_node.get(event.delivery_order_ids[0]) if event.type == DeliveryEventType.pickup
+                             else drop_to_node.get(event.delivery_order_ids[0]) for event in plan.delivery_events]
+        legs = list(zip(route[:-1], route[1:])) + \
+            [(a, b) for a, b in zip(event_nodes[:-1], event_nodes[1:]) if a is not None and b is not None]
+        legs = list(dict.fromkeys(legs))
+
+        durations, distances = self.routing.get_legs([(locations[a], locations[b]) for a, b in legs])
+
+        duration_matrix = np.full((len(locations), len(locations)), EDGE_FORBIDDEN, dtype=np.int64)
+        distance_matrix = np.full((len(locations), len(locations)), EDGE_FORBIDDEN, dtype=float)
+        if legs:
+            from_nodes, to_nodes = map(list, zip(*legs))
+            duration_matrix[from_nodes, to_nodes] = durations
+            distance_matrix[from_nodes, to_nodes] = distances
+
+        route_deliveries = [id_to_delivery[delivery_id] for delivery_id in
+                            dict.fromkeys(list(pickup_to_node.keys()) + list(drop_to_node.keys()))]
+        node_time_windows, start_time_windows, time_windows = \
+            self._create_time_windows(route_deliveries, [courier], 1, pickup_to_node, drop_to_node, config)
+
+        node_to_pickup = {node: id_to_delivery[delivery_id] for delivery_id, node in pickup_to_node.items()}
+        node_to_drop = {node: id_to_delivery[delivery_id] for delivery_id, node in drop_to_node.items()}
+
+        return VehicleRoutingProblemInstance(
+            car_distance_matrix=distance_matrix.tolist(),
+            car_duration_matrix=duration_matrix.tolist(),
+            car_duration_array=duration_matrix,
+            num_plans_to_create=1,
+            starts=[0],
+            ends=[],
+            courier_capacities=None,
+            start_utilizations=None,
+            node_demands=None,
+            deliveries_not_started=[],
+            deliveries_in_progress=[],
+            node_time_windows=node_time_windows,
+            start_time_windows=start_time_windows,
+            pickup_nodes=list(node_to_pickup.keys()),
+            drop_nodes=list(node_to_drop.keys()),
+            time_windows_dict=dict(time_windows),
+            time_windows=node_time_windows + start_time_windows,
+            previous_plans=[route[1:]],
+            config=config,
+        ), VehicleRoutingProblemMapping(
+            plan_idx_to_courier_id={0: courier.id},
+            pickup_to_node=pickup_to_node,
+            drop_to_node=drop_to_node,
+            node_to_pickup=node_to_pickup,
+            node_to_drop=node_to_drop,
+            delivery_plan_ids=[plan.delivery_plan_id]
+        ), route
+
+    @staticmethod
+    def create_sub_instance(vrp_instance: VehicleRoutingProblemInstance, vehicles: List[int],
+                            deliveries_not_started: List[Tuple[int, int]],
+                            deliveries_in_progress: List[Tuple[int, int]]) \
+            -> (VehicleRoutingProblemInstance, List[int]):
+        """Restricts the instance to the given plans and requests. Returns the sub-instance together with
+        the list mapping its nodes to the nodes of the original instance."""
+        vehicle_to_sub = {vehicle: idx for idx, vehicle in enumerate(vehicles)}
+
+        pickup_nodes = list(dict.fromkeys(pickup for pickup, _ in deliveries_not_started))
+        drop_nodes = [drop for _, drop in deliveries_not_started] + [drop for _, drop in deliveries_in_progress]
+
+        nodes = [vrp_instance.starts[v] for v in vehicles] + [vrp_instance.ends[v] for v in vehicles] + \
+            pickup_nodes + drop_nodes
+        node_to_sub = {node: idx for idx, node in enumerate(nodes)}
+
+        def sub_matrix(matrix):
+            return np.asarray(matrix)[np.ix_(nodes, nodes)].tolist()
+
+        def sub_time_window(tw: TimeWindowConstraint):
+            return TimeWindowConstraint(node=node_to_sub[tw.node], is_hard=tw.is_hard, from_time=tw.from_time,
+                                        to_time=tw.to_time, weight=tw.weight)
+
+        node_time_windows = [sub_time_window(tw) for tw in vrp_instance.node_time_windows if tw.node in node_to_sub]
+        start_time_windows = [sub_time_window(tw) for tw in vrp_instance.start_time_windows
+                              if tw.node in node_to_sub]
+        time_windows = defaultdict(lambda: list())
+        for tw in node_time_windows + start_time_windows:
+            time_windows[tw.node].append(tw)
+
+        def per_vehicle(values):
+            return [values[v] for v in vehicles] if values is not None else None
+
+        previous_plans = None
+        if vrp_instance.previous_plans is not None:
+            previous_plans = [[node_to_sub[node] for node in route if node in node_to_sub]
+                              for route in per_vehicle(vrp_instance.previous_plans)]
+
+        allowed_successors = None
+        if vrp_instance.allowed_successors is not None:
+            allowed_successors = [[node_to_sub[s] for s in vrp_instance.allowed_successors[node] if s in node_to_sub]
+                                  for node in nodes]
+
+        sub_instance = VehicleRoutingProblemInstance(
+            car_distance_matrix=sub_matrix(vrp_instance.car_distance_matrix),
+            car_duration_matrix=sub_matrix(vrp_instance.car_duration_matrix),
+            num_plans_to_create=len(vehicles),
+            starts=list(range(len(vehicles))),
+            ends=list(range(len(vehicles), 2 * len(vehicles))),
+            courier_capacities=per_vehicle(vrp_instance.courier_capacities),
+            start_utilizations=per_vehicle(vrp_instance.start_utilizations),
+            node_demands=[vrp_instance.node_demands[n] for n in nodes] if vrp_instance.node_demands else None,
+            pickup_nodes=[node_to_sub[n] for n in pickup_nodes],
+            drop_nodes=[node_to_sub[n] for n in drop_nodes],
+            deliveries_not_started=[(node_to_sub[p], node_to_sub[d]) for p, d in deliveries_not_started],
+            deliveries_in_progress=[(vehicle_to_sub[c], node_to_sub[d]) for c, d in deliveries_in_progress],
+            node_time_windows=node_time_windows,
+            start_time_windows=start_time_windows,
+            time_windows=node_time_windows + start_time_windows,
+            time_windows_dict=dict(time_windows),
+            previous_plans=previous_plans,
+            config=vrp_instance.config,
+            time_limit=vrp_instance.time_limit,
+            allowed_successors=allowed_successors
+        )
+
+        return sub_instance, nodes
+
+    @staticmethod
+    def _group_pickups(deliveries: List[Delivery], merge: bool, config: PlannerConfig) -> List[List[Delivery]]:
+        """Deliveries sharing a pickup node. Pickups closer than pickup_merge_distance whose windows differ by at
+        most pickup_merge_time_tolerance end up in one group, the first delivery of a group is its representative."""
+        to_pickup = [delivery for delivery in deliveries if delivery.pickup_time is not None]
+
+        if not merge or len(to_pickup) < 2:
+            return [[delivery] for delivery in to_pickup]
+
+        coordinates = np.radians([[d.origin.latitude, d.origin.longitude] for d in to_pickup])
+        from_times = np.array([d.pickup_time.from_time for d in to_pickup], dtype=np.int64)
+        to_times = np.array([d.pickup_time.to_time if d.pickup_time.to_time is not None else -1 for d in to_pickup],
+                            dtype=np.int64)
+        kinds = [(d.pickup_time.asap, d.pickup_time.anytime, d.pickup_time.to_time is None) for d in to_pickup]
+
+        # equirectangular approximation is precise enough on tens of meters
+        groups = []
+        representatives = []
+        for idx, delivery in enumerate(to_pickup):
+            if representatives:
+                rep_idx = np.array(representatives)
+                d_lat = coordinates[rep_idx, 0] - coordinates[idx, 0]
+                d_lon = (coordinates[rep_idx, 1] - coordinates[idx, 1]) * np.cos(coordinates[idx, 0])
+                distances = EARTH_RADIUS * np.hypot(d_lat, d_lon)
+
+                candidates = (distances <= config.pickup_merge_distance) \
+                    & (np.abs(from_times[rep_idx] - from_times[idx]) <= config.pickup_merge_time_tolerance) \
+                    & (np.abs(to_times[rep_idx] - to_times[idx]) <= config.pickup_merge_time_tolerance)
+
+                group_idx = next((g for g in np.flatnonzero(candidates) if kinds[representatives[g]] == kinds[idx]),
+                                 None)
+                if group_idx is not None:
+                    groups[group_idx].append(delivery)
+                    continue
+
+            representatives.append(idx)
+            groups.append([delivery])
+
+        return groups
+
+    def _create_duration_and_distance_matrix(self, pickup_groups: List[List[Delivery]], deliveries: List[Delivery],
+                                             couriers: List[Courier], num_plans: int, config: PlannerConfig):
+        pickup_locations = [group[0].origin for group in pickup_groups]
         drop_locations = list(map(lambda x: x.destination, deliveries))
         courier_locations = list(map(lambda x: x.start_timelocation.location, couriers))
 
         locations = pickup_locations + drop_locations + courier_locations
 
-        config = ConfigProvider.get_config()
         if config.return_to_hub and config.hub_location:
             locations.append(config.hub_location)
 
@@ -244,10 +489,11 @@ class VrpInstanceBuilder:
             reshaped[a:, :a] = extended[:b, b:]
             reshaped[a:, a:] = extended[:b, :b]
 
-            return reshaped.tolist()
+            return reshaped
 
         car_distances = extend_matrix_by_starts_ends(matrix=car_distances,
-                                                     default_start_value=config.default_first_point_arrival_distance)
+                                                     default_start_value=config.default_first_point_arrival_distance)\
+            .tolist()
 
         car_durations = extend_matrix_by_starts_ends(matrix=car_durations,
                                                      default_start_value=config.default_first_point_arrival_time)
@@ -257,15 +503,13 @@ class VrpInstanceBuilder:
 
         return car_durations, car_distances, start_locations, end_locations
 
-    def _create_node_delivery_mappings(self, deliveries: List[Delivery], n_plans: int):
+    def _create_node_delivery_mappings(self, pickup_groups: List[List[Delivery]], deliveries: List[Delivery],
+                                       n_plans: int):
 
-        node_to_pickup = {}
+        node_to_pickups = {}
         node_idx = 2 * n_plans
-        for delivery in deliveries:
-            if delivery.pickup_time is None:
-                continue
-
-            node_to_pickup[node_idx] = delivery
+        for group in pickup_groups:
+            node_to_pickups[node_idx] = group
             node_idx += 1
 
         node_to_drop = {}
@@ -273,16 +517,37 @@ class VrpInstanceBuilder:
             node_to_drop[node_idx] = delivery
             node_idx += 1
 
-        pickup_to_node = {node_to_pickup[k].id: k for k in node_to_pickup.keys()}
+        pickup_to_node = {delivery.id: k for k in node_to_pickups.keys() for delivery in node_to_pickups[k]}
         drop_to_node = {node_to_drop[k].id: k for k in node_to_drop.keys()}
 
-        return node_to_pickup, node_to_drop, pickup_to_node, drop_to_node
+        return node_to_pickups, node_to_drop, pickup_to_node, drop_to_node
 
     @staticmethod
-    def _create_time_windows(deliveries: List[Delivery], couriers: List[Courier], n: int,
-                             pickup_to_node: dict, drop_to_node: dict):
-        config = ConfigProvider.get_config()
+    def _create_location_clusters(locations: List[Location], num_plans: int) -> List[int]:
+        """Location cluster of every node. Task nodes linked by a chain of stops closer than LOCATION_CLUSTER_DISTANCE
+        share the cluster, starts and ends have none (-1)."""
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        from scipy.spatial import cKDTree
+
+        ret = [-1] * (2 * num_plans)
+        if not locations:
+            return ret
+
+        coordinates = np.radians([[location.latitude, location.longitude] for location in locations])
+        points = EARTH_RADIUS * np.column_stack([coordinates[:, 0],
+                                                 coordinates[:, 1] * np.cos(coordinates[:, 0].mean())])
+
+        pairs = cKDTree(points).query_pairs(r=LOCATION_CLUSTER_DISTANCE, output_type='ndarray')
+        adjacency = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])),
+                               shape=(len(locations), len(locations)))
+        _, labels = connected_components(adjacency, directed=False)
+
+        return ret + labels.tolist()
 
+    @staticmethod
+    def _create_time_windows(deliveries: List[Delivery], couriers: List[Courier], n: int,
+                             pickup_to_node: dict, drop_to_node: dict, config: PlannerConfig):
         start_time_windows = []
         now_timestamp = TimestampHelper.current_timestamp()
         for node_idx in range(n):
@@ -299,9 +564,13 @@ class VrpInstanceBuilder:
             time_block = delivery.pickup_time if specification.node_type == DeliveryEventType.pickup else delivery.delivery_time
 
             if specification.node_type == DeliveryEventType.pickup:
-                node = pickup_to_node[delivery.id]
+                node = pickup_to_node.get(delivery.id)
             else:
-                node = drop_to_node[delivery.id]
+                node = drop_to_node.get(delivery.id)
+
+            # a route instance has no node for the pickup of a delivery in progress
+            if node is None:
+                return None
 
             ret = TimeWindowConstraint(node=node, is_hard=specification.is_hard, weight=specification.weight)
 
@@ -322,12 +591,24 @@ class VrpInstanceBuilder:
 
             return ret
 
-        node_time_windows = []
+        # merged pickups share their node, their windows are intersected so that one constraint per specification
+        # remains and no further time dimension is needed
+        specification_time_windows = {}
         for delivery in deliveries:
-            for specification in config.penalties:
+            for specification_idx, specification in enumerate(config.penalties):
                 tw = create_constraint_from_specification(delivery=delivery, specification=specification)
-                if tw:
-                    node_time_windows.append(tw)
+                if not tw:
+                    continue
+
+                merged_tw = specification_time_windows.get((tw.node, specification_idx))
+                if merged_tw is None:
+                    specification_time_windows[(tw.node, specification_idx)] = tw
+                else:
+                    merged_tw.from_time = max(merged_tw.from_time, tw.from_time)
+                    merged_tw.to_time = min(merged_tw.to_time, tw.to_time)
+                    merged_tw.weight += tw.weight
+
+        node_time_windows = list(specification_time_windows.values())
 
         time_windows = defaultdict(lambda: list())
         for tw in node_time_windows + start_time_windows:
@@ -335,6 +616,72 @@ class VrpInstanceBuilder:
 
         return node_time_windows, start_time_windows, time_windows
 
+    @staticmethod
+    def _create_allowed_successors(duration_matrix, num_plans: int, pickup_nodes: List[int], drop_nodes: List[int],
+                                   start_time_windows: List[TimeWindowConstraint],
+                                   time_windows: Dict[int, List[TimeWindowConstraint]],
+                                   deliveries_not_started: List[Tuple[int, int]],
+                                   previous_routes: Optional[List[List[int]]],
+                                   config: PlannerConfig) -> Optional[List[List[int]]]:
+        """
+        Granular neighbourhood of every node. An arc i -> j is kept when j is among the k nearest (by duration)
+        tasks of i or vice versa and when j can still be reached before its hard deadline, i.e.
+        earliest(i) + service(i) + travel(i, j) <= hard_latest(j). Arcs to the own drop, arcs of the previous
+        routes and arcs to the route ends are always kept so the instance stays as feasible as it was.
+        """
+        neighbourhood_size = config.granular_neighbourhood_size
+        if not neighbourhood_size:
+            return None
+
+        durations = np.asarray(duration_matrix, dtype=np.int64)
+        num_of_nodes = len(durations)
+        first_task_node = 2 * num_plans
+        task_nodes = np.arange(first_task_node, num_of_nodes)
+
+        earliest = np.full(num_of_nodes, min(tw.from_time for tw in start_time_windows), dtype=np.int64)
+        latest = np.full(num_of_nodes, MAX_TIMESTAMP_VALUE, dtype=np.int64)
+        for node, tws in time_windows.items():
+            for tw in filter(lambda x: x.is_hard, tws):
+                if tw.has_lower_bound():
+                    earliest[node] = max(earliest[node], tw.from_time)
+                if tw.has_upper_bound():
+                    latest[node] = min(latest[node], tw.to_time)
+
+        service_times = np.zeros(num_of_nodes, dtype=np.int64)
+        service_times[pickup_nodes] = config.get_service_time(DeliveryEventType.pickup)
+        service_times[drop_nodes] = config.get_service_time(DeliveryEventType.drop)
+
+        reachable = (earliest + service_times)[:, None] + durations <= latest[None, :]
+
+        allowed = np.zeros((num_of_nodes, num_of_nodes), dtype=bool)
+
+        k = min(neighbourhood_size, len(task_nodes) - 1)
+        if k > 0:
+            task_durations = durations[np.ix_(task_nodes, task_nodes)]
+            np.fill_diagonal(task_durations, EDGE_FORBIDDEN)
+            nearest = np.argpartition(task_durations, k - 1, axis=1)[:, :k]
+
+            knn = np.zeros((len(task_nodes), len(task_nodes)), dtype=bool)
+            np.put_along_axis(knn, nearest, True, axis=1)
+            allowed[first_task_node:, first_task_node:] = knn | knn.T
+
+        # the first task of a route can be anything reachable from the courier's position
+        allowed[:num_plans, first_task_node:] = True
+        allowed &= reachable
+        np.fill_diagonal(allowed, False)
+
+        for pickup_node, drop_node in deliveries_not_started:
+            allowed[pickup_node, drop_node] = True
+
+        for vehicle_idx, route in enumerate(previous_routes or []):
+            nodes = [vehicle_idx] + route
+            allowed[nodes[:-1], nodes[1:]] = True
+
+        not_end_nodes = np.r_[0:num_plans, first_task_node:num_of_nodes]
+        allowed[np.ix_(not_end_nodes, np.arange(num_plans, first_task_node))] = True
+
+        return [np.flatnonzero(row).tolist() for row in allowed]
+
     @staticmethod
     def _create_info_deliveries(deliveries: List[Delivery], couriers: List[Courier],
                                 pickup_to_node: dict, drop_to_node: dict):
@@ -362,12 +709,13 @@ class VrpInstanceBuilder:
 
         routes = []
         delivery_plan_ids = []
+        visited_nodes = set()
         for courier in couriers:
             plan = [plan for plan in previous_plans if plan.assigned_courier_id == courier.id]
 
             plan = None if len(plan) == 0 else plan[0]
 
-            route = self._route_from_plan(plan, drop_to_node, pickup_to_node)
+            route = self._route_from_plan(plan, drop_to_node, pickup_to_node, visited_nodes)
             delivery_plan_ids.append(plan.delivery_plan_id if plan else None)
             routes.append(route)
 
@@ -377,14 +725,17 @@ class VrpInstanceBuilder:
         to_add = num_plans_to_create - len(routes)
         for i in range(to_add):
             plan = non_assigned_plans.pop() if non_assigned_plans else None
-            route = self._route_from_plan(plan, drop_to_node, pickup_to_node)
+            route = self._route_from_plan(plan, drop_to_node, pickup_to_node, visited_nodes)
             delivery_plan_ids.append(plan.delivery_plan_id if plan else None)
             routes.append(route)
 
         return routes, delivery_plan_ids
 
     @staticmethod
-    def _route_from_plan(plan: Plan, delivery_drop_to_node: dict, delivery_pickup_to_node: dict):
+    def _route_from_plan(plan: Plan, delivery_drop_to_node: dict, delivery_pickup_to_node: dict,
+                         visited_nodes: set = None):
+        # merged pickups map several delivery ids to the same node, which may be visited only once
+        visited_nodes = visited_nodes if visited_nodes is not None else set()
         route = []
 
         if plan is None:
@@ -398,15 +749,14 @@ class VrpInstanceBuilder:
                     node = delivery_drop_to_node[delivery_order_id]
                 else:
                     node = None
-                if node:
+                if node and node not in visited_nodes:
+                    visited_nodes.add(node)
                     route.append(node)
 
         return route
 
     @classmethod
-    def _create_courier_capacities(cls, couriers: List[Courier], num_vehicles: int):
-        config = ConfigProvider.get_config()
-
+    def _create_courier_capacities(cls, couriers: List[Courier], num_vehicles: int, config: PlannerConfig):
         capacities = [c.capacity for c in couriers] + \
                      [config.default_courier_capacity for _ in range(num_vehicles - len(couriers))]
 
@@ -423,7 +773,8 @@ class VrpInstanceBuilder:
             pickup_node = pickup_to_node.get(delivery.id, None)
 
             if pickup_node:
-                ret[pickup_node] = delivery.size
+                # merged pickups load all their deliveries at once
+                ret[pickup_node] += delivery.size or 0
 
             drop_node = drop_to_node.get(delivery.id, None)
             if drop_node:
@@ -4,7 +4,8 @@ from collections import Callable
 from flask_restful import Resource
 
 from godeliver_planner.helper.exceptions import APIException
-from flask import jsonify, abort
+from godeliver_planner.helper.model_codec import ModelCodec
+from flask import abort
 
 
 class AbstractResource(Resource):
@@ -19,6 +20,9 @@ class AbstractResource(Resource):
                     return fun()
             else:
                 return inp
+        except APIException:
+            # raised by the handler on purpose, its code is kept
+            raise
         except Exception as e:
             raise APIException(code, str(e))
 
@@ -35,6 +39,6 @@ class AbstractResource(Resource):
             return
 
         if ret_args is None:
-            return jsonify(status='success')
-        return jsonify(status='success', **ret_args)
+            return ModelCodec.json_response({'status': 'success'})
+        return ModelCodec.json_response({'status': 'success', **ret_args})
 
@@ -0,0 +1,166 @@
+from typing import Iterator, List, Optional
+
+from flask import Flask, abort, current_app
+from flask_restful_swagger_2 import Schema, swagger
+
+from godeliver_planner.helper.exceptions import APIException
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.model.plan import PlanModel
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.resource.abstract_resource import AbstractResource
+from godeliver_planner.resource.logistics_continuous_plannig_resource import LogisticsContinuousRequest, \
+    LogisticsContinuousPlan
+from godeliver_planner.service.batch_planning_service import BatchPlanningService, PlanningZone
+
+BATCH_MAX_ZONES = 64
+DEFAULT_BATCH_DEADLINE = 120        # seconds
+
+
+class BatchPlanningZoneRequest(LogisticsContinuousRequest):
+    properties = {
+        'zone_id': {
+            'type': 'string'
+        },
+        **LogisticsContinuousRequest.properties
+    }
+    required = ['zone_id', *LogisticsContinuousRequest.required]
+
+
+class BatchPlanningRequest(Schema):
+    type = 'object'
+    properties = {
+        'deadline': {
+            'type': 'integer'
+        },
+        'zones': {
+            'type': 'array',
+            'items': BatchPlanningZoneRequest
+        }
+    }
+    required = ['zones']
+
+
+class BatchPlanningZoneResponse(Schema):
+    type = 'object'
+    properties = {
+        'zone_id': {
+            'type': 'string'
+        },
+        'status': {
+            'type': 'string'
+        },
+        'code': {
+            'type': 'integer'
+        },
+        'message': {
+            'type': 'string'
+        },
+        'duration': {
+            'type': 'number'
+        },
+        'plans': {
+            'type': 'array',
+            'items': PlanModel
+        }
+    }
+
+
+class BatchPlanningResource(AbstractResource):
+
+    def __init__(self, **kwargs):
+        super(BatchPlanningResource, self).__init__()
+
+        self.batch_service: BatchPlanningService = kwargs['batch_service']
+
+    @swagger.doc({
+        'tags': ['Logistics'],
+        'summary': "Create plans of independent zones",
+        'description': 'Plans each zone as a continuous replanning request, the zones are solved in parallel '
+                       'within the deadline of the batch in seconds. The response streams a line per zone as '
+                       'soon as the zone is planned - newline delimited JSON, or MessagePack objects when '
+                       'accepted. A zone that can\'t be planned gets a line with its error code. A config passed '
+                       'with the batch applies to the zones that don\'t pass their own. The zone_id and the '
+                       'fleet_id of every zone shall be unique.',
+        'parameters': [
+            {
+                'name': 'body',
+                'description': 'Request body with the zones, that shall be planed.',
+                'in': 'body',
+                'schema': BatchPlanningRequest,
+                'required': True,
+            }
+        ],
+        'responses': {
+            '200': {
+                'description': 'A line per zone, in the order the zones are planned.',
+                'schema': BatchPlanningZoneResponse,
+                'headers': {},
+                'examples': {}
+            }
+        }
+    })
+    def post(self):
+        try:
+            args = self._execute_with_check(self.parse_body, None, 400)
+            self._execute_with_check(self.validate, args, 406)
+        except APIException as e:
+            abort(e.code, e.message)
+            return
+
+        return self.execute(**args)
+
+    @staticmethod
+    def parse_body():
+        body = ModelCodec.request_json()
+
+        deadline = int(body.get('deadline', DEFAULT_BATCH_DEADLINE))
+
+        config = None
+        try:
+            config = PlannerConfig.parse_obj(body['config']) if 'config' in body else None
+        except Exception as e:
+            print(f"Unable to parse config - {e}")
+
+        return {
+            'zones': list(body['zones']),
+            'deadline': deadline,
+            'config': config
+        }
+
+    @staticmethod
+    def validate(zones: List[dict], deadline: int, config: Optional[PlannerConfig]):
+        assert zones, "There shall be at least one zone."
+        assert len(zones) <= BATCH_MAX_ZONES, f"There shall be at most {BATCH_MAX_ZONES} zones."
+        assert deadline > 0, "The deadline shall be positive."
+
+        zone_ids = [str(zone.get('zone_id')) for zone in zones]
+        assert len(set(zone_ids)) == len(zone_ids), "The zone_id of every zone shall be unique."
+
+        # zones of the same fleet would supersede each other's solves
+        fleet_ids = [str(zone['fleet_id']) for zone in zones if zone.get('fleet_id') is not None]
+        assert len(set(fleet_ids)) == len(fleet_ids), "The fleet_id of every zone shall be unique."
+
+    def execute(self, zones: List[dict], deadline: int, config: Optional[PlannerConfig]):
+        planning_zones = []
+        errors = []
+        for zone in zones:
+            zone_id = str(zone.get('zone_id'))
+            # an invalid zone doesn't fail the others
+            try:
+                problem = self._execute_with_check(LogisticsContinuousPlan.parse_problem, {'body': zone}, 400)
+                self._execute_with_check(LogisticsContinuousPlan.validate, problem, 406)
+            except APIException as e:
+                errors.append({'zone_id': zone_id, 'status': 'error', 'code': e.code, 'message': e.message})
+                continue
+
+            problem['config'] = problem['config'] or config
+            planning_zones.append(PlanningZone(zone_id=zone_id, **problem))
+
+        # the stream is sent after the request context ends
+        return ModelCodec.stream_response(self._results(current_app._get_current_object(), errors, planning_zones,
+                                                        deadline))
+
+    def _results(self, app: Flask, errors: List[dict], zones: List[PlanningZone], deadline: int) -> Iterator[dict]:
+        yield from errors
+        # closing the stream closes the batch too
+        yield from self.batch_service.plan(app=app, zones=zones, deadline=deadline)
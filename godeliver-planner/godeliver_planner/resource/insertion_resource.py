@@ -0,0 +1,157 @@
+from typing import List, Optional
+
+from flask_restful_swagger_2 import Schema, swagger
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.model.courier import Courier, CourierModel
+from godeliver_planner.model.delivery import Delivery, DeliveryModel
+from godeliver_planner.model.plan import PlanModel, Plan
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.model.timeblock import TimeBlockModel
+from godeliver_planner.planner.insertion_planner import InsertionPlanner
+from godeliver_planner.resource.abstract_resource import AbstractResource
+
+
+class InsertionOptionModel(Schema):
+    type = 'object'
+    properties = {
+        'delivery_id': {
+            'type': 'string'
+        },
+        'courier_id': {
+            'type': 'string'
+        },
+        'pickup_time': TimeBlockModel,
+        'drop_time': TimeBlockModel,
+        'cost': {
+            'type': 'number'
+        },
+        'distance_delta': {
+            'type': 'number'
+        },
+        'penalty_delta': {
+            'type': 'number'
+        },
+        'plan': PlanModel
+    }
+
+
+class InsertionResponse(Schema):
+    type = 'object'
+    properties = {
+        'status': {
+            'type': 'string'
+        },
+        'insertions': {
+            'type': 'object',
+            'additionalProperties': {
+                'type': 'array',
+                'items': InsertionOptionModel
+            }
+        },
+    }
+
+
+class InsertionRequest(Schema):
+    type = 'object'
+    properties = {
+        'deliveries': {
+            'type': 'array',
+            'items': DeliveryModel
+        },
+        'new_deliveries': {
+            'type': 'array',
+            'items': DeliveryModel
+        },
+        'couriers': {
+            'type': 'array',
+            'items': CourierModel
+        },
+        'current_plans': {
+            'type': 'array',
+            'items': PlanModel
+        }
+    }
+    required = ['deliveries', 'new_deliveries', 'couriers', 'current_plans']
+
+
+class InsertionResource(AbstractResource):
+
+    def __init__(self, **kwargs):
+        super(InsertionResource, self).__init__()
+
+        self.insertion_planner: InsertionPlanner = kwargs['insertion_planner']
+
+    @swagger.doc({
+        'tags': ['Logistics'],
+        'summary': "Insert deliveries - quotes",
+        'description': 'Find the best places for the new deliveries in the current plans without replanning. '
+                       'Each new delivery is evaluated on its own, the best insertions are returned ordered by '
+                       'their cost.',
+        'parameters': [
+            {
+                'name': 'body',
+                'description': 'Request body with the current plans and the deliveries, that shall be inserted.',
+                'in': 'body',
+                'schema': InsertionRequest,
+                'required': True,
+            }
+        ],
+        'responses': {
+            '200': {
+                'description': 'The best insertions of every new delivery.',
+                'schema': InsertionResponse,
+                'headers': {},
+                'examples': {}
+            }
+        }
+    })
+    def post(self):
+        return self.handle_request(
+            parse_body=self.parse_body,
+            validate_input=self.validate,
+            execute=self.execute
+        )
+
+    def parse_body(self):
+        body = ModelCodec.request_json()
+
+        deliveries = ModelCodec.parse_deliveries(body['deliveries'])
+        new_deliveries = ModelCodec.parse_deliveries(body['new_deliveries'])
+        couriers = ModelCodec.parse_couriers(body['couriers'])
+        current_plans = ModelCodec.parse_plans(body['current_plans'])
+
+        config = None
+        try:
+            config = PlannerConfig.parse_obj(body['config']) if 'config' in body else None
+        except Exception as e:
+            print(f"Unable to parse config - {e}")
+
+        return {
+            'deliveries': deliveries,
+            'new_deliveries': new_deliveries,
+            'couriers': couriers,
+            'current_plans': current_plans,
+            'config': config
+        }
+
+    def validate(self, deliveries: List[Delivery], new_deliveries: List[Delivery], couriers: List[Courier],
+                 current_plans: List[Plan], config: Optional[PlannerConfig]):
+        for delivery in new_deliveries:
+            assert delivery.origin is not None and delivery.pickup_time is not None, \
+                f"New delivery {delivery.id} shall have origin and pickup_time filled."
+
+    def execute(self, deliveries: List[Delivery], new_deliveries: List[Delivery], couriers: List[Courier],
+                current_plans: List[Plan], config: Optional[PlannerConfig]):
+        ConfigProvider.set_current_config(config)
+
+        insertions = self.insertion_planner.find_insertions(deliveries=deliveries,
+                                                            couriers=couriers,
+                                                            current_plans=current_plans,
+                                                            new_deliveries=new_deliveries)
+
+        return {
+            'insertions': {delivery_id: [option.to_dict() for option in options]
+                           for delivery_id, options in insertions.items()}
+        }
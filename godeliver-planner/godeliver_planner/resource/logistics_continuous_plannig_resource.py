@@ -1,15 +1,15 @@
 from typing import List, Optional
 
-from flask_restful import request
 from flask_restful_swagger_2 import Schema, swagger
 
 from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.exceptions import APIException, PlanningOverloadedException
+from godeliver_planner.helper.model_codec import ModelCodec
 from godeliver_planner.logs.log_helper import LogHelper
 from godeliver_planner.model.courier import Courier, CourierModel
 from godeliver_planner.model.delivery import Delivery, DeliveryModel
 from godeliver_planner.model.plan import PlanModel, Plan
 from godeliver_planner.model.planner_config import PlannerConfig
-from godeliver_planner.planner.ortools_planner import ORToolsPlanner
 from godeliver_planner.resource.abstract_resource import AbstractResource
 from godeliver_planner.routing.routing_base import RoutingBase
 from godeliver_planner.service.planning_service import PlanningService
@@ -31,6 +31,9 @@ class LogisticsContinuousResponse(Schema):
 class LogisticsContinuousRequest(Schema):
     type = 'object'
     properties = {
+        'fleet_id': {
+            'type': 'string'
+        },
         'deliveries': {
             'type': 'array',
             'items': DeliveryModel
@@ -55,14 +58,16 @@ class LogisticsContinuousPlan(AbstractResource):
     def __init__(self, **kwargs):
         super(LogisticsContinuousPlan, self).__init__()
 
-        routing: RoutingBase = kwargs['routing']
-        self.planning_service: PlanningService = PlanningService(routing=routing)
+        # shared across requests so that its caches survive
+        self.planning_service: PlanningService = kwargs['planning_service']
 
     @swagger.doc({
         'tags': ['Logistics'],
         'summary': "Create plans - continuous replaning",
         'description': 'Create plans with passed deliveries. The number of created plans is '
-                       'least minimal_number_of_plans, unless the number of online couriers is bigger.',
+                       'least minimal_number_of_plans, unless the number of online couriers is bigger. '
+                       'Requests passing the same fleet_id are coalesced - an equivalent request waits for the '
+                       'running solve, any other one cancels it and both get the plans of the newer request.',
         'parameters': [
             {
                 'name': 'body',
@@ -88,20 +93,22 @@ class LogisticsContinuousPlan(AbstractResource):
             execute=self.execute
         )
 
-    def parse_body(self):
-        body = request.get_json(force=True)
+    @staticmethod
+    def parse_body():
+        return LogisticsContinuousPlan.parse_problem(ModelCodec.request_json())
 
-        deliveries = list(
-            map(lambda x: Delivery.parse_obj(x), body['deliveries'])
-        )
+    @staticmethod
+    def parse_problem(body: dict) -> dict:
+        """A planning problem of the request body, the batch endpoint passes a list of them."""
+        deliveries = ModelCodec.parse_deliveries(body['deliveries'])
 
-        couriers = list(
-            map(lambda x: Courier.parse_obj(x), body['couriers'])
-        )
+        couriers = ModelCodec.parse_couriers(body['couriers'])
 
         min_number_of_plans = int(body['min_number_of_plans'])
 
-        current_plans = [] if 'current_plans' not in body else [Plan.parse_obj(x) for x in body['current_plans']]
+        current_plans = ModelCodec.parse_plans(body.get('current_plans'))
+
+        fleet_id = str(body['fleet_id']) if body.get('fleet_id') is not None else None
 
         config = None
         try:
@@ -114,11 +121,13 @@ class LogisticsContinuousPlan(AbstractResource):
             'couriers': couriers,
             'min_number_of_plans': min_number_of_plans,
             'current_plans': current_plans,
+            'fleet_id': fleet_id,
             'config': config
         }
 
-    def validate(self, deliveries: List[Delivery], couriers: List[Courier],
-                 min_number_of_plans: int, current_plans: List[Plan],
+    @staticmethod
+    def validate(deliveries: List[Delivery], couriers: List[Courier],
+                 min_number_of_plans: int, current_plans: List[Plan], fleet_id: Optional[str],
                  config: Optional[PlannerConfig]):
         for delivery in deliveries:
             msg = "Either origin + pickup_time shall be empty and assigned_courier_id filled or " \
@@ -135,7 +144,7 @@ class LogisticsContinuousPlan(AbstractResource):
                                              f"with id {delivery.assigned_courier_id}."
 
     def execute(self, deliveries: List[Delivery], couriers: List[Courier],
-                min_number_of_plans: int, current_plans: List[Plan],
+                min_number_of_plans: int, current_plans: List[Plan], fleet_id: Optional[str],
                 config: Optional[PlannerConfig]):
         ConfigProvider.set_current_config(config)
 
@@ -143,7 +152,10 @@ class LogisticsContinuousPlan(AbstractResource):
             plans = self.planning_service.create_plans(deliveries=deliveries,
                                                        couriers=couriers,
                                                        min_number_of_plans=min_number_of_plans,
-                                                       previous_plans=current_plans)
+                                                       previous_plans=current_plans,
+                                                       fleet_id=fleet_id)
+        except PlanningOverloadedException as e:
+            raise APIException(503, e.message)
         except Exception as e:
             try:
                 LogHelper.log_failed_to_solve(deliveries=deliveries, couriers=couriers,
@@ -152,5 +164,5 @@ class LogisticsContinuousPlan(AbstractResource):
                 raise e
 
         return {
-            'plans': list(map(lambda x: x.dict(), plans))
+            'plans': ModelCodec.plans_to_dicts(plans)
         }
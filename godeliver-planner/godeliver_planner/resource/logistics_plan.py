@@ -1,14 +1,14 @@
 from typing import List
-from flask import jsonify, abort
+from flask import abort
 from flask_restful import Resource, request, reqparse, inputs
 from flask_restful_swagger_2 import Schema, swagger
 
 from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.model_codec import ModelCodec
 from godeliver_planner.model.delivery import Delivery, DeliveryModel
 from godeliver_planner.model.plan import Plan, PlanModel
-from godeliver_planner.helper.exceptions import NoSolutionException
+from godeliver_planner.helper.exceptions import APIException, NoSolutionException, PlanningOverloadedException
 from godeliver_planner.model.planner_config import PlannerConfig
-from godeliver_planner.planner.ortools_planner import ORToolsPlanner
 from godeliver_planner.routing.routing_base import RoutingBase
 from godeliver_planner.service.planning_service import PlanningService
 
@@ -45,8 +45,8 @@ class LogisticsPlan(Resource):
     def __init__(self, **kwargs):
         super(LogisticsPlan, self).__init__()
 
-        routing: RoutingBase = kwargs['routing']
-        self.planning_service: PlanningService = PlanningService(routing=routing)
+        # shared across requests so that its caches survive
+        self.planning_service: PlanningService = kwargs['planning_service']
 
     @swagger.doc({
         'tags': ['Logistics'],
@@ -72,13 +72,11 @@ class LogisticsPlan(Resource):
     })
     def post(self):
 
-        body = request.get_json(force=True)
         parser = reqparse.RequestParser()
 
         try:
-            deliveries = list(
-                map(lambda x: Delivery.parse_obj(x), body['deliveries'])
-            )
+            body = ModelCodec.request_json()
+            deliveries = ModelCodec.parse_deliveries(body['deliveries'])
 
             num_vehicles = body['num_vehicles']
 
@@ -92,8 +90,12 @@ class LogisticsPlan(Resource):
             plans: List[Plan] = self.planning_service.create_plans(deliveries=deliveries, couriers=[],
                                                                    min_number_of_plans=num_vehicles,
                                                                    previous_plans=[])
+        except APIException as e:
+            abort(e.code, e.message)
         except NoSolutionException as e:
             abort(404, e.message)
+        except PlanningOverloadedException as e:
+            abort(503, e.message)
 
         # add delivery_id
-        return jsonify(status='success', plans=list(map(lambda x: x.dict(), plans)))
+        return ModelCodec.json_response({'status': 'success', 'plans': ModelCodec.plans_to_dicts(plans)})
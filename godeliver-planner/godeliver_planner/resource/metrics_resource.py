@@ -0,0 +1,45 @@
+from flask_restful_swagger_2 import Schema, swagger
+
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.resource.abstract_resource import AbstractResource
+
+
+class MetricsResponse(Schema):
+    type = 'object'
+    properties = {
+        'status': {
+            'type': 'string'
+        },
+        'counters': {
+            'type': 'object'
+        }
+    }
+
+
+class MetricsResource(AbstractResource):
+
+    def __init__(self, **kwargs):
+        super(MetricsResource, self).__init__()
+
+    @swagger.doc({
+        'tags': ['Monitoring'],
+        'summary': "Planner metrics",
+        'description': 'Counters of the planner process, e.g. cache hits and misses with the hit rates.',
+        'responses': {
+            '200': {
+                'description': 'Current values of the counters.',
+                'schema': MetricsResponse,
+                'headers': {},
+                'examples': {}
+            }
+        }
+    })
+    def get(self):
+        return self.handle_request(
+            execute=self.execute
+        )
+
+    def execute(self):
+        return {
+            'counters': Metrics.get_counters()
+        }
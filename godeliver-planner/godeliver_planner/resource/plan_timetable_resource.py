@@ -1,16 +1,15 @@
 from typing import List
 
-from flask_restful import request
 from flask_restful_swagger_2 import Schema, swagger
 
 from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.model_codec import ModelCodec
 from godeliver_planner.logs.log_helper import LogHelper
 from godeliver_planner.model.courier import Courier, CourierModel
 from godeliver_planner.model.delivery import Delivery, DeliveryModel
 from godeliver_planner.model.plan import PlanModel, Plan
 from godeliver_planner.model.planner_config import PlannerConfig
 from godeliver_planner.model.timeblock import TimeBlockModel
-from godeliver_planner.planner.ortools_planner import ORToolsPlanner
 from godeliver_planner.planner.plan_timetable.plan_timetable_optimizer import PlanTimetableOptimizer
 from godeliver_planner.resource.abstract_resource import AbstractResource
 
@@ -86,15 +85,13 @@ class PlanTimetableResource(AbstractResource):
         )
 
     def parse_body(self):
-        body = request.get_json(force=True)
+        body = ModelCodec.request_json()
 
-        deliveries = list(
-            map(lambda x: Delivery.parse_obj(x), body['deliveries'])
-        )
+        deliveries = ModelCodec.parse_deliveries(body['deliveries'])
 
-        courier = Courier.parse_obj(body['courier'])
+        courier, = ModelCodec.parse_couriers([body['courier']])
 
-        plan = Plan.parse_obj(body['plan'])
+        plan, = ModelCodec.parse_plans([body['plan']])
         config = PlannerConfig.parse_obj(body.get('config', {}))
 
         return {
@@ -105,9 +102,6 @@ class PlanTimetableResource(AbstractResource):
         }
 
     def execute(self, deliveries: List[Delivery], courier: Courier, plan: Plan, config: PlannerConfig):
-        config.use_previous_solution = True     # enforcing the use of previous solution - otherwise the computing fails
-                                                # as the VRP instance will not contain the plan
-
         ConfigProvider.set_current_config(config)
 
         time_blocks, fixed_times = self.timetable_optimizer.update_etas_in_plan(
@@ -116,6 +110,6 @@ class PlanTimetableResource(AbstractResource):
                 plan=plan
         )
         return {
-            'time_blocks': list(map(lambda x: x.dict(), time_blocks)),
+            'time_blocks': [ModelCodec.time_block_to_dict(time_block) for time_block in time_blocks],
             'fixed_times': fixed_times
         }
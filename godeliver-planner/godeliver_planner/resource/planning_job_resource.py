@@ -0,0 +1,280 @@
+from typing import List, Optional
+
+from flask import current_app
+from flask_restful_swagger_2 import Schema, swagger
+
+from godeliver_planner.helper.exceptions import APIException, JobQueueFullException
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.model.courier import Courier, CourierModel
+from godeliver_planner.model.delivery import Delivery, DeliveryModel
+from godeliver_planner.model.plan import Plan, PlanModel
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.resource.abstract_resource import AbstractResource
+from godeliver_planner.resource.logistics_continuous_plannig_resource import LogisticsContinuousPlan
+from godeliver_planner.service.planning_job_service import PlanningJobService, PlanningJob, PlanningJobStatus
+
+
+class PlanningJobModel(Schema):
+    type = 'object'
+    properties = {
+        'job_id': {
+            'type': 'string'
+        },
+        'status': {
+            'type': 'string',
+            'enum': [val.value for val in PlanningJobStatus]
+        },
+        'stage': {
+            'type': 'string'
+        },
+        'best_cost': {
+            'type': 'integer'
+        },
+        'solutions_found': {
+            'type': 'integer'
+        },
+        'submitted_at': {
+            'type': 'number'
+        },
+        'started_at': {
+            'type': 'number'
+        },
+        'finished_at': {
+            'type': 'number'
+        },
+        'error': {
+            'type': 'string'
+        }
+    }
+
+
+class PlanningJobResponse(Schema):
+    type = 'object'
+    properties = {
+        'status': {
+            'type': 'string'
+        },
+        'job': PlanningJobModel
+    }
+
+
+class PlanningJobResultResponse(Schema):
+    type = 'object'
+    properties = {
+        'status': {
+            'type': 'string'
+        },
+        'job': PlanningJobModel,
+        'plans': {
+            'type': 'array',
+            'items': PlanModel
+        }
+    }
+
+
+class PlanningJobRequest(Schema):
+    type = 'object'
+    properties = {
+        'job_id': {
+            'type': 'string'
+        },
+        'fleet_id': {
+            'type': 'string'
+        },
+        'deliveries': {
+            'type': 'array',
+            'items': DeliveryModel
+        },
+        'couriers': {
+            'type': 'array',
+            'items': CourierModel
+        },
+        'minimal_number_of_plans': {
+            'type': 'integer',
+        },
+        'current_plans': {
+            'type': 'array',
+            'items': PlanModel
+        }
+    }
+    required = ['deliveries', 'couriers', 'minimal_number_of_plans']
+
+
+class PlanningJobsResource(AbstractResource):
+
+    def __init__(self, **kwargs):
+        super(PlanningJobsResource, self).__init__()
+
+        self.job_service: PlanningJobService = kwargs['job_service']
+
+    @swagger.doc({
+        'tags': ['Logistics'],
+        'summary': "Submit a planning job",
+        'description': 'Submit the same request as for continuous replanning, the plans are created in the '
+                       'background. The job is returned immediately, its status and result are polled. '
+                       'Submitting a job_id that is known already returns the existing job without solving again. '
+                       'Jobs of the same fleet_id are coalesced as the continuous replanning requests.',
+        'parameters': [
+            {
+                'name': 'body',
+                'description': 'Request body with the deliveries, that shall be planed.',
+                'in': 'body',
+                'schema': PlanningJobRequest,
+                'required': True,
+            }
+        ],
+        'responses': {
+            '200': {
+                'description': 'The submitted job.',
+                'schema': PlanningJobResponse,
+                'headers': {},
+                'examples': {}
+            },
+            '503': {
+                'description': 'Too many jobs are waiting, the job shall be submitted later.'
+            }
+        }
+    })
+    def post(self):
+        return self.handle_request(
+            parse_body=self.parse_body,
+            validate_input=self.validate,
+            execute=self.execute
+        )
+
+    @staticmethod
+    def parse_body():
+        ret = LogisticsContinuousPlan.parse_body()
+
+        job_id = ModelCodec.request_json().get('job_id')
+        ret['job_id'] = str(job_id) if job_id is not None else None
+
+        return ret
+
+    @staticmethod
+    def validate(deliveries: List[Delivery], couriers: List[Courier], min_number_of_plans: int,
+                 current_plans: List[Plan], fleet_id: Optional[str], config: Optional[PlannerConfig],
+                 job_id: Optional[str]):
+        LogisticsContinuousPlan.validate(deliveries=deliveries, couriers=couriers,
+                                         min_number_of_plans=min_number_of_plans, current_plans=current_plans,
+                                         fleet_id=fleet_id, config=config)
+
+    def execute(self, deliveries: List[Delivery], couriers: List[Courier], min_number_of_plans: int,
+                current_plans: List[Plan], fleet_id: Optional[str], config: Optional[PlannerConfig],
+                job_id: Optional[str]):
+        try:
+            job = self.job_service.submit(app=current_app._get_current_object(),
+                                          config=config,
+                                          deliveries=deliveries,
+                                          couriers=couriers,
+                                          min_number_of_plans=min_number_of_plans,
+                                          current_plans=current_plans,
+                                          fleet_id=fleet_id,
+                                          job_id=job_id)
+        except JobQueueFullException as e:
+            raise APIException(503, e.message)
+
+        return {
+            'job': job.to_dict()
+        }
+
+
+class PlanningJobResource(AbstractResource):
+
+    def __init__(self, **kwargs):
+        super(PlanningJobResource, self).__init__()
+
+        self.job_service: PlanningJobService = kwargs['job_service']
+
+    @swagger.doc({
+        'tags': ['Logistics'],
+        'summary': "Planning job status",
+        'description': 'Status of a planning job - its stage and the cost of the best solution found so far.',
+        'parameters': [
+            {
+                'name': 'job_id',
+                'in': 'path',
+                'type': 'string',
+                'required': True,
+            }
+        ],
+        'responses': {
+            '200': {
+                'description': 'The job.',
+                'schema': PlanningJobResponse,
+                'headers': {},
+                'examples': {}
+            },
+            '404': {
+                'description': 'The job is not known or its retention has passed.'
+            }
+        }
+    })
+    def get(self, job_id: str):
+        return self.handle_request(
+            request_parameters={'job_id': job_id},
+            get_entities=self.get_job,
+            execute=self.execute
+        )
+
+    def get_job(self, job_id: str):
+        job = self.job_service.get_job(job_id)
+        assert job is not None, f"There is no planning job {job_id}."
+
+        return {
+            'job': job
+        }
+
+    def execute(self, job: PlanningJob):
+        return {
+            'job': job.to_dict()
+        }
+
+
+class PlanningJobResultResource(PlanningJobResource):
+
+    @swagger.doc({
+        'tags': ['Logistics'],
+        'summary': "Planning job result",
+        'description': 'Plans created by a finished planning job.',
+        'parameters': [
+            {
+                'name': 'job_id',
+                'in': 'path',
+                'type': 'string',
+                'required': True,
+            }
+        ],
+        'responses': {
+            '200': {
+                'description': 'The job and its plans.',
+                'schema': PlanningJobResultResponse,
+                'headers': {},
+                'examples': {}
+            },
+            '404': {
+                'description': 'The job is not known or its retention has passed.'
+            },
+            '406': {
+                'description': 'The job has not finished yet or it has failed.'
+            }
+        }
+    })
+    def get(self, job_id: str):
+        return self.handle_request(
+            request_parameters={'job_id': job_id},
+            get_entities=self.get_job,
+            validate_input=self.validate,
+            execute=self.execute
+        )
+
+    @staticmethod
+    def validate(job: PlanningJob):
+        assert job.status != PlanningJobStatus.failed, f"Planning job {job.id} has failed - {job.error}"
+        assert job.status == PlanningJobStatus.done, f"Planning job {job.id} has not finished yet."
+
+    def execute(self, job: PlanningJob):
+        return {
+            'job': job.to_dict(),
+            'plans': ModelCodec.plans_to_dicts(job.plans)
+        }
@@ -0,0 +1,168 @@
+from typing import List, Optional
+
+from flask_restful_swagger_2 import Schema, swagger
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.exceptions import APIException, PlanningOverloadedException
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.model.courier import Courier, CourierModel
+from godeliver_planner.model.delivery import Delivery, DeliveryModel
+from godeliver_planner.model.plan import PlanModel, Plan
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.model.session_update import SessionUpdate, SessionUpdateModel
+from godeliver_planner.resource.abstract_resource import AbstractResource
+from godeliver_planner.service.planning_session_service import PlanningSessionService, PlanningSession
+
+
+class PlanningSessionResponse(Schema):
+    type = 'object'
+    properties = {
+        'status': {
+            'type': 'string'
+        },
+        'plans': {
+            'type': 'array',
+            'items': PlanModel
+        },
+    }
+
+
+class PlanningSessionRequest(Schema):
+    type = 'object'
+    properties = {
+        'fleet_id': {
+            'type': 'string'
+        },
+        'deliveries': {
+            'type': 'array',
+            'items': DeliveryModel
+        },
+        'couriers': {
+            'type': 'array',
+            'items': CourierModel
+        },
+        'min_number_of_plans': {
+            'type': 'integer',
+        },
+        'current_plans': {
+            'type': 'array',
+            'items': PlanModel
+        },
+        'update': SessionUpdateModel
+    }
+    required = ['fleet_id']
+
+
+class PlanningSessionResource(AbstractResource):
+
+    def __init__(self, **kwargs):
+        super(PlanningSessionResource, self).__init__()
+
+        self.session_service: PlanningSessionService = kwargs['session_service']
+
+    @swagger.doc({
+        'tags': ['Logistics'],
+        'summary': "Continuous replanning of a fleet - session",
+        'description': 'The first call of a fleet passes its full state - deliveries, couriers and '
+                       'min_number_of_plans - and the plans are created from scratch. The next calls pass only '
+                       'the update since the previous call and only the affected routes are replanned. '
+                       'Passing the full state again restarts the session. A failed update ends the session, the '
+                       'next call has to pass the full state.',
+        'parameters': [
+            {
+                'name': 'body',
+                'description': 'Request body with the fleet and its full state or its update.',
+                'in': 'body',
+                'schema': PlanningSessionRequest,
+                'required': True,
+            }
+        ],
+        'responses': {
+            '200': {
+                'description': 'All plans of the fleet.',
+                'schema': PlanningSessionResponse,
+                'headers': {},
+                'examples': {}
+            },
+            '404': {
+                'description': 'The fleet has no session, its full state has to be passed.'
+            }
+        }
+    })
+    def post(self):
+        return self.handle_request(
+            parse_body=self.parse_body,
+            get_entities=self.get_entities,
+            execute=self.execute
+        )
+
+    def parse_body(self):
+        body = ModelCodec.request_json()
+
+        deliveries, couriers, min_number_of_plans, current_plans = None, None, None, []
+        if 'deliveries' in body or 'couriers' in body:
+            deliveries = ModelCodec.parse_deliveries(body['deliveries'])
+            couriers = ModelCodec.parse_couriers(body['couriers'])
+            min_number_of_plans = int(body['min_number_of_plans'])
+            current_plans = ModelCodec.parse_plans(body.get('current_plans'))
+
+        update = SessionUpdate.parse_obj(body.get('update', {}))
+
+        config = None
+        try:
+            config = PlannerConfig.parse_obj(body['config']) if 'config' in body else None
+        except Exception as e:
+            print(f"Unable to parse config - {e}")
+
+        return {
+            'fleet_id': str(body['fleet_id']),
+            'deliveries': deliveries,
+            'couriers': couriers,
+            'min_number_of_plans': min_number_of_plans,
+            'current_plans': current_plans,
+            'update': update,
+            'config': config
+        }
+
+    def get_entities(self, fleet_id: str, deliveries: Optional[List[Delivery]], couriers: Optional[List[Courier]],
+                     min_number_of_plans: Optional[int], current_plans: List[Plan], update: SessionUpdate,
+                     config: Optional[PlannerConfig]):
+        ConfigProvider.set_current_config(config)
+
+        session = None
+        if deliveries is None:
+            session = self.session_service.get_session(fleet_id)
+            assert session is not None, f"There is no planning session of fleet {fleet_id}, " \
+                                        f"its deliveries, couriers and min_number_of_plans shall be passed."
+
+        return {
+            'fleet_id': fleet_id,
+            'session': session,
+            'deliveries': deliveries,
+            'couriers': couriers,
+            'min_number_of_plans': min_number_of_plans,
+            'current_plans': current_plans,
+            'update': update,
+            'config': config
+        }
+
+    def execute(self, fleet_id: str, session: Optional[PlanningSession], deliveries: Optional[List[Delivery]],
+                couriers: Optional[List[Courier]], min_number_of_plans: Optional[int], current_plans: List[Plan],
+                update: SessionUpdate, config: Optional[PlannerConfig]):
+        ConfigProvider.set_current_config(config)
+
+        try:
+            if session is None:
+                plans = self.session_service.start_session(fleet_id=fleet_id,
+                                                           deliveries=deliveries,
+                                                           couriers=couriers,
+                                                           min_number_of_plans=min_number_of_plans,
+                                                           current_plans=current_plans)
+            else:
+                plans = self.session_service.update_session(session=session, update=update)
+        except PlanningOverloadedException as e:
+            raise APIException(503, e.message)
+
+        return {
+            'plans': ModelCodec.plans_to_dicts(plans)
+        }
@@ -0,0 +1,144 @@
+from typing import List, Optional
+
+from flask_restful_swagger_2 import Schema, swagger
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.model.courier import Courier, CourierModel
+from godeliver_planner.model.delivery import Delivery, DeliveryModel
+from godeliver_planner.model.plan import PlanModel, Plan
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.planner.insertion_planner import InsertionPlanner
+from godeliver_planner.resource.abstract_resource import AbstractResource
+
+
+class RemovalResponse(Schema):
+    type = 'object'
+    properties = {
+        'status': {
+            'type': 'string'
+        },
+        'plans': {
+            'type': 'array',
+            'items': PlanModel
+        },
+        'unassigned_delivery_ids': {
+            'type': 'array',
+            'items': {
+                'type': 'string'
+            }
+        }
+    }
+
+
+class RemovalRequest(Schema):
+    type = 'object'
+    properties = {
+        'deliveries': {
+            'type': 'array',
+            'items': DeliveryModel
+        },
+        'couriers': {
+            'type': 'array',
+            'items': CourierModel
+        },
+        'current_plans': {
+            'type': 'array',
+            'items': PlanModel
+        },
+        'removed_delivery_ids': {
+            'type': 'array',
+            'items': {
+                'type': 'string'
+            }
+        },
+        'removed_courier_ids': {
+            'type': 'array',
+            'items': {
+                'type': 'string'
+            }
+        },
+        'reinsert': {
+            'type': 'boolean'
+        }
+    }
+    required = ['deliveries', 'couriers', 'current_plans']
+
+
+class RemovalResource(AbstractResource):
+
+    def __init__(self, **kwargs):
+        super(RemovalResource, self).__init__()
+
+        self.insertion_planner: InsertionPlanner = kwargs['insertion_planner']
+
+    @swagger.doc({
+        'tags': ['Logistics'],
+        'summary': "Remove deliveries and couriers",
+        'description': 'Remove cancelled deliveries and the plans of couriers that went offline from the current '
+                       'plans without replanning. Only the touched plans get a new timetable. The deliveries of the '
+                       'removed plans that were not picked up yet are inserted at their cheapest place unless '
+                       'reinsert is false, the others are returned as unassigned.',
+        'parameters': [
+            {
+                'name': 'body',
+                'description': 'Request body with the current plans and the deliveries and couriers to remove.',
+                'in': 'body',
+                'schema': RemovalRequest,
+                'required': True,
+            }
+        ],
+        'responses': {
+            '200': {
+                'description': 'The plans without the removed deliveries and couriers.',
+                'schema': RemovalResponse,
+                'headers': {},
+                'examples': {}
+            }
+        }
+    })
+    def post(self):
+        return self.handle_request(
+            parse_body=self.parse_body,
+            execute=self.execute
+        )
+
+    def parse_body(self):
+        body = ModelCodec.request_json()
+
+        deliveries = ModelCodec.parse_deliveries(body['deliveries'])
+        couriers = ModelCodec.parse_couriers(body['couriers'])
+        current_plans = ModelCodec.parse_plans(body['current_plans'])
+
+        config = None
+        try:
+            config = PlannerConfig.parse_obj(body['config']) if 'config' in body else None
+        except Exception as e:
+            print(f"Unable to parse config - {e}")
+
+        return {
+            'deliveries': deliveries,
+            'couriers': couriers,
+            'current_plans': current_plans,
+            'removed_delivery_ids': [str(x) for x in body.get('removed_delivery_ids', [])],
+            'removed_courier_ids': [str(x) for x in body.get('removed_courier_ids', [])],
+            'reinsert': bool(body.get('reinsert', True)),
+            'config': config
+        }
+
+    def execute(self, deliveries: List[Delivery], couriers: List[Courier], current_plans: List[Plan],
+                removed_delivery_ids: List[str], removed_courier_ids: List[str], reinsert: bool,
+                config: Optional[PlannerConfig]):
+        ConfigProvider.set_current_config(config)
+
+        plans, unassigned_delivery_ids = self.insertion_planner.remove_deliveries(deliveries=deliveries,
+                                                                                 couriers=couriers,
+                                                                                 current_plans=current_plans,
+                                                                                 delivery_ids=removed_delivery_ids,
+                                                                                 courier_ids=removed_courier_ids,
+                                                                                 reinsert=reinsert)
+
+        return {
+            'plans': ModelCodec.plans_to_dicts(plans),
+            'unassigned_delivery_ids': unassigned_delivery_ids
+        }
@@ -1,19 +1,39 @@
 from godeliver_planner.planner.plan_timetable.plan_timetable_computer import AbstractPlanTimetableComputer
 from godeliver_planner.planner.plan_timetable.plan_timetable_optimizer import PlanTimetableOptimizer
+from godeliver_planner.planner.insertion_planner import InsertionPlanner
+from godeliver_planner.resource.batch_planning_resource import BatchPlanningResource
+from godeliver_planner.resource.insertion_resource import InsertionResource
 from godeliver_planner.resource.logistics_continuous_plannig_resource import LogisticsContinuousPlan
 from godeliver_planner.resource.logistics_plan import LogisticsPlan
+from godeliver_planner.resource.metrics_resource import MetricsResource
+from godeliver_planner.resource.planning_job_resource import PlanningJobsResource, PlanningJobResource, \
+    PlanningJobResultResource
 from godeliver_planner.resource.plan_timetable_resource import PlanTimetableResource
+from godeliver_planner.resource.planning_session_resource import PlanningSessionResource
+from godeliver_planner.resource.removal_resource import RemovalResource
 from godeliver_planner.resource.routing_resource import RoutingResource
 from godeliver_planner.resource.swagger_resource import SwaggerResource
+from godeliver_planner.resource.warmup_resource import WarmupResource
 from godeliver_planner.routing.routing_base import RoutingBase
+from godeliver_planner.service.batch_planning_service import BatchPlanningService
+from godeliver_planner.service.planning_job_service import PlanningJobService
+from godeliver_planner.service.planning_service import PlanningService
+from godeliver_planner.service.planning_session_service import PlanningSessionService
+from godeliver_planner.service.warmup_service import WarmupService
 
 
 class ResourceManager(object):
 
     @classmethod
-    def register(cls, api, planner, continuous_planner,
+    def register(cls, api,
                  timetable_optimizer: PlanTimetableOptimizer,
-                 routing: RoutingBase):
+                 routing: RoutingBase,
+                 planning_service: PlanningService,
+                 insertion_planner: InsertionPlanner,
+                 session_service: PlanningSessionService,
+                 job_service: PlanningJobService,
+                 batch_service: BatchPlanningService,
+                 warmup_service: WarmupService):
 
         # ---REGISTER RESOURCE----
         # INFO: GoDeliver-Planner's API endpoints has to start with /delivery/planner because of GCP URL mapping
@@ -21,10 +41,35 @@ class ResourceManager(object):
         # DELIVERY PLANS
 
         api.add_resource(LogisticsPlan, '/delivery/planner/logistics',
-                         resource_class_kwargs={'routing': routing})
+                         resource_class_kwargs={'planning_service': planning_service})
 
         api.add_resource(LogisticsContinuousPlan, '/delivery/planner/continuous',
-                         resource_class_kwargs={'routing': routing})
+                         resource_class_kwargs={'planning_service': planning_service})
+
+        # PLANNING JOBS - solved in the background and polled
+
+        api.add_resource(PlanningJobsResource, '/delivery/planner/jobs',
+                         resource_class_kwargs={'job_service': job_service})
+
+        api.add_resource(PlanningJobResource, '/delivery/planner/jobs/<string:job_id>',
+                         resource_class_kwargs={'job_service': job_service})
+
+        api.add_resource(PlanningJobResultResource, '/delivery/planner/jobs/<string:job_id>/result',
+                         resource_class_kwargs={'job_service': job_service})
+
+        # BATCH PLANNING - independent zones planned in parallel, streamed as they finish
+
+        api.add_resource(BatchPlanningResource, '/delivery/planner/batch',
+                         resource_class_kwargs={'batch_service': batch_service})
+
+        api.add_resource(PlanningSessionResource, '/delivery/planner/session',
+                         resource_class_kwargs={'session_service': session_service})
+
+        api.add_resource(InsertionResource, '/delivery/planner/insertion',
+                         resource_class_kwargs={'insertion_planner': insertion_planner})
+
+        api.add_resource(RemovalResource, '/delivery/planner/removal',
+                         resource_class_kwargs={'insertion_planner': insertion_planner})
 
         api.add_resource(RoutingResource, '/delivery/planner//routing',
                          resource_class_kwargs={'routing': routing})
@@ -32,6 +77,13 @@ class ResourceManager(object):
         api.add_resource(PlanTimetableResource, '/delivery/planner/timetable/optimize',
                          resource_class_kwargs={'timetable_optimizer': timetable_optimizer})
 
+        # MONITORING
+        api.add_resource(MetricsResource, '/delivery/planner/metrics')
+
+        # App Engine sends the warmup request to the instance itself, it is not mapped under /delivery/planner
+        api.add_resource(WarmupResource, '/_ah/warmup',
+                         resource_class_kwargs={'warmup_service': warmup_service})
+
         # SWAGGER
         api.add_resource(SwaggerResource, '/swagger')
 
@@ -10,7 +10,6 @@ from godeliver_planner.model.delivery import Delivery, DeliveryModel
 from godeliver_planner.model.delivery_event import DeliveryEventType
 from godeliver_planner.model.location import LocationModel, TimeLocationModel, Location
 from godeliver_planner.model.plan import PlanModel
-from godeliver_planner.planner.ortools_planner import ORToolsPlanner
 from godeliver_planner.resource.abstract_resource import AbstractResource
 from godeliver_planner.routing.routing_base import RoutingBase
 
@@ -0,0 +1,52 @@
+from flask_restful_swagger_2 import Schema, swagger
+
+from godeliver_planner.resource.abstract_resource import AbstractResource
+from godeliver_planner.service.warmup_service import WarmupService
+
+
+class WarmupResponse(Schema):
+    type = 'object'
+    properties = {
+        'status': {
+            'type': 'string'
+        },
+        'ready': {
+            'type': 'boolean'
+        },
+        'steps': {
+            'type': 'object'
+        }
+    }
+
+
+class WarmupResource(AbstractResource):
+
+    def __init__(self, **kwargs):
+        super(WarmupResource, self).__init__()
+
+        self.warmup_service: WarmupService = kwargs['warmup_service']
+
+    @swagger.doc({
+        'tags': ['Monitoring'],
+        'summary': "Warmup of the worker",
+        'description': 'App Engine sends the warmup request to a new instance before any traffic. The worker runs '
+                       'its warmup while starting, so the response is sent once it is ready to plan.',
+        'responses': {
+            '200': {
+                'description': 'Duration or error of every warmup step.',
+                'schema': WarmupResponse,
+                'headers': {},
+                'examples': {}
+            }
+        }
+    })
+    def get(self):
+        return self.handle_request(
+            execute=self.execute
+        )
+
+    def execute(self):
+        return {
+            'ready': self.warmup_service.is_ready,
+            'steps': self.warmup_service.report
+        }
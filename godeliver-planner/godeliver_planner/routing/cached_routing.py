@@ -0,0 +1,104 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.helper.ttl_cache import TTLCache
+from godeliver_planner.model.location import Location
+from godeliver_planner.routing.routing_base import RoutingBase
+
+ROUTING_CACHE_SIZE = 250000
+MATRIX_CACHE_LOCATIONS = 300        # larger matrices are passed to the wrapped routing as a whole
+
+
+class CachedRouting(RoutingBase):
+    """Routing that remembers the legs it fetched. A matrix is assembled from the remembered legs, only the rows
+    and columns of the locations with unknown legs are fetched."""
+
+    def __init__(self, routing: RoutingBase) -> None:
+        super().__init__()
+        self.routing = routing
+
+        # (from location, to location) -> (duration, distance), the ttl is checked against the request config
+        self.leg_cache = TTLCache(max_size=ROUTING_CACHE_SIZE, ttl=0)
+
+    def create_duration_distance_matrix(self, locations: List[Location], **kwargs):
+        ttl = ConfigProvider.get_config().routing_cache_ttl
+
+        unique_locations = list(dict.fromkeys(locations))
+        if ttl <= 0 or len(unique_locations) > MATRIX_CACHE_LOCATIONS:
+            return self.routing.create_duration_distance_matrix(locations, **kwargs)
+
+        legs = [(a, b) for a in unique_locations for b in unique_locations]
+        cached = self.leg_cache.get_many(legs, ttl=ttl)
+
+        misses = sum(value is None for value in cached)
+        Metrics.increment('routing_cache.hits', len(legs) - misses)
+        Metrics.increment('routing_cache.misses', misses)
+
+        location_idx = {location: idx for idx, location in enumerate(unique_locations)}
+        durations = np.array([value[0] if value is not None else 0 for value in cached],
+                             dtype=np.int64).reshape(len(location_idx), -1)
+        distances = np.array([value[1] if value is not None else 0 for value in cached],
+                             dtype=float).reshape(len(location_idx), -1)
+
+        # locations whose rows and columns cover the unknown legs, the ones with the most unknown legs first
+        missing = np.array([value is None for value in cached]).reshape(len(location_idx), -1)
+        unknown_idx = []
+        while missing.any():
+            idx = int(np.argmax(missing.sum(axis=0) + missing.sum(axis=1)))
+            missing[idx, :], missing[:, idx] = False, False
+            unknown_idx.append(idx)
+
+        if len(unknown_idx) * 2 > len(unique_locations):
+            durations, distances = self.routing.create_duration_distance_matrix(unique_locations, **kwargs)
+            durations, distances = np.asarray(durations, dtype=np.int64), np.asarray(distances, dtype=float)
+            fetched_legs = legs
+        elif unknown_idx:
+            unknown_idx = sorted(unknown_idx)
+            unknown = [unique_locations[idx] for idx in unknown_idx]
+
+            # rows from and columns to the unknown locations
+            from_durations, from_distances = self.routing.create_duration_distance_table(unknown, unique_locations)
+            to_durations, to_distances = self.routing.create_duration_distance_table(unique_locations, unknown)
+            durations[unknown_idx, :], distances[unknown_idx, :] = from_durations, from_distances
+            durations[:, unknown_idx], distances[:, unknown_idx] = to_durations, to_distances
+
+            fetched_legs = [(a, b) for a in unknown for b in unique_locations] + \
+                           [(a, b) for a in unique_locations for b in unknown]
+        else:
+            fetched_legs = []
+
+        self.leg_cache.put_many([((a, b), (int(durations[location_idx[a], location_idx[b]]),
+                                           float(distances[location_idx[a], location_idx[b]])))
+                                 for a, b in fetched_legs])
+
+        idx = [location_idx[location] for location in locations]
+        return durations[np.ix_(idx, idx)].tolist(), distances[np.ix_(idx, idx)].tolist()
+
+    def create_duration_distance_table(self, sources: List[Location], destinations: List[Location]):
+        return self.routing.create_duration_distance_table(sources, destinations)
+
+    def _get_duration_distance_route(self, locations: List[Location]) -> List[int]:
+        return self.routing._get_duration_distance_route(locations)
+
+    def get_legs(self, legs: List[Tuple[Location, Location]]) -> (List[int], List[float]):
+        ttl = ConfigProvider.get_config().routing_cache_ttl
+
+        cached = self.leg_cache.get_many(legs, ttl=ttl) if ttl > 0 else [None] * len(legs)
+
+        missing = list(dict.fromkeys(leg for leg, value in zip(legs, cached) if value is None))
+        misses = sum(value is None for value in cached)
+        Metrics.increment('routing_cache.hits', len(legs) - misses)
+        Metrics.increment('routing_cache.misses', misses)
+        if missing:
+            durations, distances = self.routing.get_legs(missing)
+
+            fetched = {leg: (duration, distance) for leg, duration, distance in zip(missing, durations, distances)}
+            if ttl > 0:
+                self.leg_cache.put_many(list(fetched.items()))
+
+            cached = [value if value is not None else fetched[leg] for leg, value in zip(legs, cached)]
+
+        return [value[0] for value in cached], [value[1] for value in cached]
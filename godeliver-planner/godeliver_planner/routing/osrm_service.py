@@ -1,17 +1,20 @@
+import asyncio
 import os
+import threading
 import time
 from enum import Enum
 from itertools import product
 from pprint import pprint
-from typing import List
+from typing import List, Optional
 
-import aiohttp
 import numpy as np
 
-from godeliver_planner.helper.utils import YamlConfig, run_async
+from godeliver_planner.helper.utils import YamlConfig
 from godeliver_planner.model.location import Location
 from godeliver_planner.routing.routing_base import RoutingBase
 
+OSRM_CONNECTIONS = 16          # connections kept open to the OSRM servers, shared by all threads
+
 
 class OSRMProfile(Enum):
     car = 'CAR'
@@ -35,6 +38,29 @@ class OSRMRouting(RoutingBase):
         self.session = session
         self.osrm_time_coeficient = 1.5
 
+        # the requests of all threads run on one event loop, so that they share the session and its connections
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_pid: Optional[int] = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            # a forked process doesn't inherit the thread running the loop
+            if self._loop is None or self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._loop_pid = os.getpid()
+                self.session = None
+                threading.Thread(target=self._loop.run_forever, name='osrm-loop', daemon=True).start()
+            return self._loop
+
+    async def _get_session(self):
+        import aiohttp
+
+        # runs on the loop, the session is bound to it
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=OSRM_CONNECTIONS))
+        return self.session
+
     def _build_url(self, locations: List[Location], mode: OSRMProfile, region: OSRMRegion=OSRMRegion.czechia):
 
         base_url = self.config['osrm'][region.value]['base_url']
@@ -68,42 +94,61 @@ class OSRMRouting(RoutingBase):
 
         return result_duration, result_distance
 
+    def create_duration_distance_table(self,
+                                       sources: List[Location],
+                                       destinations: List[Location],
+                                       mode: OSRMProfile = OSRMProfile.driving,
+                                       chunk_size: int = 100):
+
+        locations = np.array(sources + destinations)
+        source_idx = list(range(len(sources)))
+        destination_idx = list(range(len(sources), len(locations)))
+        index_map = list(product(self._chunks(source_idx, chunk_size), self._chunks(destination_idx, chunk_size)))
+
+        result_duration, result_distance = self._get_result_for_combinations(locations, index_map, mode)
+
+        result_duration = [row[len(sources):] for row in result_duration[:len(sources)]]
+        result_duration = (np.array(result_duration) * self.osrm_time_coeficient).astype(int).tolist()
+        result_distance = [row[len(sources):] for row in result_distance[:len(sources)]]
+
+        return result_duration, result_distance
+
     def _get_result_for_combinations(self, locations, index_map, mode):
         start_t = time.time()
 
-        result_duration = [[None for _ in range(len(locations))] for _ in range(len(locations))]
-        result_distance = [[None for _ in range(len(locations))] for _ in range(len(locations))]
+        result_duration = [[None] * len(locations) for _ in range(len(locations))]
+        result_distance = [[None] * len(locations) for _ in range(len(locations))]
 
         print("OSRM started")
 
         async def async_fetch():
+            session = await self._get_session()
             for imap in index_map:
-                async with aiohttp.ClientSession() as session:
-                    indmap = imap[0] + imap[1]
-                    locs = locations[indmap]
-                    # print("Get data for indexes: ", imap)
-                    # pprint(locs)
-                    url = self._build_url(locs, mode)
-
-                    params_url = {'sources': ";".join(map(str, range(0, len(imap[0])))),
-                                  'destinations': ";".join(map(str, range(len(imap[0]), len(locs)))),
-                                  'annotations': 'duration,distance',
-                                  # 'time': hour #  TODO see doc
-                                  }
-
-                    async with session.get(url, params=params_url, headers=self.auth_header()) as response:
-                        response.raise_for_status()
-                        data = await response.json()
-                        # print(f'Response: {data}')
-
-                    self._insert_to(from_matrix=data['distances'],
-                                    to_matrix=result_distance,
-                                    x_axe_indexes=imap[0], y_axe_indexes=imap[1])
-                    self._insert_to(from_matrix=data['durations'],
-                                    to_matrix=result_duration,
-                                    x_axe_indexes=imap[0], y_axe_indexes=imap[1])
-
-        run_async(async_fetch)
+                indmap = imap[0] + imap[1]
+                locs = locations[indmap]
+                # print("Get data for indexes: ", imap)
+                # pprint(locs)
+                url = self._build_url(locs, mode)
+
+                params_url = {'sources': ";".join(map(str, range(0, len(imap[0])))),
+                              'destinations': ";".join(map(str, range(len(imap[0]), len(locs)))),
+                              'annotations': 'duration,distance',
+                              # 'time': hour #  TODO see doc
+                              }
+
+                async with session.get(url, params=params_url, headers=self.auth_header()) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                    # print(f'Response: {data}')
+
+                self._insert_to(from_matrix=data['distances'],
+                                to_matrix=result_distance,
+                                x_axe_indexes=imap[0], y_axe_indexes=imap[1])
+                self._insert_to(from_matrix=data['durations'],
+                                to_matrix=result_duration,
+                                x_axe_indexes=imap[0], y_axe_indexes=imap[1])
+
+        asyncio.run_coroutine_threadsafe(async_fetch(), self._get_loop()).result()
         print("OSRM finished in time: ", time.time() - start_t)
 
         return result_duration, result_distance
@@ -150,7 +195,7 @@ class OSRMRouting(RoutingBase):
             result_duration_vector.append(int(result_duration_matrix[i][i + 1]))
             result_distance_vector.append(int(result_distance_matrix[i][i+1]))
 
-        result_duration_vector = (np.array(result_duration_vector) * self.osrm_time_coeficient).astype(np.int).tolist()
+        result_duration_vector = (np.array(result_duration_vector) * self.osrm_time_coeficient).astype(int).tolist()
 
         return result_duration_vector, result_distance_vector
 
@@ -1,5 +1,5 @@
 import abc
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from godeliver_planner.helper.config_provider import ConfigProvider
 from godeliver_planner.model.delivery_event import DeliveryEventType
@@ -16,6 +16,28 @@ class RoutingBase(metaclass=abc.ABCMeta):
     def _get_duration_distance_route(self, locations: List[Location]) -> List[int]:
         pass
 
+    def create_duration_distance_table(self, sources: List[Location], destinations: List[Location]):
+        """Durations and distances from every source to every destination."""
+        locations = list(dict.fromkeys(sources + destinations))
+        location_idx = {location: idx for idx, location in enumerate(locations)}
+
+        durations, distances = self.create_duration_distance_matrix(locations)
+
+        return [[durations[location_idx[a]][location_idx[b]] for b in destinations] for a in sources], \
+               [[distances[location_idx[a]][location_idx[b]] for b in destinations] for a in sources]
+
+    def get_legs(self, legs: List[Tuple[Location, Location]]) -> (List[int], List[float]):
+        """Durations and distances of the given legs. Only the table from their starts to their ends is fetched."""
+        sources = list(dict.fromkeys(leg[0] for leg in legs))
+        destinations = list(dict.fromkeys(leg[1] for leg in legs))
+        source_idx = {location: idx for idx, location in enumerate(sources)}
+        destination_idx = {location: idx for idx, location in enumerate(destinations)}
+
+        durations, distances = self.create_duration_distance_table(sources, destinations)
+
+        return [durations[source_idx[a]][destination_idx[b]] for a, b in legs], \
+               [distances[source_idx[a]][destination_idx[b]] for a, b in legs]
+
     def compute_time_along_route(self, locations: List[Location], starting_time: int) -> List[TimeLocation]:
         ret = []
 
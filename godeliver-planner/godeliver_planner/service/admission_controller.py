@@ -0,0 +1,172 @@
+import itertools
+import threading
+import time
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+from godeliver_planner.helper.exceptions import PlanningOverloadedException
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.planner.exceptions.planner_exceptions import PlanningCancelledException
+from godeliver_planner.planner.planning_progress import PlanningProgress, NO_PROGRESS
+from godeliver_planner.planner.vrp_instance_builder import DEFAULT_TIME_LIMIT
+
+ADMISSION_SLOTS = 2                 # solves running at the same time, the others wait
+SMALL_SOLVE_SLOTS = 1               # slots the large solves can't take
+LARGE_SOLVE_COST = 2000             # deliveries times plans of a large solve
+SECONDS_PER_COST_UNIT = 0.05        # estimated solve seconds per delivery and plan, up to the time limit
+CANCEL_CHECK_INTERVAL = 0.5         # seconds between the checks of a waiting solve being cancelled
+
+
+class AdmissionPriority(IntEnum):
+    """Waiting solves are started by their priority and then by their cost, the smallest first."""
+    session = 0         # updates of a planning session, never rejected - the session is already changed
+    interactive = 1     # a client waits for the response
+    batch = 2           # planning jobs
+
+
+class AdmissionTicket:
+
+    def __init__(self, priority: AdmissionPriority, cost: int, time_limit: Optional[int]) -> None:
+        super().__init__()
+        self.priority = priority
+        self.cost = cost
+        self.time_limit = time_limit        # None keeps the time limit of the instance
+        self.degraded = False
+
+        self.started_at: Optional[float] = None
+
+    @property
+    def is_large(self) -> bool:
+        return self.cost >= LARGE_SOLVE_COST
+
+    @property
+    def estimated_duration(self) -> float:
+        return AdmissionController.estimate_duration(self.cost, self.effective_time_limit)
+
+    @property
+    def effective_time_limit(self) -> int:
+        return self.time_limit if self.time_limit is not None else DEFAULT_TIME_LIMIT
+
+    def remaining_duration(self, now: float) -> float:
+        return max(0., self.estimated_duration - (now - self.started_at))
+
+
+class AdmissionController:
+    """
+    Admission of the solves to ADMISSION_SLOTS running at the same time, SMALL_SOLVE_SLOTS of them are kept for
+    the small solves so that they never wait for a large one. The cost of a solve is its deliveries times its
+    plans, its duration is estimated from the cost and its time limit. A solve whose estimated queue wait and
+    duration exceed the admission_deadline gets the admission_degraded_time_limit, if that doesn't meet the
+    deadline either, it is rejected. The deadline is checked again while the solve waits, so that the solves
+    started ahead of it can't hold it past the deadline.
+    """
+
+    def __init__(self, slots: int = ADMISSION_SLOTS, small_solve_slots: int = SMALL_SOLVE_SLOTS) -> None:
+        super().__init__()
+        self.slots = slots
+        self.small_solve_slots = small_solve_slots
+
+        self.running: List[AdmissionTicket] = []
+        self.waiting: Dict[Tuple, AdmissionTicket] = {}       # (priority, cost, arrival) -> ticket
+
+        self._arrivals = itertools.count()
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def estimate_duration(cost: int, time_limit: int) -> float:
+        return min(time_limit, SECONDS_PER_COST_UNIT * cost)
+
+    def admit(self, number_of_deliveries: int, number_of_plans: int, time_limit: Optional[int],
+              priority: AdmissionPriority, config: PlannerConfig,
+              progress: PlanningProgress = NO_PROGRESS) -> AdmissionTicket:
+        """Waits until the solve can start, returns its ticket with the time limit of the solve. The ticket has
+        to be released once the solve ends."""
+        ticket = AdmissionTicket(priority=priority, cost=number_of_deliveries * number_of_plans, time_limit=time_limit)
+
+        with self._condition:
+            key = (priority, ticket.cost, next(self._arrivals))
+            self.waiting[key] = ticket
+
+            try:
+                wait_start_t = time.time()
+                if config.admission_deadline > 0:
+                    self._check_deadline(ticket, key, 0., config.admission_deadline,
+                                         config.admission_degraded_time_limit)
+
+                if self._next_to_start() != key:
+                    Metrics.increment('admission.queued')
+
+                while self._next_to_start() != key:
+                    self._condition.wait(CANCEL_CHECK_INTERVAL)
+                    if progress.is_cancelled():
+                        raise PlanningCancelledException()
+
+                    # the solves arriving later may start first, the deadline counts from the arrival
+                    if config.admission_deadline > 0:
+                        self._check_deadline(ticket, key, time.time() - wait_start_t, config.admission_deadline,
+                                             config.admission_degraded_time_limit)
+            finally:
+                del self.waiting[key]
+                # another solve may be the next one now
+                self._condition.notify_all()
+
+            ticket.started_at = time.time()
+            self.running.append(ticket)
+
+        Metrics.increment('admission.admitted')
+        Metrics.increment('admission.queue_wait_ms', int((ticket.started_at - wait_start_t) * 1000))
+        return ticket
+
+    def release(self, ticket: AdmissionTicket):
+        with self._condition:
+            self.running.remove(ticket)
+            self._condition.notify_all()
+
+    def _free_slots(self, ticket: AdmissionTicket) -> int:
+        free_slots = self.slots - len(self.running)
+        if ticket.is_large:
+            large_slots = self.slots - self.small_solve_slots
+            free_slots = min(free_slots, large_slots - sum(running.is_large for running in self.running))
+        return free_slots
+
+    def _next_to_start(self) -> Optional[Tuple]:
+        """The first waiting solve that has a free slot."""
+        return next((key for key in sorted(self.waiting) if self._free_slots(self.waiting[key]) > 0), None)
+
+    def _estimate_wait(self, ticket: AdmissionTicket, key) -> float:
+        """Seconds until the solve starts, the work ahead of it is spread over the slots it can take."""
+        if self._free_slots(ticket) > 0 and self._next_to_start() == key:
+            return 0.
+
+        now = time.time()
+        slots = self.slots - self.small_solve_slots if ticket.is_large else self.slots
+        # a large solve can only wait for the other large ones
+        running = [running.remaining_duration(now) for running in self.running
+                   if running.is_large or not ticket.is_large]
+        ahead = [self.waiting[other_key].estimated_duration for other_key in self.waiting if other_key < key]
+        return (sum(running) + sum(ahead)) / max(1, slots)
+
+    def _check_deadline(self, ticket: AdmissionTicket, key, waited: float, deadline: int, degraded_time_limit: int):
+        """Checked at the arrival of the solve and again while it waits, a solve is degraded once."""
+        wait = waited + self._estimate_wait(ticket, key)
+        if wait + ticket.estimated_duration <= deadline:
+            return
+
+        # the session is changed already, its solve is only shortened
+        degraded_duration = self.estimate_duration(ticket.cost, degraded_time_limit)
+        if ticket.effective_time_limit > degraded_time_limit and \
+                (wait + degraded_duration <= deadline or ticket.priority == AdmissionPriority.session):
+            ticket.time_limit = degraded_time_limit
+            ticket.degraded = True
+            Metrics.increment('admission.degraded')
+            Metrics.increment(f'admission.degraded.{ticket.priority.name}')
+            return
+
+        if ticket.priority == AdmissionPriority.session:
+            return
+
+        Metrics.increment('admission.rejected')
+        Metrics.increment(f'admission.rejected.{ticket.priority.name}')
+        raise PlanningOverloadedException(f"The planner is overloaded, the solve would start {wait:.0f} s after "
+                                          f"its arrival and end after the deadline of {deadline} s.")
@@ -0,0 +1,133 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional
+
+from flask import Flask
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.exceptions import PlanningOverloadedException
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.logs.log_helper import LogHelper
+from godeliver_planner.model.courier import Courier
+from godeliver_planner.model.delivery import Delivery
+from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.planner.exceptions.planner_exceptions import PlanningCancelledException
+from godeliver_planner.planner.planning_progress import PlanningProgress
+from godeliver_planner.service.admission_controller import AdmissionPriority
+from godeliver_planner.service.planning_service import PlanningService
+
+BATCH_WORKERS = 4               # zones of all batches solved at the same time, the admission control still applies
+BATCH_DEADLINE_MARGIN = 5       # seconds of the deadline kept for the routing, the instance and the timetables
+
+
+class PlanningZone:
+    """An independent planning problem of a batch, e.g. the fleet of a city."""
+
+    def __init__(self, zone_id: str, deliveries: List[Delivery], couriers: List[Courier], min_number_of_plans: int,
+                 current_plans: List[Plan], fleet_id: Optional[str], config: Optional[PlannerConfig]) -> None:
+        super().__init__()
+        self.zone_id = zone_id
+        self.deliveries = deliveries
+        self.couriers = couriers
+        self.min_number_of_plans = min_number_of_plans
+        self.current_plans = current_plans
+        self.fleet_id = fleet_id
+        self.config = config
+
+
+class _Batch:
+
+    def __init__(self, deadline_at: float) -> None:
+        super().__init__()
+        self.deadline_at = deadline_at
+        self.abandoned = False
+
+
+class _ZoneProgress(PlanningProgress):
+    """A zone waiting for the solver is dropped once the deadline of its batch passes, a running solve ends by its
+    time limit. All zones stop when the client of the batch goes away."""
+
+    def __init__(self, batch: _Batch) -> None:
+        super().__init__()
+        self.batch = batch
+        self.started = False
+
+    def report_stage(self, stage: str):
+        self.started = True
+
+    def is_cancelled(self) -> bool:
+        return self.batch.abandoned or (not self.started and time.time() > self.batch.deadline_at)
+
+
+class BatchPlanningService:
+    """
+    Plans the zones of a batch in parallel, on BATCH_WORKERS threads shared by all batches, and yields the result
+    of every zone as soon as it is done. The zones share the deadline of the batch - every solve gets the time
+    left until it, and the routing and the caches of the planning service.
+    """
+
+    def __init__(self, planning_service: PlanningService) -> None:
+        super().__init__()
+        self.planning_service = planning_service
+
+        self.executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='planning-batch')
+
+    def plan(self, app: Flask, zones: List[PlanningZone], deadline: int) -> Iterator[dict]:
+        batch = _Batch(deadline_at=time.time() + deadline)
+        Metrics.increment('planning_batches.submitted')
+        Metrics.increment('planning_batches.zones', len(zones))
+
+        futures = [self.executor.submit(self._solve_zone, app, batch, zone) for zone in zones]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # the client went away, the zones that didn't start are not solved
+            batch.abandoned = True
+            for future in futures:
+                future.cancel()
+
+    def _solve_zone(self, app: Flask, batch: _Batch, zone: PlanningZone) -> dict:
+        start_t = time.time()
+        progress = _ZoneProgress(batch)
+
+        try:
+            if progress.is_cancelled():
+                raise PlanningCancelledException()
+
+            # the config of the zone lives in the application context
+            with app.app_context():
+                ConfigProvider.set_current_config(zone.config)
+
+                plans = self.planning_service.create_plans(
+                    deliveries=zone.deliveries,
+                    couriers=zone.couriers,
+                    min_number_of_plans=zone.min_number_of_plans,
+                    previous_plans=zone.current_plans,
+                    time_limit=max(1, int(batch.deadline_at - start_t) - BATCH_DEADLINE_MARGIN),
+                    progress=progress,
+                    fleet_id=zone.fleet_id,
+                    priority=AdmissionPriority.batch
+                )
+            ret = {'zone_id': zone.zone_id, 'status': 'success', 'plans': ModelCodec.plans_to_dicts(plans)}
+        except PlanningCancelledException:
+            ret = self._error(zone, 504, "The deadline of the batch passed before the zone was planned.")
+        except PlanningOverloadedException as e:
+            ret = self._error(zone, 503, e.message)
+        except Exception as e:
+            ret = self._error(zone, 500, str(e))
+            try:
+                LogHelper.log_failed_to_solve(deliveries=zone.deliveries, couriers=zone.couriers,
+                                              min_number_of_plans=zone.min_number_of_plans, exception=e)
+            except Exception as log_exception:
+                print(f"Unable to log the failed zone {zone.zone_id} - {log_exception}")
+
+        ret['duration'] = round(time.time() - start_t, 3)
+        Metrics.increment(f"planning_batches.zones_{ret['status']}")
+        return ret
+
+    @staticmethod
+    def _error(zone: PlanningZone, code: int, message: str) -> dict:
+        return {'zone_id': zone.zone_id, 'status': 'error', 'code': code, 'message': message}
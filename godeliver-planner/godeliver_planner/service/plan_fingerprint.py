@@ -0,0 +1,72 @@
+import hashlib
+import json
+from typing import List
+
+from godeliver_planner.model.courier import Courier
+from godeliver_planner.model.delivery import Delivery
+from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.planner_config import PlannerConfig
+
+METERS_PER_DEGREE = 111000
+
+
+class PlanFingerprint:
+    """
+    Canonical hash of a planning input. The exact key identifies requests that can be answered with a previous
+    result, courier positions and times are snapped to a grid given by the config tolerances so that a courier
+    standing at a traffic light does not invalidate it. The coarse key only covers the delivery and courier ids
+    and the config - requests sharing it can start from the previous result.
+    """
+
+    def __init__(self, exact: str, coarse: str) -> None:
+        super().__init__()
+        self.exact = exact
+        self.coarse = coarse
+
+    @staticmethod
+    def _hash(data) -> str:
+        return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def create(cls, deliveries: List[Delivery], couriers: List[Courier], min_number_of_plans: int,
+               previous_plans: List[Plan], config: PlannerConfig) -> 'PlanFingerprint':
+        position_step = max(config.plan_cache_position_tolerance, 1) / METERS_PER_DEGREE
+        time_step = max(config.plan_cache_time_tolerance, 1)
+
+        def snap_courier(courier: Courier):
+            data = courier.dict()
+            if courier.start_timelocation is not None:
+                location = courier.start_timelocation.location
+                data['start_timelocation'] = {
+                    'latitude': round(location.latitude / position_step),
+                    'longitude': round(location.longitude / position_step),
+                    'time': courier.start_timelocation.time // time_step
+                    if courier.start_timelocation.time is not None else None
+                }
+            return data
+
+        config_data = config.dict()
+        delivery_ids = sorted(delivery.id for delivery in deliveries)
+        courier_ids = sorted(courier.id for courier in couriers)
+
+        # only the identity of the current plans matters, their events are just a warm start for the solver
+        plan_ids = sorted((plan.delivery_plan_id or '', plan.assigned_courier_id or '')
+                          for plan in previous_plans or [])
+
+        exact = cls._hash({
+            'deliveries': sorted((delivery.dict() for delivery in deliveries), key=lambda d: d['id']),
+            'couriers': sorted((snap_courier(courier) for courier in couriers), key=lambda c: c['id']),
+            'min_number_of_plans': min_number_of_plans,
+            'plans': plan_ids,
+            'config': config_data
+        })
+
+        coarse = cls._hash({
+            'deliveries': delivery_ids,
+            'couriers': courier_ids,
+            'min_number_of_plans': min_number_of_plans,
+            'plans': plan_ids,
+            'config': config_data
+        })
+
+        return cls(exact=exact, coarse=coarse)
@@ -0,0 +1,159 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import List, Optional
+
+from flask import Flask
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.exceptions import JobQueueFullException, PlanningOverloadedException
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.helper.ttl_cache import TTLCache
+from godeliver_planner.logs.log_helper import LogHelper
+from godeliver_planner.model.courier import Courier
+from godeliver_planner.model.delivery import Delivery
+from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.planner.planning_progress import PlanningProgress
+from godeliver_planner.service.admission_controller import AdmissionPriority
+from godeliver_planner.service.planning_service import PlanningService
+
+JOB_WORKERS = 2                 # solves running at the same time
+JOB_QUEUE_SIZE = 16             # submitted jobs waiting for a worker, more are rejected
+JOB_RETENTION = 3600            # seconds a job and its result are kept after the last change
+JOB_CACHE_SIZE = 1024
+
+
+class PlanningJobStatus(str, Enum):
+    queued = 'QUEUED'
+    running = 'RUNNING'
+    done = 'DONE'
+    failed = 'FAILED'
+
+
+class PlanningJob(PlanningProgress):
+
+    def __init__(self, job_id: str) -> None:
+        super().__init__()
+        self.id = job_id
+        self.status = PlanningJobStatus.queued
+        self.stage: Optional[str] = None
+        self.best_cost: Optional[int] = None        # objective of the best solution found by the solver so far
+        self.solutions_found = 0
+
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self.plans: Optional[List[Plan]] = None
+        self.error: Optional[str] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (PlanningJobStatus.done, PlanningJobStatus.failed)
+
+    def report_stage(self, stage: str):
+        self.stage = stage
+
+    def report_solution(self, cost: Optional[int]):
+        self.solutions_found += 1
+        if cost is not None and (self.best_cost is None or cost < self.best_cost):
+            self.best_cost = cost
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.id,
+            'status': self.status.value,
+            'stage': self.stage,
+            'best_cost': self.best_cost,
+            'solutions_found': self.solutions_found,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error
+        }
+
+
+class PlanningJobService:
+    """
+    Runs the solves in background threads so that no request waits for them. The number of waiting jobs is
+    bounded and finished jobs are kept for JOB_RETENTION seconds. A job submitted again with the same id is not
+    solved again.
+    """
+
+    def __init__(self, planning_service: PlanningService) -> None:
+        super().__init__()
+        self.planning_service = planning_service
+
+        self.executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='planning-job')
+        self.jobs = TTLCache(max_size=JOB_CACHE_SIZE, ttl=JOB_RETENTION)
+
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def get_job(self, job_id: str) -> Optional[PlanningJob]:
+        return self.jobs.get(job_id)
+
+    def submit(self, app: Flask, config: Optional[PlannerConfig], deliveries: List[Delivery],
+               couriers: List[Courier], min_number_of_plans: int, current_plans: List[Plan],
+               fleet_id: Optional[str] = None, job_id: Optional[str] = None) -> PlanningJob:
+        with self._lock:
+            job = self.jobs.get(job_id) if job_id is not None else None
+            if job is not None:
+                return job
+
+            if self._queued >= JOB_QUEUE_SIZE:
+                Metrics.increment('planning_jobs.rejected')
+                raise JobQueueFullException(f"There are already {self._queued} planning jobs waiting.")
+
+            job = PlanningJob(job_id or uuid.uuid4().hex)
+            self.jobs.put(job.id, job)
+            self._queued += 1
+
+        Metrics.increment('planning_jobs.submitted')
+        self.executor.submit(self._run, app, config, job, deliveries, couriers, min_number_of_plans, current_plans,
+                             fleet_id)
+
+        return job
+
+    def _run(self, app: Flask, config: Optional[PlannerConfig], job: PlanningJob, deliveries: List[Delivery],
+             couriers: List[Courier], min_number_of_plans: int, current_plans: List[Plan],
+             fleet_id: Optional[str]):
+        with self._lock:
+            self._queued -= 1
+
+        job.status = PlanningJobStatus.running
+        job.started_at = time.time()
+
+        try:
+            # the config of the request lives in the application context
+            with app.app_context():
+                ConfigProvider.set_current_config(config)
+
+                job.plans = self.planning_service.create_plans(deliveries=deliveries,
+                                                               couriers=couriers,
+                                                               min_number_of_plans=min_number_of_plans,
+                                                               previous_plans=current_plans,
+                                                               progress=job,
+                                                               fleet_id=fleet_id,
+                                                               priority=AdmissionPriority.batch)
+            job.status = PlanningJobStatus.done
+        except PlanningOverloadedException as e:
+            job.error = e.message
+            job.status = PlanningJobStatus.failed
+        except Exception as e:
+            job.error = str(e)
+            job.status = PlanningJobStatus.failed
+            try:
+                LogHelper.log_failed_to_solve(deliveries=deliveries, couriers=couriers,
+                                              min_number_of_plans=min_number_of_plans, exception=e)
+            except Exception as log_exception:
+                print(f"Unable to log the failed job {job.id} - {log_exception}")
+        finally:
+            job.finished_at = time.time()
+            Metrics.increment(f'planning_jobs.{job.status.value.lower()}')
+
+            # the retention starts when the job finishes
+            self.jobs.put(job.id, job)
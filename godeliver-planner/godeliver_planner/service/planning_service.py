@@ -1,16 +1,43 @@
-from typing import List
+import threading
+from typing import List, Optional, Dict
 
 from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.helper.ttl_cache import TTLCache
 from godeliver_planner.model.courier import Courier
 from godeliver_planner.model.delivery import Delivery
 from godeliver_planner.model.plan import Plan
-from godeliver_planner.model.planner_config import PlannerType
-from godeliver_planner.planner.abstract_planner import AbstractPlanner
-from godeliver_planner.planner.insertion_heuristics_planner import InsertionHeuristicsPlanner
-from godeliver_planner.planner.insertion_ortools_planner import InsertionHeuristicORToolsPlanner
-from godeliver_planner.planner.insertion_ortools_planner import InsertionHeuristicORToolsPlanner
-from godeliver_planner.planner.ortools_planner import ORToolsPlanner
+from godeliver_planner.planner.planner_registry import PlannerRegistry
+from godeliver_planner.planner.planning_progress import PlanningProgress, NO_PROGRESS
 from godeliver_planner.routing.routing_base import RoutingBase
+from godeliver_planner.service.admission_controller import AdmissionController, AdmissionPriority
+from godeliver_planner.service.plan_fingerprint import PlanFingerprint
+
+PLAN_CACHE_SIZE = 64
+
+
+class _FleetSolve(PlanningProgress):
+    """A solve running for a fleet. Requests with equivalent inputs wait for its result, a newer request of the
+    fleet supersedes it - the solve is cancelled and its requests get the result of the newer one."""
+
+    def __init__(self, fingerprint: str, progress: Optional[PlanningProgress]) -> None:
+        super().__init__()
+        self.fingerprint = fingerprint
+        self.progress = progress or PlanningProgress()
+        self.superseded_by: Optional[_FleetSolve] = None
+
+        self.done = threading.Event()
+        self.plans: Optional[List[Plan]] = None
+        self.error: Optional[Exception] = None
+
+    def report_stage(self, stage: str):
+        self.progress.report_stage(stage)
+
+    def report_solution(self, cost: Optional[int]):
+        self.progress.report_solution(cost)
+
+    def is_cancelled(self) -> bool:
+        return self.superseded_by is not None or self.progress.is_cancelled()
 
 
 class PlanningService:
@@ -18,34 +45,152 @@ class PlanningService:
     def __init__(self, routing: RoutingBase) -> None:
         super().__init__()
         self.routing = routing
+        self.admission_controller = AdmissionController()
+        # a worker process for every solve admitted at the same time
+        self.planner_registry = PlannerRegistry(routing=routing, solve_workers=self.admission_controller.slots)
 
-    def _get_planner(self) -> AbstractPlanner:
-        config = ConfigProvider.get_config()
-
-        planner_type = config.planner_type
+        # keyed by the exact and coarse fingerprints, the ttl is checked against the request config on lookup
+        self.plan_cache = TTLCache(max_size=PLAN_CACHE_SIZE, ttl=0)
+        self.warm_start_cache = TTLCache(max_size=PLAN_CACHE_SIZE, ttl=0)
 
-        if planner_type == PlannerType.or_tools:
-            return ORToolsPlanner(routing=self.routing)
-        elif planner_type == PlannerType.insertion_heuristic:
-            return InsertionHeuristicsPlanner(routing=self.routing)
-        elif planner_type == PlannerType.or_tools_insertion:
-            return InsertionHeuristicORToolsPlanner(routing=self.routing)
-        elif planner_type == PlannerType.go_or_tools_insertion:
-            return InsertionHeuristicORToolsPlanner(routing=self.routing)
-        else:
-            return ORToolsPlanner(routing=self.routing)
+        # fleet id -> the solve running for the fleet
+        self.fleet_solves: Dict[str, _FleetSolve] = {}
+        self._fleet_lock = threading.Lock()
 
     def create_plans(self,
                      deliveries: List[Delivery],
                      couriers: List[Courier],
                      min_number_of_plans: int,
-                     previous_plans: List[Plan] = None):
+                     previous_plans: List[Plan] = None,
+                     time_limit: Optional[int] = None,
+                     progress: Optional[PlanningProgress] = None,
+                     fleet_id: Optional[str] = None,
+                     priority: AdmissionPriority = AdmissionPriority.interactive):
+        """
+        Requests passing a fleet_id are coalesced - a request equivalent to the solve running for the fleet waits
+        for it, any other request cancels it and the waiting requests get the newer result. The solves pass the
+        admission control by their priority, see AdmissionController.
+        """
+        if fleet_id is None:
+            return self._create_plans(deliveries=deliveries, couriers=couriers,
+                                      min_number_of_plans=min_number_of_plans, previous_plans=previous_plans,
+                                      time_limit=time_limit, progress=progress, priority=priority)
+
+        fingerprint = PlanFingerprint.create(deliveries=deliveries, couriers=couriers,
+                                             min_number_of_plans=min_number_of_plans,
+                                             previous_plans=previous_plans, config=ConfigProvider.get_config())
+
+        with self._fleet_lock:
+            solve = self.fleet_solves.get(fleet_id)
+            attach = solve is not None and solve.fingerprint == fingerprint.exact
+
+            if not attach:
+                new_solve = _FleetSolve(fingerprint=fingerprint.exact, progress=progress)
+                if solve is not None:
+                    print(f"Fleet {fleet_id}: cancelling the previous solve")
+                    solve.superseded_by = new_solve
+                self.fleet_solves[fleet_id] = new_solve
+
+        if attach:
+            Metrics.increment('plan_coalescing.attached')
+            return self._wait_for(solve)
+
+        if solve is not None:
+            Metrics.increment('plan_coalescing.superseded')
+
+        try:
+            new_solve.plans = self._create_plans(deliveries=deliveries, couriers=couriers,
+                                                 min_number_of_plans=min_number_of_plans,
+                                                 previous_plans=previous_plans, time_limit=time_limit,
+                                                 progress=new_solve, fingerprint=fingerprint,
+                                                 priority=priority)
+        except Exception as e:
+            new_solve.error = e
+        finally:
+            with self._fleet_lock:
+                if self.fleet_solves.get(fleet_id) is new_solve:
+                    del self.fleet_solves[fleet_id]
+                new_solve.done.set()
+
+        return self._wait_for(new_solve)
+
+    @staticmethod
+    def _wait_for(solve: _FleetSolve) -> List[Plan]:
+        # a solve is superseded only while running, the chain is final once it is done
+        solve.done.wait()
+        while solve.superseded_by is not None:
+            solve = solve.superseded_by
+            solve.done.wait()
+
+        if solve.error is not None:
+            raise solve.error
+
+        # the plans are shared by all requests of the solve
+        return [plan.copy(deep=True) for plan in solve.plans]
+
+    def _create_plans(self,
+                      deliveries: List[Delivery],
+                      couriers: List[Courier],
+                      min_number_of_plans: int,
+                      previous_plans: List[Plan] = None,
+                      time_limit: Optional[int] = None,
+                      progress: Optional[PlanningProgress] = None,
+                      fingerprint: Optional[PlanFingerprint] = None,
+                      priority: AdmissionPriority = AdmissionPriority.interactive):
+
+        config = ConfigProvider.get_config()
+
+        if config.plan_cache_ttl <= 0:
+            fingerprint = None
+        else:
+            # the fleet requests pass the fingerprint they are coalesced by
+            if fingerprint is None:
+                fingerprint = PlanFingerprint.create(deliveries=deliveries, couriers=couriers,
+                                                     min_number_of_plans=min_number_of_plans,
+                                                     previous_plans=previous_plans, config=config)
+
+            cached_plans = self.plan_cache.get(fingerprint.exact, ttl=config.plan_cache_ttl)
+            Metrics.increment('plan_cache.hits' if cached_plans is not None else 'plan_cache.misses')
+            if cached_plans is not None:
+                print("Returning cached plans")
+                return [plan.copy(deep=True) for plan in cached_plans]
+
+            warm_start_plans = self.warm_start_cache.get(fingerprint.coarse, ttl=config.plan_cache_ttl)
+            if warm_start_plans is not None and config.use_previous_solution:
+                print("Starting from cached plans")
+                previous_plans = [plan.copy(deep=True) for plan in warm_start_plans]
+
+        cluster_size = config.decomposition_cluster_size
+        planner = self.planner_registry.get_planner(planner_type=config.planner_type,
+                                                    decomposed=bool(cluster_size and len(deliveries) > cluster_size))
+
+        progress = progress or NO_PROGRESS
+        ticket = self.admission_controller.admit(number_of_deliveries=len(deliveries),
+                                                 number_of_plans=max(len(couriers), min_number_of_plans),
+                                                 time_limit=time_limit,
+                                                 priority=priority,
+                                                 config=config,
+                                                 progress=progress)
+        try:
+            plans = planner.logistics_planner(
+                deliveries=deliveries,
+                couriers=couriers,
+                min_number_of_plans=min_number_of_plans,
+                previous_plans=previous_plans,
+                time_limit=ticket.time_limit,
+                progress=progress,
+                config=config
+            )
+        finally:
+            self.admission_controller.release(ticket)
+
+        # a degraded solve is not cached, the next request may get the full time limit
+        if ticket.degraded:
+            fingerprint = None
 
-        planner = self._get_planner()
+        if fingerprint is not None:
+            cached_plans = [plan.copy(deep=True) for plan in plans]
+            self.plan_cache.put(fingerprint.exact, cached_plans)
+            self.warm_start_cache.put(fingerprint.coarse, cached_plans)
 
-        return planner.logistics_planner(
-            deliveries=deliveries,
-            couriers=couriers,
-            min_number_of_plans=min_number_of_plans,
-            previous_plans=previous_plans
-        )
+        return plans
@@ -0,0 +1,186 @@
+import threading
+from typing import List, Optional, Dict, Set
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.helper.ttl_cache import TTLCache
+from godeliver_planner.model.courier import Courier
+from godeliver_planner.model.delivery import Delivery
+from godeliver_planner.model.delivery_event import DeliveryEventType
+from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.session_update import SessionUpdate
+from godeliver_planner.planner.exceptions.planner_exceptions import PlanUnfeasibleException
+from godeliver_planner.planner.insertion_planner import InsertionPlanner
+from godeliver_planner.service.admission_controller import AdmissionPriority
+from godeliver_planner.service.planning_service import PlanningService
+
+SESSION_CACHE_SIZE = 256
+
+
+class PlanningSession:
+    """State of the continuous planning of one fleet kept between the calls - its deliveries, couriers and the
+    incumbent plans."""
+
+    def __init__(self, fleet_id: str, deliveries: List[Delivery], couriers: List[Courier], plans: List[Plan],
+                 min_number_of_plans: int) -> None:
+        super().__init__()
+        self.fleet_id = fleet_id
+        self.deliveries: Dict[str, Delivery] = {delivery.id: delivery for delivery in deliveries}
+        self.couriers: Dict[str, Courier] = {courier.id: courier for courier in couriers}
+        self.plans: List[Plan] = plans
+        self.min_number_of_plans = min_number_of_plans
+
+        # updates of one fleet are applied one after another
+        self.lock = threading.Lock()
+
+    def get_plan(self, courier_id: str) -> Optional[Plan]:
+        return next((plan for plan in self.plans if plan.assigned_courier_id == courier_id), None)
+
+    def find_plan(self, delivery_id: str) -> Optional[Plan]:
+        return next((plan for plan in self.plans if delivery_id in plan.delivery_order_ids), None)
+
+
+class PlanningSessionService:
+    """
+    Continuous planning that keeps the state of every fleet in memory and applies only the changes sent since the
+    previous call. New deliveries are screened by the insertion planner and only the routes it picks, together
+    with the routes of new couriers, are re-optimised within session_time_limit. The other routes touched by the
+    update only get a new timetable, the rest is kept as it is.
+    """
+
+    def __init__(self, planning_service: PlanningService, insertion_planner: InsertionPlanner) -> None:
+        super().__init__()
+        self.planning_service = planning_service
+        self.insertion_planner = insertion_planner
+
+        # fleet id -> PlanningSession, the ttl is checked against the request config on lookup
+        self.sessions = TTLCache(max_size=SESSION_CACHE_SIZE, ttl=0)
+
+    def get_session(self, fleet_id: str) -> Optional[PlanningSession]:
+        session = self.sessions.get(fleet_id, ttl=ConfigProvider.get_config().session_ttl)
+        Metrics.increment('planning_sessions.hits' if session is not None else 'planning_sessions.misses')
+        return session
+
+    def start_session(self, fleet_id: str, deliveries: List[Delivery], couriers: List[Courier],
+                      min_number_of_plans: int, current_plans: List[Plan] = None) -> List[Plan]:
+        plans = self.planning_service.create_plans(deliveries=deliveries,
+                                                   couriers=couriers,
+                                                   min_number_of_plans=min_number_of_plans,
+                                                   previous_plans=current_plans)
+
+        self.sessions.put(fleet_id, PlanningSession(fleet_id=fleet_id, deliveries=deliveries, couriers=couriers,
+                                                    plans=plans, min_number_of_plans=min_number_of_plans))
+        return [plan.copy(deep=True) for plan in plans]
+
+    def update_session(self, session: PlanningSession, update: SessionUpdate) -> List[Plan]:
+        with session.lock:
+            try:
+                self._apply_update(session, update)
+            except Exception:
+                # the update may be applied only partly, e.g. the new deliveries without their plans - the next
+                # call of the fleet has to pass its full state again
+                self.sessions.remove(session.fleet_id, session)
+                Metrics.increment('planning_sessions.dropped')
+                raise
+
+            # the session keeps changing the plans in place
+            return [plan.copy(deep=True) for plan in session.plans]
+
+    def _apply_update(self, session: PlanningSession, update: SessionUpdate):
+        to_retime = set()
+        to_reoptimize = set()
+
+        for courier in update.courier_updates:
+            # a courier that came online may take over some of the work
+            (to_retime if courier.id in session.couriers else to_reoptimize).add(courier.id)
+            session.couriers[courier.id] = courier
+
+        for delivery_id in update.cancelled_delivery_ids:
+            session.deliveries.pop(delivery_id, None)
+            to_retime.add(self._remove_from_plan(session, delivery_id))
+
+        for completed_event in update.completed_events:
+            delivery = session.deliveries.get(completed_event.delivery_id)
+            if delivery is None:
+                continue
+
+            if completed_event.type == DeliveryEventType.pickup:
+                courier_id = self._remove_from_plan(session, delivery.id, DeliveryEventType.pickup)
+                session.deliveries[delivery.id] = delivery.copy(update={
+                    'origin': None, 'pickup_time': None,
+                    'assigned_courier_id': delivery.assigned_courier_id or courier_id
+                })
+            else:
+                session.deliveries.pop(delivery.id)
+                courier_id = self._remove_from_plan(session, delivery.id)
+            to_retime.add(courier_id)
+
+        new_deliveries = [delivery for delivery in update.new_deliveries if delivery.id not in session.deliveries]
+        if new_deliveries:
+            insertions = self.insertion_planner.find_insertions(deliveries=list(session.deliveries.values()),
+                                                                couriers=list(session.couriers.values()),
+                                                                current_plans=session.plans,
+                                                                new_deliveries=new_deliveries)
+            session.deliveries.update({delivery.id: delivery for delivery in new_deliveries})
+
+            if not all(insertions.values()):
+                print(f"Session {session.fleet_id}: a new delivery fits no route, planning from scratch")
+                self._replan(session)
+                return
+
+            for options in insertions.values():
+                to_reoptimize.update(option.courier_id for option in options)
+
+        to_retime.discard(None)
+        for courier_id in to_retime - to_reoptimize:
+            try:
+                self._retime(session, courier_id)
+            except PlanUnfeasibleException:
+                to_reoptimize.add(courier_id)
+
+        if to_reoptimize:
+            self._reoptimize(session, to_reoptimize, new_deliveries)
+
+        Metrics.increment('planning_sessions.retimed_routes', len(to_retime - to_reoptimize))
+        Metrics.increment('planning_sessions.reoptimized_routes', len(to_reoptimize))
+
+    def _remove_from_plan(self, session: PlanningSession, delivery_id: str,
+                          event_type: Optional[DeliveryEventType] = None) -> Optional[str]:
+        """Removes the delivery from its plan, returns the courier of the plan."""
+        plan = session.find_plan(delivery_id)
+        if plan is None:
+            return None
+
+        self.insertion_planner.remove_from_plan(plan, delivery_id, event_type)
+        return plan.assigned_courier_id
+
+    def _retime(self, session: PlanningSession, courier_id: str):
+        plan = session.get_plan(courier_id)
+        courier = session.couriers.get(courier_id)
+        if plan is not None and courier is not None:
+            self.insertion_planner.retime_plan(plan, session.deliveries, courier)
+
+    def _reoptimize(self, session: PlanningSession, courier_ids: Set[str], new_deliveries: List[Delivery]):
+        couriers = [session.couriers[courier_id] for courier_id in sorted(courier_ids)]
+        plans = [plan for plan in session.plans if plan.assigned_courier_id in courier_ids]
+
+        delivery_ids = [delivery_id for plan in plans for delivery_id in plan.delivery_order_ids] + \
+                       [delivery.id for delivery in new_deliveries]
+        deliveries = [session.deliveries[delivery_id] for delivery_id in dict.fromkeys(delivery_ids)
+                      if delivery_id in session.deliveries]
+
+        new_plans = self.planning_service.create_plans(deliveries=deliveries,
+                                                       couriers=couriers,
+                                                       min_number_of_plans=len(couriers),
+                                                       previous_plans=plans,
+                                                       time_limit=ConfigProvider.get_config().session_time_limit,
+                                                       priority=AdmissionPriority.session)
+
+        session.plans = [plan for plan in session.plans if plan.assigned_courier_id not in courier_ids] + new_plans
+
+    def _replan(self, session: PlanningSession):
+        session.plans = self.planning_service.create_plans(deliveries=list(session.deliveries.values()),
+                                                           couriers=list(session.couriers.values()),
+                                                           min_number_of_plans=session.min_number_of_plans,
+                                                           previous_plans=session.plans,
+                                                           priority=AdmissionPriority.session)
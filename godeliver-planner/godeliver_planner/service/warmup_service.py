@@ -0,0 +1,122 @@
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+from flask import Flask
+
+from godeliver_planner.helper.config_provider import ConfigProvider
+from godeliver_planner.helper.metrics import Metrics
+from godeliver_planner.helper.model_codec import ModelCodec
+from godeliver_planner.helper.timestamp_helper import TimestampHelper
+from godeliver_planner.model.courier import Courier
+from godeliver_planner.model.delivery import Delivery
+from godeliver_planner.model.plan import Plan
+from godeliver_planner.model.planner_config import PlannerConfig
+from godeliver_planner.model.warmup_config import WarmupConfig
+from godeliver_planner.planner.adapters.golang_adapter import get_go_lib_path, get_go_library
+from godeliver_planner.planner.plan_timetable.plan_timetable_optimizer import PlanTimetableOptimizer
+from godeliver_planner.service.planning_service import PlanningService
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))), 'config')
+
+TIME_KEYS = {'from_time', 'to_time', 'time'}
+
+
+def _shift_times(data, timestamp: int):
+    """The timestamps of the bundled instance are seconds from the start of the warmup."""
+    if isinstance(data, list):
+        return [_shift_times(item, timestamp) for item in data]
+    if isinstance(data, dict):
+        return {key: value + timestamp if key in TIME_KEYS and value is not None else _shift_times(value, timestamp)
+                for key, value in data.items()}
+    return data
+
+
+class WarmupService:
+    """
+    Solves a tiny bundled instance through every enabled planner and timetable computer before the worker takes
+    any request, so that the first requests don't pay for loading the Go library, OR-Tools and SciPy or for the
+    first routing call. A failed step is reported and the worker starts anyway.
+    """
+
+    def __init__(self, planning_service: PlanningService, timetable_optimizer: PlanTimetableOptimizer) -> None:
+        super().__init__()
+        self.planning_service = planning_service
+        self.timetable_optimizer = timetable_optimizer
+
+        self.is_ready = False
+        self.report = {}            # step -> its duration in seconds or its error
+
+    def warmup(self, app: Flask, warmup_config: WarmupConfig):
+        if not warmup_config.enabled:
+            self.is_ready = True
+            return
+
+        start_t = time.time()
+
+        self._run_step('go_library', self._load_go_library)
+
+        deliveries, couriers, min_number_of_plans = self._load_instance(warmup_config.instance_file)
+
+        plans = None
+        for planner_type in warmup_config.planner_types:
+            config = PlannerConfig(planner_type=planner_type, plan_cache_ttl=0)
+            planner_plans = self._run_step(f'planner.{planner_type.value}', self._create_plans, app, config,
+                                           deliveries, couriers, min_number_of_plans, warmup_config.time_limit)
+            plans = plans or planner_plans
+
+        for timetable_computer in warmup_config.timetable_computers:
+            config = PlannerConfig(timetable_computer=timetable_computer, timetable_cache_ttl=0)
+            self._run_step(f'timetable.{timetable_computer.value}', self._optimize_plans, app, config, plans,
+                           deliveries, couriers)
+
+        print(f"Warmup finished in {time.time() - start_t:.2f} s")
+        self.is_ready = True
+
+    def _run_step(self, name: str, function, *args):
+        start_t = time.time()
+        try:
+            ret = function(*args)
+            self.report[name] = round(time.time() - start_t, 3)
+            return ret
+        except Exception as e:
+            print(f"Warmup of {name} failed - {e}")
+            self.report[name] = f"failed - {e}"
+            Metrics.increment('warmup.failed_steps')
+            return None
+
+    @staticmethod
+    def _load_go_library():
+        if os.path.exists(get_go_lib_path()):
+            get_go_library()
+
+    @staticmethod
+    def _load_instance(instance_file: str) -> Tuple[List[Delivery], List[Courier], int]:
+        with open(os.path.join(CONFIG_DIR, instance_file)) as f:
+            data = _shift_times(json.load(f), TimestampHelper.current_timestamp())
+
+        return (ModelCodec.parse_deliveries(data['deliveries']), ModelCodec.parse_couriers(data['couriers']),
+                data['min_number_of_plans'])
+
+    def _create_plans(self, app: Flask, config: PlannerConfig, deliveries: List[Delivery], couriers: List[Courier],
+                      min_number_of_plans: int, time_limit: int) -> List[Plan]:
+        with app.app_context():
+            ConfigProvider.set_current_config(config)
+
+            return self.planning_service.create_plans(deliveries=deliveries,
+                                                      couriers=couriers,
+                                                      min_number_of_plans=min_number_of_plans,
+                                                      time_limit=time_limit)
+
+    def _optimize_plans(self, app: Flask, config: PlannerConfig, plans: Optional[List[Plan]],
+                        deliveries: List[Delivery], couriers: List[Courier]):
+        assert plans, "No warmup solve succeeded."
+
+        couriers = {courier.id: courier for courier in couriers}
+        with app.app_context():
+            ConfigProvider.set_current_config(config)
+
+            for plan in plans:
+                self.timetable_optimizer.optimize_plan(plan=plan, deliveries=deliveries,
+                                                       courier=couriers[plan.assigned_courier_id])
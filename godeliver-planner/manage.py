@@ -15,8 +15,8 @@ class CustomApi(Api):
         return jsonify({'message': e.description}), e.code
 
 
-# Gunicorn setup before init
-if __name__ != '__main__':
+# Gunicorn setup before init, the worker processes of the planners import this module as __mp_main__
+if __name__ not in ('__main__', '__mp_main__'):
 
     app = AppFactory.create_app()
 
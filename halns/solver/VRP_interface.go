@@ -51,6 +51,7 @@ type VRPInstanceInterface struct {
 	StartUtilizations    []int                   `json:"start_utilizations,omitempty"`
 	NodeDemands          []int                   `json:"node_demands,omitempty"`
 	TimeLimit            int                     `json:"time_limit,omitempty"`
+	AllowedSuccessors    [][]int                 `json:"allowed_successors,omitempty"`
 }
 
 type VRPSolutionInterface struct {
@@ -12,6 +12,7 @@ type VRPInstance struct {
 	StartUtilizations []int
 	CapacityEnabled   bool
 	TimeLimit         int64
+	AllowedArcs       [][]bool
 }
 
 func CreateInstance(instance VRPInstanceInterface) *VRPInstance {
@@ -129,9 +130,31 @@ func CreateInstance(instance VRPInstanceInterface) *VRPInstance {
 		StartUtilizations: instance.StartUtilizations,
 		CapacityEnabled:   capacityEnabled,
 		TimeLimit:         int64(instance.TimeLimit),
+		AllowedArcs:       createAllowedArcs(instance.AllowedSuccessors, actionsLength),
 	}
 }
 
+func createAllowedArcs(allowedSuccessors [][]int, actionsLength int) [][]bool {
+	if len(allowedSuccessors) == 0 {
+		return nil
+	}
+	allowedArcs := make([][]bool, actionsLength)
+	for from, successors := range allowedSuccessors {
+		allowedArcs[from] = make([]bool, actionsLength)
+		for _, to := range successors {
+			allowedArcs[from][to] = true
+		}
+	}
+	return allowedArcs
+}
+
+func (instance *VRPInstance) IsArcAllowed(from int, to int) bool {
+	if instance.AllowedArcs == nil {
+		return true
+	}
+	return instance.AllowedArcs[from][to]
+}
+
 func addServiceTimeToDurationMatrix(durationMatrix [][]int64, instance *VRPInstanceInterface, node int, isPickup bool, isDrop bool) {
 
 	for _, pickupNode := range instance.PickupNodes {
@@ -146,6 +146,42 @@ func (plan *Plan) String() string {
 	return b.String()
 }
 
+func (plan *Plan) actionAt(index int) *Action {
+	if index < 0 {
+		return globalInstance.Actions[globalInstance.Starts[plan.Courier]]
+	}
+	if index >= plan.Length() {
+		return globalInstance.Actions[globalInstance.Ends[plan.Courier]]
+	}
+	return plan.Actions[index]
+}
+
+// IsInsertionAllowed checks that every arc created by the insertion is in the granular neighbourhood
+func (plan *Plan) IsInsertionAllowed(insertion *PlanInsertion) bool {
+	if globalInstance.AllowedArcs == nil {
+		return true
+	}
+	request := insertion.request
+	drop := request.Drop.Node
+
+	if request.IsPartial {
+		return globalInstance.IsArcAllowed(plan.actionAt(insertion.dropIdx-1).Node, drop) &&
+			globalInstance.IsArcAllowed(drop, plan.actionAt(insertion.dropIdx).Node)
+	}
+
+	pickup := request.Pickup.Node
+	if !globalInstance.IsArcAllowed(plan.actionAt(insertion.pickIdx-1).Node, pickup) {
+		return false
+	}
+	if insertion.dropIdx == insertion.pickIdx+1 {
+		return globalInstance.IsArcAllowed(pickup, drop) &&
+			globalInstance.IsArcAllowed(drop, plan.actionAt(insertion.pickIdx).Node)
+	}
+	return globalInstance.IsArcAllowed(pickup, plan.actionAt(insertion.pickIdx).Node) &&
+		globalInstance.IsArcAllowed(plan.actionAt(insertion.dropIdx-2).Node, drop) &&
+		globalInstance.IsArcAllowed(drop, plan.actionAt(insertion.dropIdx-1).Node)
+}
+
 func (plan *Plan) FindPickup(request *Request) int {
 	for i, a := range (*plan).Actions {
 		if a.Request == request && a.Type == Pickup {
@@ -64,44 +64,56 @@ func findBestInsertInPlan(plan *Plan, request *Request) planPosition {
 		pickIdx: 0,
 	}
 
-	if request.IsPartial {
-		if plan.Courier != request.Courier {
-			panic("courier id from partial request does not match plan")
-		}
-		for i := 0; i <= plan.Length(); i++ {
-			insertion.dropIdx = i
-			insertionCost, feasible, finished := plan.InsertionCost(
-				&insertion,
-				bestInsertionCost,
-				metricsFun)
-			if finished && insertionCost < bestInsertionCost {
-				if feasible {
-					bestInsertionCost = insertionCost
-					bestPosition = planPosition{drop: i, isFeasible: true, cost: insertionCost}
-				} else if !bestPosition.isFeasible {
-					bestInsertionCost = insertionCost
-					bestPosition = planPosition{drop: i, isFeasible: false, cost: insertionCost}
-				}
+	// positions outside of the granular neighbourhood are skipped, unless there is no other position at all
+	for _, granular := range []bool{globalInstance.AllowedArcs != nil, false} {
+		if request.IsPartial {
+			if plan.Courier != request.Courier {
+				panic("courier id from partial request does not match plan")
 			}
-		}
-	} else {
-		for i := 0; i <= plan.Length(); i++ {
-			insertion.pickIdx = i
-			for j := i + 1; j <= plan.Length()+1; j++ {
-				insertion.dropIdx = j
+			for i := 0; i <= plan.Length(); i++ {
+				insertion.dropIdx = i
+				if granular && !plan.IsInsertionAllowed(&insertion) {
+					continue
+				}
 				insertionCost, feasible, finished := plan.InsertionCost(
-					&insertion, bestInsertionCost, metricsFun)
-
+					&insertion,
+					bestInsertionCost,
+					metricsFun)
 				if finished && insertionCost < bestInsertionCost {
 					if feasible {
 						bestInsertionCost = insertionCost
-						bestPosition = planPosition{pick: i, drop: j, isFeasible: true, cost: insertionCost}
+						bestPosition = planPosition{drop: i, isFeasible: true, cost: insertionCost}
 					} else if !bestPosition.isFeasible {
 						bestInsertionCost = insertionCost
-						bestPosition = planPosition{pick: i, drop: j, isFeasible: false, cost: insertionCost}
+						bestPosition = planPosition{drop: i, isFeasible: false, cost: insertionCost}
 					}
 				}
 			}
+		} else {
+			for i := 0; i <= plan.Length(); i++ {
+				insertion.pickIdx = i
+				for j := i + 1; j <= plan.Length()+1; j++ {
+					insertion.dropIdx = j
+					if granular && !plan.IsInsertionAllowed(&insertion) {
+						continue
+					}
+					insertionCost, feasible, finished := plan.InsertionCost(
+						&insertion, bestInsertionCost, metricsFun)
+
+					if finished && insertionCost < bestInsertionCost {
+						if feasible {
+							bestInsertionCost = insertionCost
+							bestPosition = planPosition{pick: i, drop: j, isFeasible: true, cost: insertionCost}
+						} else if !bestPosition.isFeasible {
+							bestInsertionCost = insertionCost
+							bestPosition = planPosition{pick: i, drop: j, isFeasible: false, cost: insertionCost}
+						}
+					}
+				}
+			}
+		}
+		if bestInsertionCost < math.MaxInt64 || !granular {
+			break
 		}
 	}
 